@@ -0,0 +1,147 @@
+"""
+Asset Cache - Content-addressed cache for generated scene assets
+Maps a hash of the upstream request (model + generation parameters) to the
+Fal.ai result URL so identical images/clips are not regenerated. Fal.ai URLs
+are short-lived: entries expire well before them, and callers check a hit is
+still served before reusing it (see AsyncShortsFactory._cached_url).
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Optional
+
+# Cache configuration
+CACHE_PATH = os.getenv(
+    "SHORTS_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "assets.db")
+)
+CACHE_MAX_ENTRIES = int(os.getenv("SHORTS_CACHE_MAX_ENTRIES", 5000))
+CACHE_MAX_AGE = int(os.getenv("SHORTS_CACHE_MAX_AGE", 24 * 3600))  # seconds; keep below Fal.ai's URL lifetime
+
+# Run eviction every N writes instead of on every put
+EVICT_EVERY = 50
+
+
+def cache_key(model_id: str, params: Dict) -> str:
+    """Stable content hash for a model call"""
+    payload = json.dumps({"model": model_id, "params": params}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AssetCache:
+    """SQLite-backed index of generated assets with size/age-based eviction"""
+
+    def __init__(
+        self,
+        path: str = CACHE_PATH,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        max_age: int = CACHE_MAX_AGE
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS assets (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_assets_last_access ON assets(last_access)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_assets_created_at ON assets(created_at)")
+
+    def _count(self, kind: str, field: str) -> None:
+        counters = self._counters.setdefault(kind, {"hits": 0, "misses": 0, "expired": 0})
+        counters[field] += 1
+
+    def get(self, kind: str, key: str) -> Optional[str]:
+        """Return the cached value for key, or None on miss/expiry"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM assets WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.max_age and now - row[1] > self.max_age):
+                self._count(kind, "misses")
+                return None
+            self._conn.execute("UPDATE assets SET last_access = ? WHERE key = ?", (now, key))
+            self._count(kind, "hits")
+            return row[0]
+
+    def put(self, kind: str, key: str, value: str) -> None:
+        """Store a value and periodically evict old/excess entries"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO assets (key, kind, value, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, kind, value, now, now)
+            )
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self._evict_locked(now)
+
+    def discard(self, kind: str, key: str) -> None:
+        """Drop an entry whose URL is no longer served (the get() that returned it counts as expired, not a hit)"""
+        with self._lock:
+            self._conn.execute("DELETE FROM assets WHERE key = ?", (key,))
+            self._count(kind, "expired")
+            self._counters[kind]["hits"] = max(0, self._counters[kind]["hits"] - 1)
+
+    def evict(self) -> int:
+        """Drop expired entries and trim to max_entries (least recently used first)"""
+        with self._lock:
+            return self._evict_locked(time.time())
+
+    def _evict_locked(self, now: float) -> int:
+        removed = 0
+        if self.max_age:
+            removed += self._conn.execute(
+                "DELETE FROM assets WHERE created_at < ?", (now - self.max_age,)
+            ).rowcount
+        if self.max_entries:
+            removed += self._conn.execute(
+                "DELETE FROM assets WHERE key IN ("
+                "SELECT key FROM assets ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+        return removed
+
+    def stats(self) -> Dict:
+        """Hit/miss counters per asset kind plus current index size"""
+        with self._lock:
+            rows = self._conn.execute("SELECT kind, COUNT(*) FROM assets GROUP BY kind").fetchall()
+            return {
+                "entries": {kind: count for kind, count in rows},
+                "counters": {kind: dict(c) for kind, c in self._counters.items()},
+            }
+
+
+_default_cache: Optional[AssetCache] = None
+_default_lock = threading.Lock()
+
+
+def get_asset_cache() -> Optional[AssetCache]:
+    """Process-wide cache instance (None when SHORTS_CACHE_PATH is empty)"""
+    global _default_cache
+    if not CACHE_PATH:
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = AssetCache()
+        return _default_cache
@@ -0,0 +1,189 @@
+"""
+Audio Cache - Content-addressed storage for synthesized speech
+Audio files are named by a hash of (normalized text, voice, rate), so
+identical requests are served from disk and concurrent identical requests
+share a single edge-tts synthesis.
+"""
+
+import os
+import time
+import uuid
+import asyncio
+import hashlib
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import edge_tts
+
+from audio_storage import AudioStorage
+from metrics import REGISTRY
+
+SYNTHESIS_SECONDS = REGISTRY.histogram(
+    "tts_synthesis_seconds", "edge-tts synthesis time (stream: until the last chunk)", ("mode",)
+)
+CACHE_LOOKUPS = REGISTRY.counter("tts_cache_lookups_total", "Audio cache lookups", ("result",))
+
+# edge-tts produces constant-bitrate MP3 (audio-24khz-48kbitrate-mono-mp3)
+EDGE_TTS_BITRATE = 48000  # bits per second
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace runs; they do not change the spoken output"""
+    return " ".join(text.split())
+
+
+def audio_key(text: str, voice: str, rate: str) -> str:
+    """Content hash identifying one synthesis"""
+    payload = "\x1f".join((normalize_text(text), voice, rate))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_audio_key(value: str) -> bool:
+    return len(value) == 64 and all(c in "0123456789abcdef" for c in value)
+
+
+def audio_duration(path: str) -> float:
+    """Playback length in seconds of an edge-tts MP3 (exact for CBR output)"""
+    return os.path.getsize(path) * 8 / EDGE_TTS_BITRATE
+
+
+class AudioCache:
+    """Disk cache of MP3 files keyed by audio_key"""
+
+    def __init__(self, storage: AudioStorage):
+        self.storage = storage
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.streamed = 0
+
+    def path_for(self, key: str) -> str:
+        return self.storage.path_for(key)
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Path of the cached file, or None"""
+        path = self.path_for(key)
+        return path if os.path.exists(path) else None
+
+    def get(self, key: str) -> Optional[str]:
+        """Like lookup, but counted in the hit statistics and marked as used"""
+        path = self.lookup(key)
+        CACHE_LOOKUPS.inc(result="hit" if path else "miss")
+        if path:
+            self.hits += 1
+            self.storage.touch(path)
+        return path
+
+    async def get_or_synthesize(self, text: str, voice: str, rate: str = "+0%") -> Tuple[str, str, bool]:
+        """
+        Return (key, path, hit) for the requested audio
+
+        Concurrent callers for the same key wait on one synthesis. Files are
+        written under a temporary name and renamed into place, so readers
+        never see a partial MP3.
+        """
+        key = audio_key(text, voice, rate)
+        path = self.get(key)
+        if path:
+            return key, path, True
+
+        pending = self._inflight.get(key)
+        while pending is not None:
+            self.shared += 1
+            try:
+                return key, await asyncio.shield(pending), True
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The leader's request was cancelled, not ours: try again
+                pending = self._inflight.get(key)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            path = await self._synthesize(key, normalize_text(text), voice, rate)
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # retrieved by us even if nobody waited
+            raise
+        else:
+            future.set_result(path)
+            return key, path, False
+        finally:
+            del self._inflight[key]
+
+    async def _synthesize(self, key: str, text: str, voice: str, rate: str) -> str:
+        path = self.path_for(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        self.storage.prepare(path)
+        started = time.perf_counter()
+        try:
+            communicate = edge_tts.Communicate(text=text, voice=voice, rate=rate)
+            await communicate.save(tmp_path)
+            SYNTHESIS_SECONDS.observe(time.perf_counter() - started, mode="file")
+            os.replace(tmp_path, path)
+            self.storage.record_write(path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return path
+
+    async def stream_synthesis(
+        self,
+        text: str,
+        voice: str,
+        rate: str = "+0%",
+        write_through: bool = True
+    ) -> AsyncIterator[bytes]:
+        """
+        Yield MP3 chunks as edge-tts produces them
+
+        With write_through the chunks are also kept in memory and written to
+        the cache in one go (off the event loop) once the stream finishes; an
+        aborted stream leaves nothing behind. The edge-tts stream is closed
+        as soon as ours is, e.g. when the client disconnects.
+        """
+        key = audio_key(text, voice, rate)
+        chunks: Optional[List[bytes]] = [] if write_through else None
+        self.streamed += 1
+        started = time.perf_counter()
+        communicate = edge_tts.Communicate(text=normalize_text(text), voice=voice, rate=rate)
+        upstream = communicate.stream()
+        try:
+            async for chunk in upstream:
+                if chunk["type"] != "audio":
+                    continue
+                if chunks is not None:
+                    chunks.append(chunk["data"])
+                yield chunk["data"]
+        finally:
+            await upstream.aclose()
+        SYNTHESIS_SECONDS.observe(time.perf_counter() - started, mode="stream")
+        if chunks is not None:
+            await asyncio.to_thread(self._store, key, b"".join(chunks))
+
+    def _store(self, key: str, data: bytes) -> None:
+        """Write a finished synthesis into the cache (temp file, then rename)"""
+        path = self.path_for(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        self.storage.prepare(path)
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self.storage.record_write(path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def stats(self) -> Dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared_inflight": self.shared,
+            "streamed": self.streamed,
+        }
@@ -0,0 +1,146 @@
+"""
+Audio Storage - Bounded, sharded storage for generated audio files
+Files live in two-level shard directories (ab/cd/<key>.mp3) so no single
+directory grows huge, and a janitor evicts the least recently used files
+whenever the byte/file budget or maximum age is exceeded.
+"""
+
+import os
+import time
+import threading
+from typing import Dict, List, Tuple
+
+from log import get_logger
+
+logger = get_logger("tts")
+
+# Storage budget
+AUDIO_MAX_BYTES = int(os.getenv("TTS_AUDIO_MAX_BYTES", 2 * 1024 ** 3))
+AUDIO_MAX_FILES = int(os.getenv("TTS_AUDIO_MAX_FILES", 20000))
+AUDIO_MAX_AGE = int(os.getenv("TTS_AUDIO_MAX_AGE", 7 * 24 * 3600))  # seconds since last use
+
+# Leftover temp files from interrupted writes are removed after this long
+TMP_MAX_AGE = 3600  # seconds
+
+
+class AudioStorage:
+    """Sharded audio directory with an LRU/age janitor"""
+
+    def __init__(
+        self,
+        root: str,
+        max_bytes: int = AUDIO_MAX_BYTES,
+        max_files: int = AUDIO_MAX_FILES,
+        max_age: int = AUDIO_MAX_AGE
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._files = 0
+        self._bytes = 0
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+        self.last_run = None
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, key: str, ext: str = "mp3") -> str:
+        """Sharded path for a content key (nothing is created on disk)"""
+        return os.path.join(self.root, key[:2], key[2:4], f"{key}.{ext}")
+
+    def prepare(self, path: str) -> None:
+        """Create the shard directories of a path_for path before writing it"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def touch(self, path: str) -> None:
+        """Mark a file as recently used (mtime doubles as last-access time)"""
+        try:
+            os.utime(path, None)
+        except FileNotFoundError:
+            pass
+
+    def record_write(self, path: str) -> None:
+        """Account for a newly stored file until the next janitor scan"""
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self._files += 1
+            self._bytes += size
+
+    def _scan(self) -> Tuple[List[Tuple[float, int, str]], List[str]]:
+        """All stored files as (mtime, size, path), plus stale temp files"""
+        files, stale_tmp = [], []
+        now = time.time()
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if name.endswith(".tmp"):
+                    if now - stat.st_mtime > TMP_MAX_AGE:
+                        stale_tmp.append(path)
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files, stale_tmp
+
+    def run_janitor(self) -> Dict:
+        """Evict expired files, then least recently used ones until within budget"""
+        files, stale_tmp = self._scan()
+        now = time.time()
+        for path in stale_tmp:
+            self._remove(path)
+
+        files.sort()  # oldest mtime first
+        total_files = len(files)
+        total_bytes = sum(size for _, size, _ in files)
+        evicted_files = evicted_bytes = 0
+
+        for mtime, size, path in files:
+            over_budget = total_files > self.max_files or total_bytes > self.max_bytes
+            expired = self.max_age and now - mtime > self.max_age
+            if not (over_budget or expired):
+                break
+            if self._remove(path):
+                total_files -= 1
+                total_bytes -= size
+                evicted_files += 1
+                evicted_bytes += size
+
+        with self._lock:
+            self._files = total_files
+            self._bytes = total_bytes
+            self.evicted_files += evicted_files
+            self.evicted_bytes += evicted_bytes
+            self.last_run = now
+
+        if evicted_files:
+            logger.info(
+                "🧹 Evicted audio files",
+                extra={"files": evicted_files, "mb": round(evicted_bytes / 1024 ** 2, 1)}
+            )
+        return {"evicted_files": evicted_files, "evicted_bytes": evicted_bytes}
+
+    def _remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def usage(self) -> Dict:
+        with self._lock:
+            return {
+                "files": self._files,
+                "bytes": self._bytes,
+                "max_files": self.max_files,
+                "max_bytes": self.max_bytes,
+                "max_age_seconds": self.max_age,
+                "evicted_files": self.evicted_files,
+                "evicted_bytes": self.evicted_bytes,
+                "last_janitor_run": self.last_run,
+            }
@@ -0,0 +1,474 @@
+"""
+Benchmark - Offline load tests against simulated upstreams
+Runs the real pipeline (factory, rate limiter, scheduler, servers) against
+mock_backends.py endpoints with realistic latency distributions, failure
+rates and rate limits, so throughput changes can be measured without API
+keys or credits. Time is compressed by --time-scale: upstream latencies,
+rate limits and retry backoff are all scaled together.
+
+Usage:
+    python benchmark.py                              # every scenario
+    python benchmark.py --scenario concurrent --jobs 16
+    python benchmark.py --output baseline.json       # save a baseline
+    python benchmark.py --compare baseline.json      # diff against it
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Settings are read at import time, so configure before the project modules load
+os.environ["SHORTS_MOCK_BACKENDS"] = "1"
+os.environ["SHORTS_JOB_STORE"] = "memory"
+os.environ["SHORTS_CACHE_PATH"] = ""  # no asset cache: every run renders
+os.environ["SHORTS_MIRROR_ASSETS"] = "0"
+os.environ.setdefault("SHORTS_IMAGE_CANDIDATES", "1")
+os.environ.setdefault("SHORTS_LOG_LEVEL", "ERROR")
+
+import rate_limiter  # noqa: E402
+from log import configure_logging  # noqa: E402
+from clients import ClientRegistry, set_clients  # noqa: E402
+from mock_backends import LatencyProfile, MockEdgeTTS, MockFal, MockGeminiModel  # noqa: E402
+from shorts_factory import GEMINI_ENDPOINT, IMAGE_MODEL, VIDEO_MODEL, get_shorts_factory  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Real-world behaviour of each upstream (seconds, before --time-scale)
+PROFILES = {
+    GEMINI_ENDPOINT: LatencyProfile(median=6.0, sigma=0.35, failure_rate=0.02, rate_limit=1.0, burst=5),
+    IMAGE_MODEL: LatencyProfile(median=8.0, sigma=0.4, failure_rate=0.02, rate_limit=2.0, burst=5),
+    VIDEO_MODEL: LatencyProfile(median=120.0, sigma=0.3, failure_rate=0.03, rate_limit=1.0, burst=3),
+    "edge-tts": LatencyProfile(median=1.2, sigma=0.3, failure_rate=0.01),
+}
+
+SCENARIOS = ("concurrent", "burst", "long", "scaleout", "tts")
+
+# Metrics compared against a baseline, and whether higher is better
+COMPARED = {
+    "job_p50": False,
+    "job_p99": False,
+    "scenes_per_minute": True,
+    "request_p50": False,
+    "request_p99": False,
+    "requests_per_second": True,
+    "peak_traced_mb": False,
+    "speedup": True,
+}
+
+TERMINAL_STATUSES = {"completed", "failed", "cancelled"}
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile (None for no values)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 3)
+
+
+def max_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(rss / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+
+@contextmanager
+def measure_memory(report: Dict):
+    """Record the Python heap peak of a block"""
+    tracemalloc.start()
+    try:
+        yield
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        report["peak_traced_mb"] = round(peak / (1 << 20), 2)
+        report["max_rss_mb"] = max_rss_mb()
+
+
+class Backends:
+    """Simulated upstreams installed as the process-wide clients"""
+
+    def __init__(self, time_scale: float, seed: Optional[int]):
+        self.profiles = {name: profile.scaled(time_scale) for name, profile in PROFILES.items()}
+        self.fal = MockFal(
+            profiles={name: self.profiles[name] for name in (IMAGE_MODEL, VIDEO_MODEL)},
+            seed=seed
+        )
+        self.gemini: Dict[str, MockGeminiModel] = {}
+        self.edge_tts = MockEdgeTTS(self.profiles["edge-tts"], seed)
+        self.seed = seed
+        set_clients(ClientRegistry(mock=True, fal=self.fal, gemini=self._gemini_model))
+        scale_limits(time_scale)
+
+    def _gemini_model(self, name: str) -> MockGeminiModel:
+        model = self.gemini[name] = MockGeminiModel(name, self.profiles[GEMINI_ENDPOINT], self.seed)
+        return model
+
+    def stats(self) -> Dict[str, Dict]:
+        endpoints = [model.endpoint for model in self.gemini.values()]
+        endpoints += list(self.fal.endpoints.values()) + [self.edge_tts.endpoint]
+        return {endpoint.name: endpoint.stats() for endpoint in endpoints}
+
+
+def scale_limits(time_scale: float) -> None:
+    """Compress the client-side rate limits and backoff like the upstreams"""
+    for endpoint, config in rate_limiter.DEFAULT_LIMITS.items():
+        config = {**config, **rate_limiter.LIMITS.get(endpoint, {})}
+        config["rate"] /= time_scale
+        config["latency_target"] *= time_scale
+        rate_limiter.LIMITS[endpoint] = config
+    rate_limiter.FALLBACK_LIMITS["rate"] /= time_scale
+    rate_limiter.FALLBACK_LIMITS["latency_target"] *= time_scale
+    rate_limiter.BACKOFF_BASE *= time_scale
+    rate_limiter.BACKOFF_CAP *= time_scale
+
+
+def diff_stats(before: Dict[str, Dict], after: Dict[str, Dict]) -> Dict[str, Dict]:
+    """Upstream counters accumulated during one scenario"""
+    return {
+        name: {key: value - before.get(name, {}).get(key, 0) for key, value in counters.items()}
+        for name, counters in after.items()
+    }
+
+
+def job_report(latencies: List[float], scenes: int, failed: int, wall: float) -> Dict:
+    return {
+        "jobs": len(latencies) + failed,
+        "completed": len(latencies),
+        "failed": failed,
+        "wall_seconds": round(wall, 3),
+        "job_p50": percentile(latencies, 0.5),
+        "job_p99": percentile(latencies, 0.99),
+        "scenes": scenes,
+        "scenes_per_minute": round(scenes / wall * 60, 1) if wall else None,
+    }
+
+
+async def run_factory_jobs(jobs: int, target_duration: int, scene_range: tuple, label: str) -> Dict:
+    """jobs parallel process_shorts calls on the shared engine"""
+    factory = get_shorts_factory()
+
+    async def job(index: int):
+        started = time.perf_counter()
+        scenes = await factory.process_shorts(
+            user_input=f"{label} benchmark story #{index}",
+            target_duration=target_duration,
+            scene_duration_range=scene_range,
+            use_scenario_cache=False
+        )
+        return time.perf_counter() - started, len(scenes)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(job(i) for i in range(jobs)), return_exceptions=True)
+    wall = time.perf_counter() - started
+
+    done = [result for result in results if not isinstance(result, BaseException)]
+    return job_report(
+        [seconds for seconds, _ in done], sum(count for _, count in done), len(results) - len(done), wall
+    )
+
+
+async def scenario_concurrent(args) -> Dict:
+    return await run_factory_jobs(args.jobs, args.duration, (8, 15), "concurrent")
+
+
+async def scenario_long(args) -> Dict:
+    return await run_factory_jobs(1, args.long_duration, (5, 8), "long")
+
+
+async def scenario_burst(args) -> Dict:
+    """Submit a burst through the HTTP API and wait for every accepted job"""
+    import httpx
+    import shorts_server
+
+    app = shorts_server.app
+    transport = httpx.ASGITransport(app=app)
+    poll_interval = max(0.01, args.time_scale)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+
+            async def submit(index: int):
+                response = await client.post(
+                    "/api/shorts/generate",
+                    json={
+                        "content": f"burst benchmark story #{index}",
+                        "target_duration": args.duration,
+                        "assemble": False,
+                    },
+                    headers={"X-Client-Id": f"client-{index % args.clients}"}
+                )
+                return response.status_code, response.json(), time.perf_counter()
+
+            started = time.perf_counter()
+            submissions = await asyncio.gather(*(submit(i) for i in range(args.burst)))
+            rejected = sum(1 for status, _, _ in submissions if status == 429)
+            pending = {body["job_id"]: submitted for status, body, submitted in submissions if status == 200}
+
+            latencies, scenes, failed = [], 0, 0
+            while pending:
+                await asyncio.sleep(poll_interval)
+                for job_id in list(pending):
+                    job = await shorts_server.job_store.get(job_id)
+                    if job is None or job["status"] not in TERMINAL_STATUSES:
+                        continue
+                    submitted = pending.pop(job_id)
+                    if job["status"] == "completed":
+                        latencies.append(time.perf_counter() - submitted)
+                        scenes += len(job["videos"])
+                    else:
+                        failed += 1
+            wall = time.perf_counter() - started
+
+    report = job_report(latencies, scenes, failed, wall)
+    report["submitted"] = args.burst
+    report["rejected_429"] = rejected
+    return report
+
+
+async def scenario_scaleout(args) -> Dict:
+    """
+    One long job rendered as work units by growing pools of render workers
+
+    The workers run in this process against a temporary SQLite queue, so
+    they share one rate limiter (as workers on one host share the upstream
+    quotas). speedup is the wall time with the fewest workers over the
+    wall time with the most.
+    """
+    from datetime import datetime
+    from job_queue import SQLiteJobQueue
+    from job_runner import ShortsRequest, job_store
+    from shorts_worker import RenderWorker
+
+    poll_interval = max(0.01, args.time_scale)
+    counts = sorted({max(1, int(count)) for count in args.scaleout_workers.split(",")})
+    walls, scenes, failed = {}, 0, 0
+    with tempfile.TemporaryDirectory() as workdir:
+        queue = SQLiteJobQueue(os.path.join(workdir, "queue.db"))
+        for count in counts:
+            job_id = f"scaleout-{count}-{time.time_ns()}"
+            request = ShortsRequest(
+                content=f"scale-out benchmark story ({count} workers)",
+                target_duration=args.scaleout_duration,
+                scene_duration_min=5,
+                scene_duration_max=8,
+                bypass_scenario_cache=True,
+                assemble=False
+            )
+            await job_store.create({
+                'job_id': job_id, 'status': 'queued', 'progress': 0, 'current_scene': 0, 'total_scenes': 0,
+                'message': 'Job queued', 'videos': [], 'error': None, 'created_at': datetime.now().isoformat(),
+                'queued_at': time.time(), 'completed_at': None, 'final_video_url': None,
+                'request': request.model_dump(), 'client_id': 'benchmark', 'checkpoint': None,
+            })
+            workers = [
+                RenderWorker(
+                    queue, concurrency=args.worker_concurrency, poll_interval=poll_interval,
+                    worker_id=f"benchmark-{index}"
+                )
+                for index in range(count)
+            ]
+            runs = [asyncio.create_task(worker.run()) for worker in workers]
+            started = time.perf_counter()
+            queue.enqueue(job_id, "benchmark")
+            while (await job_store.get(job_id))["status"] not in TERMINAL_STATUSES:
+                await asyncio.sleep(poll_interval)
+            walls[count] = time.perf_counter() - started
+            for worker in workers:
+                worker.stop()
+            await asyncio.gather(*runs)
+
+            job = await job_store.get(job_id)
+            if job["status"] == "completed":
+                scenes = len(job["videos"])
+            else:
+                failed += 1
+
+    return {
+        "scenes": scenes,
+        "failed": failed,
+        "worker_slots": args.worker_concurrency,
+        "wall_seconds": {str(count): round(wall, 2) for count, wall in walls.items()},
+        "speedup": round(walls[counts[0]] / walls[counts[-1]], 2) if walls[counts[-1]] else None,
+    }
+
+
+async def scenario_tts(args, backends: Backends) -> Dict:
+    """Concurrent synthesis requests (with repeats) plus scenario batches"""
+    import httpx
+    import audio_cache
+    import voice_catalog
+    import tts_server
+    from audio_storage import AudioStorage
+
+    audio_cache.edge_tts = backends.edge_tts
+    voice_catalog.edge_tts = backends.edge_tts
+
+    with tempfile.TemporaryDirectory() as audio_dir:
+        tts_server.audio_storage = AudioStorage(audio_dir)
+        tts_server.audio_cache = audio_cache.AudioCache(tts_server.audio_storage)
+        tts_server.voice_catalog = voice_catalog.VoiceCatalog()
+
+        app = tts_server.app
+        texts = [f"Benchmark line {i}: the quick brown fox jumps over the lazy dog." for i in range(args.tts_texts)]
+        picker = random.Random(args.seed)
+        semaphore = asyncio.Semaphore(args.tts_concurrency)
+        latencies: List[float] = []
+        errors = 0
+
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url="http://benchmark"
+            ) as client:
+
+                async def request(method: str, path: str, body: Dict):
+                    nonlocal errors
+                    async with semaphore:
+                        started = time.perf_counter()
+                        response = await client.request(method, path, json=body)
+                        latencies.append(time.perf_counter() - started)
+                        if response.status_code != 200:
+                            errors += 1
+
+                calls = [
+                    request("POST", "/api/tts/synthesize", {"text": picker.choice(texts)})
+                    for _ in range(args.tts_requests)
+                ]
+                calls += [
+                    request("POST", "/api/tts/batch", {
+                        "items": [{"text": picker.choice(texts)} for _ in range(args.tts_batch_size)]
+                    })
+                    for _ in range(args.tts_batches)
+                ]
+                picker.shuffle(calls)
+                started = time.perf_counter()
+                await asyncio.gather(*calls)
+                wall = time.perf_counter() - started
+
+        return {
+            "requests": len(latencies),
+            "errors": errors,
+            "wall_seconds": round(wall, 3),
+            "request_p50": percentile(latencies, 0.5),
+            "request_p99": percentile(latencies, 0.99),
+            "requests_per_second": round(len(latencies) / wall, 1) if wall else None,
+            "audio_cache": tts_server.audio_cache.stats(),
+        }
+
+
+async def run_scenario(name: str, args, backends: Backends) -> Dict:
+    if name == "tts":
+        return await scenario_tts(args, backends)
+    return await {
+        "concurrent": scenario_concurrent,
+        "burst": scenario_burst,
+        "long": scenario_long,
+        "scaleout": scenario_scaleout,
+    }[name](args)
+
+
+def run(args) -> Dict:
+    configure_logging()
+    backends = Backends(args.time_scale, args.seed)
+    results = {}
+    for name in args.scenario or SCENARIOS:
+        before = backends.stats()
+        report: Dict = {}
+        with measure_memory(report):
+            report.update(asyncio.run(run_scenario(name, args, backends)))
+        report["upstream"] = diff_stats(before, backends.stats())
+        results[name] = report
+    return {"time_scale": args.time_scale, "seed": args.seed, "scenarios": results}
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Print metric deltas; return the regressions beyond tolerance"""
+    if report["time_scale"] != baseline.get("time_scale"):
+        print(f"⚠️ Baseline ran at time scale {baseline.get('time_scale')}, this run at {report['time_scale']}")
+
+    regressions = []
+    print(f"\n{'scenario':<12}{'metric':<22}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, metrics in report["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            continue
+        for metric, higher_is_better in COMPARED.items():
+            old, new = base.get(metric), metrics.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            worse = -change if higher_is_better else change
+            flag = " ❌" if worse > tolerance else ""
+            if flag:
+                regressions.append(f"{name}.{metric}")
+            print(f"{name:<12}{metric:<22}{old:>12}{new:>12}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def print_report(report: Dict) -> None:
+    print(f"\n📊 Benchmark (time scale {report['time_scale']}, seed {report['seed']})")
+    for name, metrics in report["scenarios"].items():
+        print(f"\n[{name}]")
+        for key, value in metrics.items():
+            if isinstance(value, dict):
+                value = json.dumps(value)
+            print(f"  {key:<20} {value}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="repeatable; default: all")
+    parser.add_argument("--time-scale", type=float, default=0.01, help="simulated seconds per real second")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--jobs", type=int, default=8, help="parallel jobs (concurrent)")
+    parser.add_argument("--duration", type=int, default=60, help="target seconds per job (concurrent, burst)")
+    parser.add_argument("--long-duration", type=int, default=300, help="target seconds (long)")
+    parser.add_argument("--burst", type=int, default=40, help="jobs submitted at once (burst)")
+    parser.add_argument("--clients", type=int, default=4, help="distinct X-Client-Id values (burst)")
+    parser.add_argument("--scaleout-workers", default="1,2,4", help="render worker counts to compare (scaleout)")
+    parser.add_argument("--worker-concurrency", type=int, default=2, help="units per render worker (scaleout)")
+    parser.add_argument("--scaleout-duration", type=int, default=120, help="target seconds of the job (scaleout)")
+    parser.add_argument("--tts-requests", type=int, default=200)
+    parser.add_argument("--tts-texts", type=int, default=50, help="distinct texts; fewer means more cache hits")
+    parser.add_argument("--tts-batches", type=int, default=10)
+    parser.add_argument("--tts-batch-size", type=int, default=20)
+    parser.add_argument("--tts-concurrency", type=int, default=32)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--output", help="also write the JSON report here")
+    parser.add_argument("--compare", help="baseline JSON report to diff against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed regression (0.1 = 10%%)")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ Regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+Clients - Lazily configured, process-wide upstream clients
+Nothing happens at import time: the first use of get_clients() reads .env,
+checks the API keys, imports fal_client / google.generativeai and configures
+them once. Every job then shares the same clients and Gemini model objects.
+SHORTS_MOCK_BACKENDS=1 swaps in mock_backends.py (no keys, no network).
+"""
+
+import os
+import time
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from log import get_logger
+
+logger = get_logger("clients")
+
+GEMINI_MODEL = "gemini-1.5-flash"
+
+_env_lock = threading.Lock()
+_env_loaded = False
+
+
+def load_environment() -> None:
+    """Apply the .env file to os.environ once (variables already set win)"""
+    global _env_loaded
+    with _env_lock:
+        if _env_loaded:
+            return
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+
+def mock_backends_enabled() -> bool:
+    load_environment()
+    return os.getenv("SHORTS_MOCK_BACKENDS", "0") == "1"
+
+
+class ClientRegistry:
+    """
+    Gemini and Fal.ai clients, created on first use
+
+    mock=None follows SHORTS_MOCK_BACKENDS; pass True/False to override
+    (e.g. ClientRegistry(mock=True) in tests). In mock mode, fal and
+    gemini replace the default MockFal / MockGeminiModel factory (benchmark.py
+    passes instances with realistic latency profiles).
+    """
+
+    def __init__(
+        self,
+        mock: Optional[bool] = None,
+        fal: Any = None,
+        gemini: Optional[Callable[[str], Any]] = None
+    ):
+        self._mock = mock
+        self._fal_override = fal
+        self._gemini_factory = gemini
+        self._lock = threading.RLock()
+        self._initialized = False
+        self._fal: Any = None
+        self._genai: Any = None
+        self._models: Dict[str, Any] = {}
+        self.init_seconds: Optional[float] = None
+
+    @property
+    def mock(self) -> bool:
+        if self._mock is None:
+            self._mock = mock_backends_enabled()
+        return self._mock
+
+    def initialize(self) -> "ClientRegistry":
+        """Validate configuration and set up the clients (idempotent)"""
+        with self._lock:
+            if self._initialized:
+                return self
+            started = time.perf_counter()
+            load_environment()
+
+            if self.mock:
+                from mock_backends import MockFal
+                self._fal = self._fal_override or MockFal()
+            else:
+                fal_key = os.getenv("FAL_KEY")
+                gemini_key = os.getenv("GEMINI_API_KEY")
+                if not fal_key:
+                    raise ValueError("FAL_KEY not found in environment variables")
+                if not gemini_key:
+                    raise ValueError("GEMINI_API_KEY not found in environment variables")
+
+                # fal_client reads FAL_KEY from the environment
+                import fal_client
+                import google.generativeai as genai
+                genai.configure(api_key=gemini_key)
+                self._fal = fal_client
+                self._genai = genai
+
+            self.init_seconds = time.perf_counter() - started
+            self._initialized = True
+            logger.info(
+                "🔌 Upstream clients ready",
+                extra={"mode": "mock" if self.mock else "live", "seconds": round(self.init_seconds, 3)}
+            )
+        return self
+
+    @property
+    def fal(self) -> Any:
+        """fal_client module (or MockFal); exposes submit_async"""
+        return self.initialize()._fal
+
+    def gemini_model(self, name: str = GEMINI_MODEL) -> Any:
+        """Shared GenerativeModel for name (or MockGeminiModel)"""
+        with self._lock:
+            self.initialize()
+            model = self._models.get(name)
+            if model is None:
+                if self.mock:
+                    from mock_backends import MockGeminiModel
+                    model = (self._gemini_factory or MockGeminiModel)(name)
+                else:
+                    model = self._genai.GenerativeModel(name)
+                self._models[name] = model
+            return model
+
+    def stats(self) -> Dict:
+        return {
+            "mode": "mock" if self.mock else "live",
+            "initialized": self._initialized,
+            "init_seconds": round(self.init_seconds, 3) if self.init_seconds is not None else None,
+            "gemini_models": sorted(self._models),
+        }
+
+
+_default_registry: Optional[ClientRegistry] = None
+_default_lock = threading.Lock()
+
+
+def get_clients() -> ClientRegistry:
+    """Process-wide client registry (created, not initialized, on first call)"""
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            _default_registry = ClientRegistry()
+        return _default_registry
+
+
+def set_clients(registry: ClientRegistry) -> None:
+    """Replace the process-wide registry (before any job starts)"""
+    global _default_registry
+    with _default_lock:
+        _default_registry = registry
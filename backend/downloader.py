@@ -0,0 +1,301 @@
+"""
+Downloader - Shared, pooled fetcher for Fal.ai outputs
+One keep-alive HTTP client per event loop (HTTP/2 when h2 is installed),
+per-host concurrency limits, fixed-size chunked writes to disk, resumable
+range requests and size/SHA-256 verification. Used to mirror generated clips
+into a local content store and by video assembly.
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+import weakref
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from rate_limiter import backoff_delay, is_retryable
+from log import get_logger
+
+logger = get_logger("downloader")
+
+# Downloader configuration
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("SHORTS_DOWNLOAD_CHUNK_SIZE", 1 << 16))  # bytes
+DOWNLOAD_MAX_CONNECTIONS = int(os.getenv("SHORTS_DOWNLOAD_MAX_CONNECTIONS", 20))
+DOWNLOAD_PER_HOST = int(os.getenv("SHORTS_DOWNLOAD_PER_HOST", 4))
+DOWNLOAD_RETRIES = int(os.getenv("SHORTS_DOWNLOAD_RETRIES", 3))
+DOWNLOAD_TIMEOUT = float(os.getenv("SHORTS_DOWNLOAD_TIMEOUT", 120))  # seconds
+DOWNLOAD_HEAD_TIMEOUT = float(os.getenv("SHORTS_DOWNLOAD_HEAD_TIMEOUT", 10))  # seconds, URL liveness checks
+
+# Local content store for mirrored assets (files named by a hash of their URL)
+ASSET_DIR = os.getenv(
+    "SHORTS_ASSET_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "assets")
+)
+
+
+class DownloadError(Exception):
+    """
+    Raised when a download fails
+
+    status_code is set for HTTP errors, so rate_limiter.is_retryable treats
+    4xx as fatal; errors without one (truncation, checksum) are retried.
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ChecksumError(DownloadError):
+    """Downloaded bytes do not match the expected size or SHA-256"""
+
+
+@dataclass
+class DownloadResult:
+    """A file on disk and what was verified about it"""
+    path: str
+    size: int
+    sha256: str
+    resumed: bool = False
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _hash_file(path: str, chunk_size: int):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(chunk)
+    return hasher
+
+
+def asset_path(url: str, directory: str = ASSET_DIR) -> str:
+    """Content-store path for a URL (keeps the URL's file extension)"""
+    ext = os.path.splitext(urlsplit(url).path)[1][:8] or ".bin"
+    return os.path.join(directory, hashlib.sha256(url.encode("utf-8")).hexdigest() + ext)
+
+
+class Downloader:
+    """Pooled HTTP downloader; pass client to use a custom transport (e.g. in tests)"""
+
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        per_host: int = DOWNLOAD_PER_HOST,
+        chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+        retries: int = DOWNLOAD_RETRIES
+    ):
+        self.client = client or httpx.AsyncClient(
+            http2=_http2_available(),
+            limits=httpx.Limits(
+                max_connections=DOWNLOAD_MAX_CONNECTIONS,
+                max_keepalive_connections=DOWNLOAD_MAX_CONNECTIONS
+            ),
+            timeout=DOWNLOAD_TIMEOUT,
+            follow_redirects=True
+        )
+        self.per_host = per_host
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.downloads = 0
+        self.bytes = 0
+        self.resumed = 0
+        self.retried = 0
+        self.failures = 0
+        self.store_hits = 0
+
+    def _host_slots(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        slots = self._hosts.get(host)
+        if slots is None:
+            slots = self._hosts[host] = asyncio.Semaphore(self.per_host)
+        return slots
+
+    async def download(
+        self,
+        url: str,
+        path: str,
+        sha256: Optional[str] = None,
+        size: Optional[int] = None
+    ) -> DownloadResult:
+        """
+        Stream url to path, resuming and retrying transient failures
+
+        Bytes go to path + ".part" and are renamed into place only after the
+        length (and sha256/size, if given) check out, so readers never see a
+        partial file. A leftover .part file is resumed with a Range request.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        async with self._host_slots(url):
+            for attempt in range(self.retries):
+                try:
+                    result = await self._attempt(url, path, sha256, size)
+                except Exception as e:
+                    if attempt >= self.retries - 1 or not is_retryable(e):
+                        self.failures += 1
+                        raise
+                    self.retried += 1
+                    logger.warning(
+                        "⚠️ Download attempt failed",
+                        extra={"attempt": attempt + 1, "of": self.retries, "error": str(e)}
+                    )
+                    await asyncio.sleep(backoff_delay(attempt, e))
+                    continue
+                self.downloads += 1
+                return result
+
+    async def _attempt(
+        self,
+        url: str,
+        path: str,
+        sha256: Optional[str],
+        size: Optional[int]
+    ) -> DownloadResult:
+        part = f"{path}.part"
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        # Identity encoding: Range offsets and Content-Length count the bytes we store
+        headers = {"Accept-Encoding": "identity"}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+
+        async with self.client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 416:
+                # Our partial file is not a prefix the server recognises
+                os.remove(part)
+                raise DownloadError("Range not satisfiable, restarting")
+            if response.status_code == 206 and offset:
+                hasher = await asyncio.to_thread(_hash_file, part, self.chunk_size)
+                mode = "ab"
+                self.resumed += 1
+            elif response.status_code == 200:
+                hasher = hashlib.sha256()
+                mode = "wb"
+                offset = 0
+            else:
+                raise DownloadError(
+                    f"Download failed ({response.status_code}): {url[:80]}",
+                    status_code=response.status_code
+                )
+
+            length = response.headers.get("content-length")
+            expected = offset + int(length) if length is not None else None
+            received = offset
+            with open(part, mode) as f:
+                async for chunk in response.aiter_raw(self.chunk_size):
+                    f.write(chunk)
+                    hasher.update(chunk)
+                    received += len(chunk)
+                    self.bytes += len(chunk)
+
+        if expected is not None and received != expected:
+            # Keep the part file: the next attempt resumes from here
+            raise DownloadError(f"Truncated download ({received}/{expected} bytes)")
+
+        digest = hasher.hexdigest()
+        if (size is not None and received != size) or (sha256 and digest != sha256.lower()):
+            os.remove(part)
+            raise ChecksumError(f"Integrity check failed for {url[:80]}")
+
+        os.replace(part, path)
+        return DownloadResult(path=path, size=received, sha256=digest, resumed=mode == "ab")
+
+    async def is_live(self, url: str) -> bool:
+        """Whether url is still served (HEAD request); False on any error"""
+        try:
+            async with self._host_slots(url):
+                response = await self.client.head(url, timeout=DOWNLOAD_HEAD_TIMEOUT)
+        except httpx.HTTPError:
+            return False
+        return response.status_code < 400
+
+    async def fetch(
+        self,
+        url: str,
+        directory: str = ASSET_DIR,
+        sha256: Optional[str] = None,
+        size: Optional[int] = None
+    ) -> str:
+        """
+        Path of url in the local content store, downloading it if needed
+
+        Concurrent fetches of the same URL share one download.
+        """
+        path = asset_path(url, directory)
+        if os.path.exists(path):
+            self.store_hits += 1
+            os.utime(path, None)
+            return path
+
+        task = self._inflight.get(path)
+        if task is None:
+            task = asyncio.create_task(self.download(url, path, sha256, size))
+            self._inflight[path] = task
+            task.add_done_callback(lambda _: self._inflight.pop(path, None))
+        # Shielded: one caller giving up must not cancel the others' download
+        await asyncio.shield(task)
+        return path
+
+    def stats(self) -> Dict:
+        return {
+            "http2": _http2_available(),
+            "downloads": self.downloads,
+            "bytes": self.bytes,
+            "resumed": self.resumed,
+            "retried": self.retried,
+            "failures": self.failures,
+            "store_hits": self.store_hits,
+            "in_flight": len(self._inflight),
+        }
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+def prune_directory(directory: str = ASSET_DIR, max_age: int = 7 * 24 * 3600) -> int:
+    """Delete mirrored files not used for max_age seconds; returns number removed"""
+    if not os.path.isdir(directory):
+        return 0
+    cutoff = time.time() - max_age
+    removed = 0
+    for entry in os.scandir(directory):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+# The HTTP connection pool is tied to its event loop, so each loop gets its own
+_downloaders: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Downloader]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_downloader() -> Downloader:
+    """Shared downloader for the current event loop"""
+    loop = asyncio.get_running_loop()
+    downloader = _downloaders.get(loop)
+    if downloader is None:
+        downloader = _downloaders[loop] = Downloader()
+    return downloader
+
+
+async def close_downloader() -> None:
+    """Close the current loop's connection pool (e.g. on server shutdown)"""
+    downloader = _downloaders.pop(asyncio.get_running_loop(), None)
+    if downloader is not None:
+        await downloader.close()
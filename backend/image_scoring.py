@@ -0,0 +1,158 @@
+"""
+Image Scoring - Cheap local best-of selection between Flux candidates
+Candidates flagged by Fal.ai's safety checker are dropped; the rest are
+ranked by sharpness and, when a previous scene's frame is known, by colour
+consistency with it. Uses Pillow when installed (pip install Pillow);
+otherwise JPEG size stands in for detail and consistency is skipped.
+"""
+
+import io
+import os
+import asyncio
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from downloader import get_downloader
+from log import get_logger
+
+logger = get_logger("image_scoring")
+
+# Weight of colour consistency with the previous scene vs. sharpness (0..1 each)
+CONSISTENCY_WEIGHT = float(os.getenv("SHORTS_IMAGE_CONSISTENCY_WEIGHT", 0.5))
+
+# Edge of the thumbnail features are computed on, in pixels
+THUMBNAIL_SIZE = 256
+
+# Reference frames whose features are kept in memory
+REFERENCE_CACHE_SIZE = 64
+
+
+class ImageRejected(Exception):
+    """Every candidate was unusable (retryable: the next attempt draws new ones)"""
+
+
+def _pillow_available() -> bool:
+    try:
+        import PIL  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _features(data: bytes) -> Tuple[float, Optional[List[float]]]:
+    """(sharpness, normalized colour histogram) of an encoded image"""
+    if not _pillow_available():
+        # Same size and quality setting: a larger JPEG carries more detail
+        return float(len(data)), None
+
+    from PIL import Image, ImageFilter, ImageStat
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert("RGB")
+        image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        edges = image.convert("L").filter(ImageFilter.FIND_EDGES)
+        sharpness = ImageStat.Stat(edges).var[0]
+        histogram = image.histogram()
+
+    # 16 coarse bins per channel, so small shifts in tone still match
+    bins = [sum(histogram[i:i + 16]) for i in range(0, len(histogram), 16)]
+    total = float(sum(bins)) or 1.0
+    return sharpness, [count / total for count in bins]
+
+
+def _similarity(a: List[float], b: List[float]) -> float:
+    """Histogram intersection, 0 (disjoint) to 1 (identical)"""
+    return sum(min(x, y) for x, y in zip(a, b))
+
+
+class ImageScorer:
+    """Picks one image out of a multi-image Flux result"""
+
+    def __init__(self, consistency_weight: float = CONSISTENCY_WEIGHT):
+        self.consistency_weight = consistency_weight
+        self._references: "OrderedDict[str, Optional[List[float]]]" = OrderedDict()
+        self.batches = 0
+        self.candidates = 0
+        self.rejected = 0
+        self.unscored = 0
+
+    async def _load(self, url: str) -> Tuple[float, Optional[List[float]]]:
+        response = await get_downloader().client.get(url)
+        response.raise_for_status()
+        return await asyncio.to_thread(_features, response.content)
+
+    async def _reference(self, url: str) -> Optional[List[float]]:
+        if url in self._references:
+            self._references.move_to_end(url)
+            return self._references[url]
+        try:
+            _, histogram = await self._load(url)
+        except Exception as e:
+            logger.warning("⚠️ Could not load reference frame", extra={"error": str(e)})
+            histogram = None
+        self._remember(url, histogram)
+        return histogram
+
+    def _remember(self, url: str, histogram: Optional[List[float]]) -> None:
+        self._references[url] = histogram
+        self._references.move_to_end(url)
+        while len(self._references) > REFERENCE_CACHE_SIZE:
+            self._references.popitem(last=False)
+
+    async def choose(self, result: Dict, reference_url: Optional[str] = None) -> str:
+        """
+        URL of the best image in a Flux result
+
+        Raises ImageRejected when the safety checker flagged every candidate.
+        Candidates that cannot be downloaded or decoded rank last; if none can
+        be scored, the first usable one wins.
+        """
+        images = result.get("images") or []
+        flagged = result.get("has_nsfw_concepts") or []
+        usable = [
+            image["url"] for i, image in enumerate(images)
+            if not (i < len(flagged) and flagged[i])
+        ]
+        self.batches += 1
+        self.candidates += len(images)
+        self.rejected += len(images) - len(usable)
+        if not usable:
+            raise ImageRejected(f"All {len(images)} candidates were flagged by the safety checker")
+        if len(usable) == 1:
+            return usable[0]
+
+        reference, *loaded = await asyncio.gather(
+            self._reference(reference_url) if reference_url else asyncio.sleep(0),
+            *(self._load(url) for url in usable),
+            return_exceptions=True
+        )
+        if isinstance(reference, BaseException):
+            reference = None
+
+        scored = [(url, features) for url, features in zip(usable, loaded) if not isinstance(features, BaseException)]
+        self.unscored += len(usable) - len(scored)
+        if not scored:
+            return usable[0]
+
+        top_sharpness = max(sharpness for _, (sharpness, _) in scored) or 1.0
+
+        def score(item) -> float:
+            _, (sharpness, histogram) = item
+            value = sharpness / top_sharpness
+            if reference and histogram:
+                value += self.consistency_weight * _similarity(histogram, reference)
+            return value
+
+        best_url, (_, best_histogram) = max(scored, key=score)
+        # The chosen frame is the likely reference for the next scene
+        self._remember(best_url, best_histogram)
+        return best_url
+
+    def stats(self) -> Dict:
+        return {
+            "pillow": _pillow_available(),
+            "batches": self.batches,
+            "candidates": self.candidates,
+            "rejected": self.rejected,
+            "unscored": self.unscored,
+        }
@@ -0,0 +1,933 @@
+"""
+Job Queue - Shared work queue between the API tier and render workers
+A job is rendered as a graph of work units: its scenario, then an image and
+a clip unit per scene, then the final assembly, which waits on every clip.
+The API enqueues a job's scenario unit; the worker that finishes it adds
+the scene units, so one job's scenes fan out across the whole worker pool
+and fan back in at the assembly unit. Unit results (image URLs, finished
+scenes, timings) stay in the queue until the job is purged.
+
+Render workers (shorts_worker.py) claim ready units (every unit they need
+is done) with a time-limited lease that they renew by heartbeat. A lease
+that expires (crashed or stuck worker) is reclaimed and the unit is queued
+again, up to SHORTS_JOB_MAX_ATTEMPTS claims. Backends: SQLite (processes on
+one host, same file as the job store) and Redis (hosts sharing one Redis).
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from job_scheduler import SCHEDULER_MAX_PER_CLIENT, SCHEDULER_MAX_QUEUE, QueueFullError
+from job_store import JOB_STORE_PATH, REDIS_URL
+
+# Queue configuration
+JOB_QUEUE_BACKEND = os.getenv("SHORTS_JOB_QUEUE", "sqlite")  # sqlite | redis
+LEASE_SECONDS = float(os.getenv("SHORTS_LEASE_SECONDS", 60))
+MAX_ATTEMPTS = int(os.getenv("SHORTS_JOB_MAX_ATTEMPTS", 3))  # claims of one unit before it is given up
+
+# heartbeat() outcomes
+LEASE_OK = "ok"
+LEASE_CANCEL = "cancel"  # still ours, but the API asked to stop the job
+LEASE_LOST = "lost"  # expired and reclaimed, or removed: stop without writing
+
+# Work unit kinds
+UNIT_SCENARIO = "scenario"
+UNIT_IMAGE = "image"
+UNIT_CLIP = "clip"
+UNIT_ASSEMBLE = "assemble"
+
+# Claim order among one job's ready units: closest to done first
+UNIT_STAGES = {UNIT_ASSEMBLE: 0, UNIT_CLIP: 1, UNIT_IMAGE: 2, UNIT_SCENARIO: 3}
+
+# Units whose failure only drops their scene from the video
+SCENE_UNITS = (UNIT_IMAGE, UNIT_CLIP)
+
+
+def lost_result(attempts: int) -> Dict:
+    """Result recorded for a scene unit whose workers kept getting lost"""
+    return {"error": f"Render workers were lost {attempts} times while running it"}
+
+
+def unit_id(job_id: str, kind: str, scene_id: Optional[int] = None) -> str:
+    """Queue id of one unit of a job"""
+    return f"{job_id}:{kind}" if scene_id is None else f"{job_id}:{kind}:{scene_id}"
+
+
+def unit_job(unit: str) -> str:
+    """Job id of a unit id (job ids are UUIDs, without colons)"""
+    return unit.split(":", 1)[0]
+
+
+def unit_parts(unit: str) -> Tuple[str, str, Optional[int]]:
+    """Job id, kind and scene id of a unit id"""
+    job_id, kind, *scene = unit.split(":")
+    return job_id, kind, int(scene[0]) if scene else None
+
+
+@dataclass
+class WorkUnit:
+    """A unit to add to a job; it is ready once every unit it needs is done"""
+    job_id: str
+    kind: str
+    scene_id: Optional[int] = None
+    needs: List[str] = field(default_factory=list)  # unit ids
+    payload: Optional[Dict] = None  # what the unit works on (e.g. its scene)
+
+    @property
+    def unit_id(self) -> str:
+        return unit_id(self.job_id, self.kind, self.scene_id)
+
+
+@dataclass
+class Lease:
+    """A worker's claim on one work unit"""
+    unit_id: str
+    job_id: str
+    kind: str
+    scene_id: Optional[int]
+    worker_id: str
+    attempt: int
+    expires_at: float
+    payload: Optional[Dict] = None
+    lost: bool = False  # the unit is no longer ours to write (lease lost or handed back)
+
+
+class JobQueue(ABC):
+    """Queue interface shared by the API (producer) and workers (consumers)"""
+
+    def __init__(self, max_queue: int = SCHEDULER_MAX_QUEUE, max_per_client: int = SCHEDULER_MAX_PER_CLIENT):
+        self.max_queue = max_queue
+        self.max_per_client = max_per_client
+
+    @abstractmethod
+    def enqueue(self, job_id: str, client_id: str, priority: int = 0) -> int:
+        """
+        Queue a job's scenario unit and return the job's position
+
+        Units left from an earlier run of the job are dropped. Raises
+        QueueFullError if the job is not admitted.
+        """
+
+    @abstractmethod
+    def claim(self, worker_id: str, lease_seconds: float = LEASE_SECONDS) -> Optional[Lease]:
+        """Lease the next ready unit (highest priority, then oldest job), or None"""
+
+    @abstractmethod
+    def heartbeat(self, lease: Lease, lease_seconds: float = LEASE_SECONDS) -> str:
+        """Extend a lease; returns LEASE_OK, LEASE_CANCEL or LEASE_LOST"""
+
+    @abstractmethod
+    def complete(self, lease: Lease, result: Dict, spawn: Iterable[WorkUnit] = ()) -> bool:
+        """
+        Store a finished unit's result and add the units it fans out to
+
+        Units for which this was the last unfinished need become ready.
+        Spawned units that already exist are left alone, so a unit that is
+        run again after a lost lease can spawn the same units safely.
+        Returns False (and marks the lease lost) if the unit is not ours.
+        """
+
+    @abstractmethod
+    def release(self, lease: Lease) -> bool:
+        """Hand a leased unit back to the queue without counting the attempt"""
+
+    @abstractmethod
+    def results(self, job_id: str, kind: str) -> Dict[Optional[int], Dict]:
+        """Results of a job's finished units of one kind, by scene id"""
+
+    @abstractmethod
+    def remove(self, job_id: str) -> bool:
+        """Drop a job none of whose units is leased; False if one is, or it has none"""
+
+    @abstractmethod
+    def purge(self, job_id: str) -> bool:
+        """Drop every unit of a job; False if it had none (someone else purged it)"""
+
+    @abstractmethod
+    def request_cancel(self, job_id: str) -> bool:
+        """Ask the workers holding units of job_id to stop them; False if none is leased"""
+
+    @abstractmethod
+    def reclaim_expired(self) -> Tuple[List[str], List[str], List[str]]:
+        """
+        Requeue units whose lease expired; returns unit ids (requeued, failed, dead)
+
+        A scene unit out of attempts is completed with an error result, like a
+        scene that failed while running, so the job goes on without it
+        (failed). Other units out of attempts, and units of a job being
+        cancelled, are parked as done without unblocking anything; the caller
+        ends their job (dead).
+        """
+
+    @abstractmethod
+    def is_leased(self, job_id: str) -> bool:
+        """Whether a worker currently holds a unit of job_id"""
+
+    @abstractmethod
+    def has_units(self, job_id: str) -> bool:
+        """Whether job_id has units left in the queue (False once purged or never enqueued)"""
+
+    @abstractmethod
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based position among jobs not started yet, or None if it has started"""
+
+    @abstractmethod
+    def stats(self) -> Dict:
+        """Jobs queued and started, ready and leased units, and workers holding leases"""
+
+
+class SQLiteJobQueue(JobQueue):
+    """SQLite-backed queue; every claim and completion is one IMMEDIATE transaction"""
+
+    # Nobody holds it and every unit it needs is done
+    READY = "worker_id IS NULL AND done = 0 AND waiting = 0"
+    # A job whose scenario unit has not been claimed yet
+    QUEUED = "kind = 'scenario' AND worker_id IS NULL AND done = 0"
+
+    def __init__(self, path: str = JOB_STORE_PATH, **limits):
+        super().__init__(**limits)
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_units (
+                unit_id TEXT PRIMARY KEY,
+                job_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                scene_id INTEGER,
+                stage INTEGER NOT NULL,
+                client_id TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                enqueued_at REAL NOT NULL,
+                payload TEXT,
+                waiting INTEGER NOT NULL DEFAULT 0,
+                worker_id TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                cancel INTEGER NOT NULL DEFAULT 0,
+                done INTEGER NOT NULL DEFAULT 0,
+                result TEXT
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_unit_needs (
+                unit_id TEXT NOT NULL,
+                needs TEXT NOT NULL,
+                PRIMARY KEY (unit_id, needs)
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_job_units_order "
+            "ON job_units(worker_id, done, waiting, priority, enqueued_at)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_job_units_job ON job_units(job_id, kind)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_job_units_client ON job_units(client_id, worker_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_job_units_lease ON job_units(lease_expires)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_job_unit_needs ON job_unit_needs(needs)")
+
+    def _transaction(self, work):
+        """Run work(conn) under the process lock and SQLite's write lock"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(self._conn)
+                self._conn.execute("COMMIT")
+                return result
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _position(self, conn, job_id: str) -> Optional[int]:
+        row = conn.execute(
+            f"SELECT priority, enqueued_at FROM job_units WHERE job_id = ? AND {self.QUEUED}", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        priority, enqueued_at = row
+        ahead = conn.execute(
+            f"SELECT COUNT(*) FROM job_units WHERE {self.QUEUED} "
+            "AND (priority > ? OR (priority = ? AND enqueued_at < ?))",
+            (priority, priority, enqueued_at)
+        ).fetchone()[0]
+        return ahead + 1
+
+    @staticmethod
+    def _purge(conn, job_id: str) -> int:
+        conn.execute(
+            "DELETE FROM job_unit_needs WHERE unit_id IN (SELECT unit_id FROM job_units WHERE job_id = ?)",
+            (job_id,)
+        )
+        return conn.execute("DELETE FROM job_units WHERE job_id = ?", (job_id,)).rowcount
+
+    @staticmethod
+    def _insert(conn, unit: WorkUnit, client_id: str, priority: int, enqueued_at: float) -> None:
+        """Add a unit unless it exists, waiting on those of its needs not done"""
+        needs = list(dict.fromkeys(unit.needs))
+        waiting = 0
+        if needs:
+            marks = ", ".join("?" for _ in needs)
+            waiting = conn.execute(
+                f"SELECT COUNT(*) FROM job_units WHERE unit_id IN ({marks}) AND done = 0", needs
+            ).fetchone()[0]
+        inserted = conn.execute(
+            "INSERT OR IGNORE INTO job_units "
+            "(unit_id, job_id, kind, scene_id, stage, client_id, priority, enqueued_at, payload, waiting) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                unit.unit_id, unit.job_id, unit.kind, unit.scene_id, UNIT_STAGES.get(unit.kind, 0),
+                client_id, priority, enqueued_at,
+                json.dumps(unit.payload) if unit.payload is not None else None, waiting
+            )
+        ).rowcount
+        if inserted:
+            conn.executemany(
+                "INSERT OR IGNORE INTO job_unit_needs (unit_id, needs) VALUES (?, ?)",
+                [(unit.unit_id, need) for need in needs]
+            )
+
+    @staticmethod
+    def _finish(conn, unit: str, result: Dict) -> None:
+        """Mark a unit done with its result; units it was the last need of become ready"""
+        conn.execute(
+            "UPDATE job_units SET done = 1, worker_id = NULL, lease_expires = NULL, result = ? WHERE unit_id = ?",
+            (json.dumps(result), unit)
+        )
+        conn.execute(
+            "UPDATE job_units SET waiting = waiting - 1 WHERE waiting > 0 AND done = 0 "
+            "AND unit_id IN (SELECT unit_id FROM job_unit_needs WHERE needs = ?)",
+            (unit,)
+        )
+
+    def enqueue(self, job_id: str, client_id: str, priority: int = 0) -> int:
+        def work(conn):
+            queued = conn.execute(f"SELECT COUNT(*) FROM job_units WHERE {self.QUEUED}").fetchone()[0]
+            if queued >= self.max_queue:
+                raise QueueFullError(f"Queue is full ({self.max_queue} jobs waiting)")
+            if self.max_per_client:
+                mine = conn.execute(
+                    f"SELECT COUNT(*) FROM job_units WHERE {self.QUEUED} AND client_id = ?", (client_id,)
+                ).fetchone()[0]
+                if mine >= self.max_per_client:
+                    raise QueueFullError(f"Too many queued jobs for this client ({self.max_per_client} max)")
+            self._purge(conn, job_id)
+            self._insert(conn, WorkUnit(job_id, UNIT_SCENARIO), client_id, priority, time.time())
+            return self._position(conn, job_id)
+
+        return self._transaction(work)
+
+    def claim(self, worker_id: str, lease_seconds: float = LEASE_SECONDS) -> Optional[Lease]:
+        def work(conn):
+            # Among equal priorities, clients with fewer units being rendered go
+            # first, then the oldest job, and within a job its latest stage
+            row = conn.execute(
+                f"SELECT unit_id, job_id, kind, scene_id, payload, attempts FROM job_units AS q WHERE {self.READY} "
+                "ORDER BY priority DESC, "
+                "(SELECT COUNT(*) FROM job_units AS r WHERE r.client_id = q.client_id AND r.worker_id IS NOT NULL), "
+                "enqueued_at, stage, scene_id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            unit, job_id, kind, scene_id, payload, attempts = row
+            expires_at = time.time() + lease_seconds
+            conn.execute(
+                "UPDATE job_units SET worker_id = ?, lease_expires = ?, attempts = ?, cancel = 0 WHERE unit_id = ?",
+                (worker_id, expires_at, attempts + 1, unit)
+            )
+            return Lease(
+                unit, job_id, kind, scene_id, worker_id, attempts + 1, expires_at,
+                payload=json.loads(payload) if payload else None
+            )
+
+        return self._transaction(work)
+
+    def heartbeat(self, lease: Lease, lease_seconds: float = LEASE_SECONDS) -> str:
+        expires_at = time.time() + lease_seconds
+
+        def work(conn):
+            row = conn.execute(
+                "SELECT cancel FROM job_units WHERE unit_id = ? AND worker_id = ?", (lease.unit_id, lease.worker_id)
+            ).fetchone()
+            if row is None:
+                return LEASE_LOST
+            conn.execute("UPDATE job_units SET lease_expires = ? WHERE unit_id = ?", (expires_at, lease.unit_id))
+            return LEASE_CANCEL if row[0] else LEASE_OK
+
+        status = self._transaction(work)
+        if status == LEASE_LOST:
+            lease.lost = True
+        else:
+            lease.expires_at = expires_at
+        return status
+
+    def complete(self, lease: Lease, result: Dict, spawn: Iterable[WorkUnit] = ()) -> bool:
+        def work(conn):
+            row = conn.execute(
+                "SELECT client_id, priority, enqueued_at FROM job_units WHERE unit_id = ? AND worker_id = ?",
+                (lease.unit_id, lease.worker_id)
+            ).fetchone()
+            if row is None:
+                return False
+            self._finish(conn, lease.unit_id, result)
+            for unit in spawn:
+                self._insert(conn, unit, *row)
+            return True
+
+        completed = self._transaction(work)
+        if not completed:
+            lease.lost = True
+        return completed
+
+    def release(self, lease: Lease) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE job_units SET worker_id = NULL, lease_expires = NULL, attempts = MAX(attempts - 1, 0) "
+                "WHERE unit_id = ? AND worker_id = ?",
+                (lease.unit_id, lease.worker_id)
+            ).rowcount > 0
+
+    def results(self, job_id: str, kind: str) -> Dict[Optional[int], Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT scene_id, result FROM job_units WHERE job_id = ? AND kind = ? AND done = 1", (job_id, kind)
+            ).fetchall()
+        return {scene_id: json.loads(result) for scene_id, result in rows}
+
+    def remove(self, job_id: str) -> bool:
+        def work(conn):
+            leased = conn.execute(
+                "SELECT 1 FROM job_units WHERE job_id = ? AND worker_id IS NOT NULL", (job_id,)
+            ).fetchone()
+            return leased is None and self._purge(conn, job_id) > 0
+
+        return self._transaction(work)
+
+    def purge(self, job_id: str) -> bool:
+        return self._transaction(lambda conn: self._purge(conn, job_id)) > 0
+
+    def request_cancel(self, job_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE job_units SET cancel = 1 WHERE job_id = ? AND worker_id IS NOT NULL", (job_id,)
+            ).rowcount > 0
+
+    def reclaim_expired(self) -> Tuple[List[str], List[str], List[str]]:
+        def work(conn):
+            rows = conn.execute(
+                "SELECT unit_id, kind, attempts, cancel FROM job_units "
+                "WHERE worker_id IS NOT NULL AND lease_expires < ?",
+                (time.time(),)
+            ).fetchall()
+            requeued, failed, dead = [], [], []
+            for unit, kind, attempts, cancel in rows:
+                if not cancel and attempts >= MAX_ATTEMPTS and kind in SCENE_UNITS:
+                    self._finish(conn, unit, lost_result(attempts))
+                    failed.append(unit)
+                elif cancel or attempts >= MAX_ATTEMPTS:
+                    # Parked as done without unblocking anything; the caller ends the job
+                    conn.execute(
+                        "UPDATE job_units SET worker_id = NULL, lease_expires = NULL, done = 1, result = ? "
+                        "WHERE unit_id = ?",
+                        (json.dumps({"error": "lease expired"}), unit)
+                    )
+                    dead.append(unit)
+                else:
+                    conn.execute(
+                        "UPDATE job_units SET worker_id = NULL, lease_expires = NULL WHERE unit_id = ?", (unit,)
+                    )
+                    requeued.append(unit)
+            return requeued, failed, dead
+
+        return self._transaction(work)
+
+    def is_leased(self, job_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM job_units WHERE job_id = ? AND worker_id IS NOT NULL", (job_id,)
+            ).fetchone() is not None
+
+    def has_units(self, job_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM job_units WHERE job_id = ?", (job_id,)
+            ).fetchone() is not None
+
+    def position(self, job_id: str) -> Optional[int]:
+        with self._lock:
+            return self._position(self._conn, job_id)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            queued, jobs, ready, leased, workers = self._conn.execute(
+                f"SELECT SUM({self.QUEUED}), COUNT(DISTINCT job_id), SUM({self.READY}), SUM(worker_id IS NOT NULL), "
+                "COUNT(DISTINCT worker_id) FROM job_units"
+            ).fetchone()
+        return {
+            "queued": queued or 0,
+            "running": jobs - (queued or 0),
+            "ready": ready or 0,
+            "leased": leased or 0,
+            "workers": workers or 0,
+        }
+
+
+class RedisJobQueue(JobQueue):
+    """
+    Redis-backed queue
+
+    Ready units live in a sorted set ordered by (priority, job enqueue time),
+    with ties broken by unit id, which puts a job's assembly before its clips,
+    images and scenario. Jobs not started yet are mirrored in a second set
+    (positions and admission) and leases in a set scored by expiry. Per-unit
+    fields are a hash at `<prefix>queue:unit:<id>`, the units waiting on a
+    unit a set at `<prefix>queue:needed-by:<id>` and a job's units a set at
+    `<prefix>queue:units:<job id>`. Claims, completions and reclaims use
+    WATCH/MULTI, so several workers can race safely. Any redis-py
+    compatible client works.
+    """
+
+    def __init__(self, client=None, url: str = REDIS_URL, prefix: str = "shorts:", **limits):
+        super().__init__(**limits)
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("RedisJobQueue requires the 'redis' package (pip install redis)") from e
+        self._watch_error = redis.exceptions.WatchError
+        self.redis = client if client is not None else redis.Redis.from_url(url)
+        self.queued_key = f"{prefix}queue:queued"
+        self.ready_key = f"{prefix}queue:ready"
+        self.leases_key = f"{prefix}queue:leases"
+        self.prefix = prefix
+
+    def _unit_key(self, unit: str) -> str:
+        return f"{self.prefix}queue:unit:{unit}"
+
+    def _needed_by_key(self, unit: str) -> str:
+        return f"{self.prefix}queue:needed-by:{unit}"
+
+    def _units_key(self, job_id: str) -> str:
+        return f"{self.prefix}queue:units:{job_id}"
+
+    @staticmethod
+    def _text(value) -> Optional[str]:
+        return value.decode() if isinstance(value, bytes) else value
+
+    @staticmethod
+    def _score(priority: int, enqueued_at: float) -> float:
+        # Higher priority first, then FIFO (timestamps stay below 1e10 seconds)
+        return -priority * 1e10 + enqueued_at
+
+    def _fields(self, unit: str, client=None) -> Dict[str, str]:
+        raw = (client or self.redis).hgetall(self._unit_key(unit))
+        return {self._text(key): self._text(value) for key, value in raw.items()}
+
+    def _members(self, key: str, client=None) -> List[str]:
+        return [self._text(member) for member in (client or self.redis).smembers(key)]
+
+    def _lease(self, unit: str, fields: Dict[str, str], worker_id: str, attempt: int, expires_at: float) -> Lease:
+        scene_id = fields.get("scene_id")
+        return Lease(
+            unit, fields["job_id"], fields["kind"], int(scene_id) if scene_id else None,
+            worker_id, attempt, expires_at,
+            payload=json.loads(fields["payload"]) if fields.get("payload") else None
+        )
+
+    def _queue_unit(self, pipe, unit: str, fields: Dict[str, str]) -> None:
+        """Make a unit claimable (pipe is in MULTI)"""
+        score = self._score(int(fields.get("priority") or 0), float(fields.get("enqueued_at") or time.time()))
+        pipe.zadd(self.ready_key, {unit: score})
+        if fields.get("kind") == UNIT_SCENARIO:
+            pipe.zadd(self.queued_key, {fields["job_id"]: score})
+
+    @staticmethod
+    def _unit_fields(unit: WorkUnit, client_id: str, priority: int, enqueued_at: float, waiting: int) -> Dict[str, str]:
+        fields = {
+            "job_id": unit.job_id, "kind": unit.kind, "client_id": client_id, "priority": str(priority),
+            "enqueued_at": repr(enqueued_at), "attempts": "0", "cancel": "0", "done": "0", "waiting": str(waiting),
+        }
+        if unit.scene_id is not None:
+            fields["scene_id"] = str(unit.scene_id)
+        if unit.payload is not None:
+            fields["payload"] = json.dumps(unit.payload)
+        return fields
+
+    def _plan_units(
+        self, pipe, units: List[WorkUnit], client_id: str, priority: int, enqueued_at: float
+    ) -> List[Tuple[WorkUnit, Dict[str, str], List[str]]]:
+        """
+        Read what adding units takes (pipe is watching, not yet in MULTI)
+
+        Returns the units that do not exist yet, with their fields and their
+        needs that are not done; every key read is watched.
+        """
+        new = []
+        for unit in units:
+            pipe.watch(self._unit_key(unit.unit_id))
+            if not pipe.exists(self._unit_key(unit.unit_id)):
+                new.append(unit)
+        new_ids = {unit.unit_id for unit in new}
+        plan = []
+        for unit in new:
+            pending = []
+            for need in dict.fromkeys(unit.needs):
+                if need not in new_ids:
+                    pipe.watch(self._unit_key(need))
+                    if self._text(pipe.hget(self._unit_key(need), "done")) != "0":
+                        continue
+                pending.append(need)
+            plan.append((unit, self._unit_fields(unit, client_id, priority, enqueued_at, len(pending)), pending))
+        return plan
+
+    def _write_units(self, pipe, plan: List[Tuple[WorkUnit, Dict[str, str], List[str]]]) -> None:
+        """Write planned units (pipe is in MULTI)"""
+        for unit, fields, pending in plan:
+            pipe.hset(self._unit_key(unit.unit_id), mapping=fields)
+            pipe.sadd(self._units_key(unit.job_id), unit.unit_id)
+            for need in pending:
+                pipe.sadd(self._needed_by_key(need), unit.unit_id)
+            if not pending:
+                self._queue_unit(pipe, unit.unit_id, fields)
+
+    def _purge(self, pipe, job_id: str, units: List[str]) -> None:
+        """Delete a job's units (pipe is in MULTI)"""
+        for unit in units:
+            pipe.delete(self._unit_key(unit), self._needed_by_key(unit))
+        if units:
+            pipe.zrem(self.ready_key, *units)
+            pipe.zrem(self.leases_key, *units)
+        pipe.zrem(self.queued_key, job_id)
+        pipe.delete(self._units_key(job_id))
+
+    def _queued_count(self, client_id: Optional[str] = None) -> int:
+        if client_id is None:
+            return self.redis.zcard(self.queued_key)
+        return sum(
+            1 for job_id in self.redis.zrange(self.queued_key, 0, -1)
+            if self._text(self.redis.hget(
+                self._unit_key(unit_id(self._text(job_id), UNIT_SCENARIO)), "client_id"
+            )) == client_id
+        )
+
+    def enqueue(self, job_id: str, client_id: str, priority: int = 0) -> int:
+        # Admission is checked without a transaction: a burst may overshoot by a few jobs
+        if self._queued_count() >= self.max_queue:
+            raise QueueFullError(f"Queue is full ({self.max_queue} jobs waiting)")
+        if self.max_per_client and self._queued_count(client_id) >= self.max_per_client:
+            raise QueueFullError(f"Too many queued jobs for this client ({self.max_per_client} max)")
+        scenario = WorkUnit(job_id, UNIT_SCENARIO)
+        fields = self._unit_fields(scenario, client_id, priority, time.time(), 0)
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(self._units_key(job_id))
+                    units = self._members(self._units_key(job_id), pipe)
+                    pipe.multi()
+                    self._purge(pipe, job_id, units)
+                    self._write_units(pipe, [(scenario, fields, [])])
+                    pipe.execute()
+                    break
+                except self._watch_error:
+                    continue
+        return self.position(job_id) or 1
+
+    def claim(self, worker_id: str, lease_seconds: float = LEASE_SECONDS) -> Optional[Lease]:
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(self.ready_key)
+                    head = pipe.zrange(self.ready_key, 0, 0)
+                    if not head:
+                        pipe.unwatch()
+                        return None
+                    unit = self._text(head[0])
+                    fields = self._fields(unit, pipe)
+                    attempts = int(fields.get("attempts") or 0) + 1
+                    expires_at = time.time() + lease_seconds
+                    pipe.multi()
+                    pipe.zrem(self.ready_key, unit)
+                    if fields.get("kind") == UNIT_SCENARIO:
+                        pipe.zrem(self.queued_key, fields["job_id"])
+                    pipe.zadd(self.leases_key, {unit: expires_at})
+                    pipe.hset(self._unit_key(unit), mapping={
+                        "worker_id": worker_id, "attempts": attempts, "cancel": 0,
+                    })
+                    pipe.execute()
+                    return self._lease(unit, fields, worker_id, attempts, expires_at)
+                except self._watch_error:
+                    continue
+
+    def _owned(self, pipe, lease: Lease) -> Optional[Dict[str, str]]:
+        """The unit's fields if lease still holds it (pipe is watching the unit)"""
+        pipe.watch(self._unit_key(lease.unit_id), self.leases_key)
+        fields = self._fields(lease.unit_id, pipe)
+        if fields.get("worker_id") != lease.worker_id or pipe.zscore(self.leases_key, lease.unit_id) is None:
+            pipe.unwatch()
+            return None
+        return fields
+
+    def _waiting_dependents(self, pipe, unit: str) -> Dict[str, Dict[str, str]]:
+        """Fields of the units still waiting on unit (pipe is watching, not yet in MULTI)"""
+        pipe.watch(self._needed_by_key(unit))
+        waiting = {}
+        for dependent in self._members(self._needed_by_key(unit), pipe):
+            pipe.watch(self._unit_key(dependent))
+            dependent_fields = self._fields(dependent, pipe)
+            if dependent_fields.get("done") == "0":
+                waiting[dependent] = dependent_fields
+        return waiting
+
+    def _finish(self, pipe, unit: str, result: Dict, waiting: Dict[str, Dict[str, str]]) -> None:
+        """Mark a unit done and queue the dependents it was the last need of (pipe is in MULTI)"""
+        pipe.zrem(self.leases_key, unit)
+        pipe.hdel(self._unit_key(unit), "worker_id")
+        pipe.hset(self._unit_key(unit), mapping={"done": 1, "result": json.dumps(result)})
+        for dependent, dependent_fields in waiting.items():
+            left = max(int(dependent_fields.get("waiting") or 0) - 1, 0)
+            pipe.hset(self._unit_key(dependent), "waiting", left)
+            if not left:
+                self._queue_unit(pipe, dependent, dependent_fields)
+
+    def heartbeat(self, lease: Lease, lease_seconds: float = LEASE_SECONDS) -> str:
+        expires_at = time.time() + lease_seconds
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    fields = self._owned(pipe, lease)
+                    if fields is None:
+                        lease.lost = True
+                        return LEASE_LOST
+                    pipe.multi()
+                    pipe.zadd(self.leases_key, {lease.unit_id: expires_at})
+                    pipe.execute()
+                    lease.expires_at = expires_at
+                    return LEASE_CANCEL if fields.get("cancel") == "1" else LEASE_OK
+                except self._watch_error:
+                    continue
+
+    def complete(self, lease: Lease, result: Dict, spawn: Iterable[WorkUnit] = ()) -> bool:
+        spawn = list(spawn)
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    fields = self._owned(pipe, lease)
+                    if fields is None:
+                        lease.lost = True
+                        return False
+                    waiting = self._waiting_dependents(pipe, lease.unit_id)
+                    plan = self._plan_units(
+                        pipe, spawn, fields["client_id"], int(fields["priority"]), float(fields["enqueued_at"])
+                    )
+                    pipe.multi()
+                    self._finish(pipe, lease.unit_id, result, waiting)
+                    self._write_units(pipe, plan)
+                    pipe.execute()
+                    return True
+                except self._watch_error:
+                    continue
+
+    def release(self, lease: Lease) -> bool:
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    fields = self._owned(pipe, lease)
+                    if fields is None:
+                        return False
+                    pipe.multi()
+                    pipe.zrem(self.leases_key, lease.unit_id)
+                    pipe.hdel(self._unit_key(lease.unit_id), "worker_id")
+                    pipe.hset(self._unit_key(lease.unit_id), "attempts", max(int(fields.get("attempts") or 0) - 1, 0))
+                    self._queue_unit(pipe, lease.unit_id, fields)
+                    pipe.execute()
+                    return True
+                except self._watch_error:
+                    continue
+
+    def results(self, job_id: str, kind: str) -> Dict[Optional[int], Dict]:
+        results = {}
+        for unit in self._members(self._units_key(job_id)):
+            fields = self._fields(unit)
+            if fields.get("kind") == kind and fields.get("done") == "1":
+                scene_id = fields.get("scene_id")
+                results[int(scene_id) if scene_id else None] = json.loads(fields.get("result") or "{}")
+        return results
+
+    def remove(self, job_id: str) -> bool:
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(self._units_key(job_id), self.leases_key)
+                    units = self._members(self._units_key(job_id), pipe)
+                    if not units or any(pipe.zscore(self.leases_key, unit) is not None for unit in units):
+                        pipe.unwatch()
+                        return False
+                    pipe.multi()
+                    self._purge(pipe, job_id, units)
+                    pipe.execute()
+                    return True
+                except self._watch_error:
+                    continue
+
+    def purge(self, job_id: str) -> bool:
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(self._units_key(job_id))
+                    units = self._members(self._units_key(job_id), pipe)
+                    if not units:
+                        pipe.unwatch()
+                        return False
+                    pipe.multi()
+                    self._purge(pipe, job_id, units)
+                    pipe.execute()
+                    return True
+                except self._watch_error:
+                    continue
+
+    def request_cancel(self, job_id: str) -> bool:
+        leased = [
+            unit for unit in self._members(self._units_key(job_id))
+            if self.redis.zscore(self.leases_key, unit) is not None
+        ]
+        for unit in leased:
+            self.redis.hset(self._unit_key(unit), "cancel", 1)
+        return bool(leased)
+
+    def reclaim_expired(self) -> Tuple[List[str], List[str], List[str]]:
+        requeued, failed, dead = [], [], []
+        expired = self.redis.zrangebyscore(self.leases_key, 0, time.time())
+        with self.redis.pipeline() as pipe:
+            for raw_id in expired:
+                unit = self._text(raw_id)
+                while True:
+                    try:
+                        pipe.watch(self.leases_key, self._unit_key(unit))
+                        score = pipe.zscore(self.leases_key, unit)
+                        if score is None or score >= time.time():
+                            # Renewed or reclaimed by someone else meanwhile
+                            pipe.unwatch()
+                            break
+                        fields = self._fields(unit, pipe)
+                        attempts = int(fields.get("attempts") or 0)
+                        cancel = fields.get("cancel") == "1"
+                        if not cancel and attempts >= MAX_ATTEMPTS and fields.get("kind") in SCENE_UNITS:
+                            waiting = self._waiting_dependents(pipe, unit)
+                            pipe.multi()
+                            self._finish(pipe, unit, lost_result(attempts), waiting)
+                            pipe.execute()
+                            failed.append(unit)
+                            break
+                        pipe.multi()
+                        pipe.zrem(self.leases_key, unit)
+                        pipe.hdel(self._unit_key(unit), "worker_id")
+                        if cancel or attempts >= MAX_ATTEMPTS:
+                            # Parked as done without unblocking anything; the caller ends the job
+                            pipe.hset(self._unit_key(unit), mapping={
+                                "done": 1, "result": json.dumps({"error": "lease expired"}),
+                            })
+                            pipe.execute()
+                            dead.append(unit)
+                        else:
+                            self._queue_unit(pipe, unit, fields)
+                            pipe.execute()
+                            requeued.append(unit)
+                        break
+                    except self._watch_error:
+                        continue
+        return requeued, failed, dead
+
+    def is_leased(self, job_id: str) -> bool:
+        return any(
+            self.redis.zscore(self.leases_key, unit) is not None
+            for unit in self._members(self._units_key(job_id))
+        )
+
+    def has_units(self, job_id: str) -> bool:
+        return bool(self.redis.exists(self._units_key(job_id)))
+
+    def position(self, job_id: str) -> Optional[int]:
+        rank = self.redis.zrank(self.queued_key, job_id)
+        return rank + 1 if rank is not None else None
+
+    def stats(self) -> Dict:
+        leased = [self._text(unit) for unit in self.redis.zrange(self.leases_key, 0, -1)]
+        ready = [self._text(unit) for unit in self.redis.zrange(self.ready_key, 0, -1)]
+        workers = {self.redis.hget(self._unit_key(unit), "worker_id") for unit in leased}
+        queued = self.redis.zcard(self.queued_key)
+        # A started job always has a ready or leased unit until it is purged
+        jobs = {unit_job(unit) for unit in leased + ready}
+        return {
+            "queued": queued,
+            "running": len(jobs) - queued,
+            "ready": len(ready),
+            "leased": len(leased),
+            "workers": len(workers - {None}),
+        }
+
+
+def create_job_queue(backend: str = JOB_QUEUE_BACKEND) -> JobQueue:
+    """Build the configured queue backend"""
+    if backend == "sqlite":
+        return SQLiteJobQueue()
+    if backend == "redis":
+        return RedisJobQueue()
+    raise ValueError(f"Unknown job queue backend: {backend}")
+
+
+class RemoteScheduler:
+    """
+    JobScheduler stand-in for the API tier in SHORTS_RUN_MODE=api
+
+    Jobs are only enqueued here; shorts_worker.py processes render them.
+    The job's request is read from the job store, so only the id travels
+    through the queue.
+    """
+
+    def __init__(self, queue: JobQueue):
+        self.queue = queue
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def submit(self, job_id: str, payload=None, client_id: str = "anonymous", priority: int = 0) -> int:
+        """Queue a job and return its position; raises QueueFullError if not admitted"""
+        return self.queue.enqueue(job_id, client_id, priority)
+
+    def remove(self, job_id: str) -> bool:
+        return self.queue.remove(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Drop a job nobody is working on or ask its workers to stop; False if neither"""
+        return self.queue.remove(job_id) or self.queue.request_cancel(job_id)
+
+    def is_running(self, job_id: str) -> bool:
+        return self.queue.is_leased(job_id)
+
+    def is_tracked(self, job_id: str) -> bool:
+        """Whether the job is still in the queue, waiting or with a worker"""
+        return self.queue.has_units(job_id)
+
+    def position(self, job_id: str) -> Optional[int]:
+        return self.queue.position(job_id)
+
+    def stats(self) -> Dict:
+        stats = self.queue.stats()
+        return {
+            "mode": "remote",
+            "workers": stats["workers"],
+            "running": stats["running"],
+            "queued": stats["queued"],
+            "units": {"ready": stats["ready"], "leased": stats["leased"]},
+            "max_queue": self.queue.max_queue,
+        }
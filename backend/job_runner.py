@@ -0,0 +1,470 @@
+"""
+Job Runner - Executes shorts jobs against the shared job store
+The API process (SHORTS_RUN_MODE=inline, via JobScheduler) runs a whole job
+with process_shorts_job. Render workers (shorts_worker.py) run it as work
+units (see job_queue.py) with run_unit, so its scenes spread over the
+worker pool. Progress, finished scenes, checkpoints and timings are written
+to the job store either way, so any API replica can serve a job's status
+no matter which processes render it.
+"""
+
+import asyncio
+import time
+from dataclasses import asdict
+from typing import Dict, List, Literal, Optional, Tuple
+from datetime import datetime
+from pydantic import BaseModel, Field
+
+from shorts_factory import JobCheckpoint, SceneData, VideoScene, get_shorts_factory, previous_frame
+from job_store import AsyncJobStore, create_job_store
+from job_queue import (
+    SCENE_UNITS, UNIT_ASSEMBLE, UNIT_CLIP, UNIT_IMAGE, UNIT_SCENARIO, JobQueue, Lease, WorkUnit
+)
+from progress_stream import ProgressBroker
+from video_assembly import VideoAssembler
+from metrics import REGISTRY, STAGE_SECONDS, current_trace, merge_traces, record_span, span, start_trace
+from log import get_logger
+
+logger = get_logger("runner")
+
+# Job storage (backend selected by SHORTS_JOB_STORE: memory | sqlite | redis),
+# called from the event loop through its own thread
+job_store = AsyncJobStore(create_job_store())
+
+# Live progress events for the SSE / WebSocket endpoints
+progress_broker = ProgressBroker()
+
+# Final video assembly (ffmpeg); outputs live as long as their jobs
+assembler = VideoAssembler()
+
+JOBS_FINISHED = REGISTRY.counter("shorts_jobs_total", "Jobs that reached a final status", ("status",))
+UNITS_FINISHED = REGISTRY.counter(
+    "shorts_work_units_total", "Work units run by render workers", ("kind", "status")
+)
+
+
+# Request/Response Models
+class ShortsRequest(BaseModel):
+    mode: Literal["idea", "manual"] = "idea"
+    content: str
+    target_duration: int = 60
+    scene_duration_min: int = 8
+    scene_duration_max: int = 15
+    bypass_scenario_cache: bool = False
+    priority: int = Field(0, ge=0, le=9)  # higher is scheduled first
+    assemble: bool = True  # build the final MP4 once every scene is done
+    voice: str = "en-US-GuyNeural"  # voiceover voice for the final MP4
+
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: Literal["queued", "processing", "completed", "failed", "cancelled"]
+    progress: int  # 0-100
+    current_scene: int
+    total_scenes: int
+    message: str
+    videos: list = []
+    error: Optional[str] = None
+    created_at: str
+    completed_at: Optional[str] = None
+    queue_position: Optional[int] = None
+    final_video_url: Optional[str] = None
+    timings: Optional[Dict] = None  # per-stage totals and spans (see metrics.Trace)
+
+
+def scene_to_dict(scene: VideoScene) -> dict:
+    """Serialize a finished scene for the job's videos list"""
+    return {
+        'scene_id': scene.scene_id,
+        'voiceover': scene.voiceover,
+        'image_url': scene.image_url,
+        'video_url': scene.video_url,
+        'duration': scene.duration
+    }
+
+
+def job_snapshot(job: Dict) -> Dict:
+    """Public view of a job record (internal fields stripped)"""
+    return JobStatus(**job).model_dump()
+
+
+async def finish_job(job_id: str, **fields) -> None:
+    """Record a terminal status and end every open progress stream"""
+    job = await job_store.update(job_id, completed_at=datetime.now().isoformat(), **fields)
+    if job is not None:
+        progress_broker.publish(job_id, 'status', job_snapshot(job))
+
+
+# Background task to process shorts
+async def process_shorts_job(job_id: str, request: ShortsRequest):
+    """
+    Background task to process shorts generation
+    
+    Runs on the event loop rather than a threadpool worker: every upstream
+    call is awaited, so many jobs can be in flight at once. Each finished
+    scene is appended to the job's videos (and checkpointed) as soon as it
+    completes, so clients can preview it while later scenes still render.
+    
+    Stage timings (queue wait, scenario, images, clips, retries, assembly)
+    are recorded on the job's trace and stored under 'timings'.
+    
+    Render workers (SHORTS_RUN_MODE=api) run jobs as work units instead,
+    see run_unit.
+    """
+    
+    trace = start_trace(job_id)
+    
+    def timings(status: str) -> Dict:
+        """Close the trace: export the job's duration and status"""
+        elapsed = time.perf_counter() - trace.started
+        STAGE_SECONDS.observe(elapsed, stage='job', status=status)
+        JOBS_FINISHED.inc(status=status)
+        return trace.to_dict()
+    
+    try:
+        job = await job_store.update(job_id, status='processing', message='Initializing...')
+        if job is None:
+            # Deleted while it was waiting in the queue
+            return
+        
+        queued_for = max(0.0, time.time() - job.get('queued_at', time.time()))
+        STAGE_SECONDS.observe(queued_for, stage='queue', status='ok')
+        record_span('queue', trace.started - queued_for, queued_for)
+        
+        factory = get_shorts_factory()
+        checkpoint = JobCheckpoint.from_dict(job.get('checkpoint'))
+        
+        def checkpoint_callback(checkpoint: JobCheckpoint):
+            """Persist the scenario and finished scenes"""
+            job_store.submit_update(job_id, checkpoint=checkpoint.to_dict())
+        
+        def progress_callback(data):
+            """Update job progress and push it to stream subscribers"""
+            if data['stage'] == 'scene_complete':
+                # Published with the partial videos list by the scene loop below
+                return
+            
+            update = {
+                'progress': int((data['current'] / data['total']) * 100),
+                'current_scene': data['current'],
+                'total_scenes': data['total'],
+                'message': data['message']
+            }
+            job_store.submit_update(job_id, **update)
+            progress_broker.publish(job_id, 'progress', {'status': 'processing', **update})
+        
+        # Process shorts, publishing every scene as soon as it is done
+        finished: Dict[int, Dict] = {}
+        videos = []
+        async for scene in factory.iter_shorts(
+            user_input=request.content,
+            mode=request.mode,
+            target_duration=request.target_duration,
+            scene_duration_range=(request.scene_duration_min, request.scene_duration_max),
+            progress_callback=progress_callback,
+            use_scenario_cache=not request.bypass_scenario_cache,
+            checkpoint=checkpoint,
+            checkpoint_callback=checkpoint_callback
+        ):
+            finished[scene.scene_id] = scene_to_dict(scene)
+            videos = [finished[scene_id] for scene_id in sorted(finished)]
+            job = await job_store.update(job_id, videos=videos, timings=trace.to_dict())
+            progress_broker.publish(job_id, 'scene', {
+                'scene': finished[scene.scene_id],
+                'videos': videos,
+                'completed': len(videos),
+                'total': job['total_scenes'] if job else len(videos)
+            })
+        
+        result = {'message': f'Completed {len(videos)} scenes!'}
+        if request.assemble and videos and len(videos) == len(checkpoint.scenario.scenes):
+            with span('assembly'):
+                result = await assemble_job(job_id, videos, request.voice)
+        
+        await finish_job(
+            job_id,
+            videos=videos,
+            status='completed',
+            progress=100,
+            timings=timings('completed'),
+            **result
+        )
+        
+    except asyncio.CancelledError:
+        await finish_job(job_id, status='cancelled', message='Job cancelled', timings=timings('cancelled'))
+        logger.info("🛑 Job cancelled", extra={"job_id": job_id})
+        raise
+    
+    except Exception as e:
+        await finish_job(
+            job_id, status='failed', error=str(e), message=f'Error: {str(e)}', timings=timings('failed')
+        )
+        logger.error("❌ Job failed", extra={"job_id": job_id, "error": str(e)})
+
+
+async def assemble_job(job_id: str, videos: list, voice: str) -> Dict:
+    """Build the final MP4; a failure keeps the job's clips and reports the error"""
+    
+    def progress_callback(message: str):
+        job_store.submit_update(job_id, message=message)
+        progress_broker.publish(job_id, 'progress', {'status': 'processing', 'message': message})
+    
+    try:
+        await assembler.assemble(job_id, videos, voice, progress_callback)
+    except Exception as e:
+        logger.warning("⚠️ Assembly failed", extra={"job_id": job_id, "error": str(e)})
+        return {
+            'error': f'Assembly failed: {e}',
+            'message': f'Completed {len(videos)} scenes (final video assembly failed)'
+        }
+    return {
+        'final_video_url': f'/api/shorts/{job_id}/video',
+        'message': f'Completed {len(videos)} scenes and assembled the final video!'
+    }
+
+
+# Work units (render workers)
+UnitOutcome = Optional[Tuple[Dict, List[WorkUnit]]]
+
+
+async def run_unit(queue: JobQueue, lease: Lease, request: ShortsRequest) -> None:
+    """
+    Run one leased work unit of a job and record its result in the queue
+    
+    As in process_shorts, a scene whose image or clip fails is left out of
+    the video while a failed scenario or assembly fails the job. When the
+    unit is cancelled because its lease was lost nothing is written (it
+    runs again elsewhere); a cancel requested through the API ends the job.
+    """
+    
+    start_trace(lease.job_id)
+    try:
+        outcome = await UNIT_RUNNERS[lease.kind](queue, lease, request)
+    except asyncio.CancelledError:
+        if lease.lost:
+            logger.warning("⚠️ Lease lost, unit handed over", extra={"unit": lease.unit_id})
+            raise
+        UNITS_FINISHED.inc(kind=lease.kind, status='cancelled')
+        if await end_units(queue, lease.job_id, status='cancelled', message='Job cancelled'):
+            logger.info("🛑 Job cancelled", extra={"job_id": lease.job_id})
+        raise
+    except Exception as e:
+        if lease.kind not in SCENE_UNITS:
+            UNITS_FINISHED.inc(kind=lease.kind, status='failed')
+            if await end_units(queue, lease.job_id, status='failed', error=str(e), message=f'Error: {str(e)}'):
+                logger.error("❌ Job failed", extra={"job_id": lease.job_id, "error": str(e)})
+            return
+        logger.error("❌ Scene failed", extra={"job_id": lease.job_id, "scene_id": lease.scene_id, "error": str(e)})
+        outcome = ({'error': str(e)}, [])
+    
+    if outcome is None:
+        # The job was finished by this unit, or deleted while it waited
+        UNITS_FINISHED.inc(kind=lease.kind, status='ok')
+        queue.purge(lease.job_id)
+        progress_broker.forget(lease.job_id)
+        return
+    
+    result, spawn = outcome
+    result['timings'] = current_trace().to_dict()
+    UNITS_FINISHED.inc(kind=lease.kind, status='failed' if 'error' in result else 'ok')
+    if queue.complete(lease, result, spawn) and lease.kind == UNIT_CLIP:
+        await publish_scenes(queue, lease.job_id, lease.scene_id)
+
+
+async def end_units(queue: JobQueue, job_id: str, status: str, **fields) -> bool:
+    """
+    Give a unit-rendered job its final status, once
+    
+    The timings of every unit are merged into the job's. Whoever purges the
+    job's units writes the status; False if another worker got there first.
+    """
+    traces = [
+        result.get('timings')
+        for kind in (UNIT_SCENARIO, UNIT_IMAGE, UNIT_CLIP, UNIT_ASSEMBLE)
+        for result in queue.results(job_id, kind).values()
+    ]
+    trace = current_trace()
+    timings = merge_traces(traces + ([trace.to_dict()] if trace else []))
+    if not queue.purge(job_id):
+        progress_broker.forget(job_id)
+        return False
+    STAGE_SECONDS.observe(timings.get('elapsed_seconds', 0.0), stage='job', status=status)
+    JOBS_FINISHED.inc(status=status)
+    await finish_job(job_id, status=status, timings=timings, **fields)
+    return True
+
+
+def collect_scenes(clips: Dict[Optional[int], Dict], checkpoint: JobCheckpoint) -> List[Dict]:
+    """Add a job's finished clip results to its checkpoint and return its videos list"""
+    for result in clips.values():
+        if 'scene' in result:
+            scene = VideoScene(**result['scene'])
+            checkpoint.completed[scene.scene_id] = scene
+    return [scene_to_dict(checkpoint.completed[scene_id]) for scene_id in sorted(checkpoint.completed)]
+
+
+async def publish_scenes(queue: JobQueue, job_id: str, scene_id: Optional[int]) -> None:
+    """
+    Fan-in after a clip unit (scene_id): the job's videos, checkpoint and progress
+    
+    Clips of one job finish on several workers at once, so the queue's
+    results are merged into the job inside the job store's atomic modify:
+    scenes already in the stored checkpoint are kept and progress never goes
+    back, so a write based on older results never carries fewer scenes.
+    """
+    
+    clips = queue.results(job_id, UNIT_CLIP)
+    
+    def change(job: Dict) -> Optional[Dict]:
+        if job['status'] != 'processing':
+            return None
+        checkpoint = JobCheckpoint.from_dict(job.get('checkpoint'))
+        videos = collect_scenes(clips, checkpoint)
+        total = len(checkpoint.scenario.scenes) if checkpoint.scenario else job['total_scenes']
+        # Failed scenes count as settled too: the job is waiting on the others
+        settled = max(len(set(checkpoint.completed) | set(clips)), job['current_scene'])
+        return {
+            'videos': videos,
+            'checkpoint': checkpoint.to_dict(),
+            'progress': int(settled / max(1, total) * 100),
+            'current_scene': settled,
+            'message': f'Rendered {settled}/{total} scenes'
+        }
+    
+    job = await job_store.modify(job_id, change)
+    if job is None:
+        return
+    finished = [video for video in job['videos'] if video['scene_id'] == scene_id]
+    if finished:
+        progress_broker.publish(job_id, 'scene', {
+            'scene': finished[0],
+            'videos': job['videos'],
+            'completed': len(job['videos']),
+            'total': job['total_scenes']
+        })
+
+
+async def plan_units(queue: JobQueue, lease: Lease, request: ShortsRequest) -> UnitOutcome:
+    """
+    Scenario unit: write (or reuse) the scenario and fan out its scenes
+    
+    Every scene not in the checkpoint gets an image unit and a clip unit
+    that waits on it; the assembly unit waits on every clip. Scenes start
+    once the whole scenario is checkpointed, so a rerun after a lost lease
+    spawns the same units.
+    """
+    
+    job = await job_store.update(lease.job_id, status='processing', message='Writing the scenario...')
+    if job is None:
+        return None
+    
+    queued_for = max(0.0, time.time() - job.get('queued_at', time.time()))
+    STAGE_SECONDS.observe(queued_for, stage='queue', status='ok')
+    record_span('queue', time.perf_counter() - queued_for, queued_for)
+    
+    checkpoint = JobCheckpoint.from_dict(job.get('checkpoint'))
+    if checkpoint.scenario is None:
+        # Scenes finished before the scenario was checkpointed cannot be
+        # matched against a newly generated scenario
+        checkpoint.completed.clear()
+        checkpoint.scenario = await get_shorts_factory().plan_scenario(
+            request.content,
+            mode=request.mode,
+            target_duration=request.target_duration,
+            scene_duration_range=(request.scene_duration_min, request.scene_duration_max),
+            use_cache=not request.bypass_scenario_cache
+        )
+    
+    scenes = checkpoint.scenario.scenes
+    pending = [scene for scene in scenes if scene.scene_id not in checkpoint.completed]
+    update = {
+        'checkpoint': checkpoint.to_dict(),
+        'videos': [scene_to_dict(checkpoint.completed[scene_id]) for scene_id in sorted(checkpoint.completed)],
+        'progress': int(len(checkpoint.completed) / max(1, len(scenes)) * 100),
+        'current_scene': len(checkpoint.completed),
+        'total_scenes': len(scenes),
+        'message': f'Rendering {len(pending)} scenes'
+    }
+    if await job_store.update(lease.job_id, **update) is None:
+        return None
+    progress_broker.publish(lease.job_id, 'progress', {
+        'status': 'processing', **{key: update[key] for key in ('progress', 'current_scene', 'total_scenes', 'message')}
+    })
+    
+    spawn = []
+    for scene in pending:
+        image = WorkUnit(lease.job_id, UNIT_IMAGE, scene.scene_id, payload=asdict(scene))
+        clip = WorkUnit(lease.job_id, UNIT_CLIP, scene.scene_id, needs=[image.unit_id], payload=asdict(scene))
+        spawn += [image, clip]
+    spawn.append(WorkUnit(
+        lease.job_id, UNIT_ASSEMBLE, needs=[unit.unit_id for unit in spawn if unit.kind == UNIT_CLIP]
+    ))
+    logger.info("🔀 Scenes fanned out", extra={"job_id": lease.job_id, "scenes": len(pending)})
+    return {'scenes': len(scenes)}, spawn
+
+
+async def draw_unit(queue: JobQueue, lease: Lease, request: ShortsRequest) -> UnitOutcome:
+    """Image unit: one scene's Flux image"""
+    scene = SceneData(**lease.payload)
+    # Best-of compares against the closest earlier frame drawn so far
+    frames = {
+        scene_id: result['image_url']
+        for scene_id, result in queue.results(lease.job_id, UNIT_IMAGE).items()
+        if 'image_url' in result
+    }
+    image_url = await get_shorts_factory().create_scene_image(
+        scene.image_prompt, scene.scene_id, reference_url=previous_frame(frames, scene.scene_id)
+    )
+    return {'image_url': image_url}, []
+
+
+async def animate_unit(queue: JobQueue, lease: Lease, request: ShortsRequest) -> UnitOutcome:
+    """Clip unit: animate the scene's image"""
+    scene = SceneData(**lease.payload)
+    image = queue.results(lease.job_id, UNIT_IMAGE).get(scene.scene_id, {})
+    if 'image_url' not in image:
+        return {'error': image.get('error', 'Scene image missing')}, []
+    video_url = await get_shorts_factory().animate_scene(image['image_url'], scene.scene_id, duration=scene.duration)
+    logger.info("✅ Scene completed", extra={"job_id": lease.job_id, "scene_id": scene.scene_id})
+    return {
+        'scene': asdict(VideoScene(
+            scene_id=scene.scene_id,
+            voiceover=scene.voiceover,
+            image_url=image['image_url'],
+            video_url=video_url,
+            duration=scene.duration
+        ))
+    }, []
+
+
+async def assemble_unit(queue: JobQueue, lease: Lease, request: ShortsRequest) -> UnitOutcome:
+    """Assembly unit (fan-in): gather every scene, build the final MP4 and finish the job"""
+    
+    clips = queue.results(lease.job_id, UNIT_CLIP)
+    
+    def change(job: Dict) -> Dict:
+        checkpoint = JobCheckpoint.from_dict(job.get('checkpoint'))
+        videos = collect_scenes(clips, checkpoint)
+        return {'videos': videos, 'checkpoint': checkpoint.to_dict()}
+    
+    job = await job_store.modify(lease.job_id, change)
+    if job is None:
+        return None
+    
+    checkpoint = JobCheckpoint.from_dict(job['checkpoint'])
+    videos = job['videos']
+    result = {'message': f'Completed {len(videos)} scenes!'}
+    if request.assemble and videos and checkpoint.scenario and len(videos) == len(checkpoint.scenario.scenes):
+        with span('assembly'):
+            result = await assemble_job(lease.job_id, videos, request.voice)
+    
+    await end_units(queue, lease.job_id, status='completed', videos=videos, progress=100, **result)
+    return None
+
+
+UNIT_RUNNERS = {
+    UNIT_SCENARIO: plan_units,
+    UNIT_IMAGE: draw_unit,
+    UNIT_CLIP: animate_unit,
+    UNIT_ASSEMBLE: assemble_unit,
+}
@@ -0,0 +1,215 @@
+"""
+Job Scheduler - Bounded worker pool with admission control
+Jobs wait in a bounded priority queue that round-robins between clients,
+and a fixed number of workers run them, so bursts queue up (or get
+rejected) instead of fanning out into unbounded upstream calls.
+"""
+
+import os
+import asyncio
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from log import get_logger
+
+logger = get_logger("scheduler")
+
+# Scheduler configuration
+SCHEDULER_WORKERS = int(os.getenv("SHORTS_WORKERS", 4))
+SCHEDULER_MAX_QUEUE = int(os.getenv("SHORTS_MAX_QUEUE", 100))
+SCHEDULER_MAX_PER_CLIENT = int(os.getenv("SHORTS_MAX_QUEUED_PER_CLIENT", 10))
+
+
+class QueueFullError(Exception):
+    """Raised when a job cannot be admitted to the queue"""
+
+
+class FairQueue:
+    """
+    Priority queue with per-client round-robin
+
+    Higher priority levels are always served first. Within a level, clients
+    take turns (one job each per round) and each client's jobs stay FIFO.
+    """
+
+    def __init__(self):
+        self._levels: Dict[int, "OrderedDict[str, Deque[Tuple[str, Any]]]"] = {}
+        self._where: Dict[str, Tuple[int, str]] = {}
+        self._per_client: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, job_id: str) -> bool:
+        return job_id in self._where
+
+    def client_count(self, client_id: str) -> int:
+        return self._per_client.get(client_id, 0)
+
+    def push(self, job_id: str, payload: Any, client_id: str, priority: int = 0) -> None:
+        clients = self._levels.setdefault(priority, OrderedDict())
+        clients.setdefault(client_id, deque()).append((job_id, payload))
+        self._where[job_id] = (priority, client_id)
+        self._per_client[client_id] = self._per_client.get(client_id, 0) + 1
+
+    def pop(self) -> Tuple[str, Any]:
+        priority = max(level for level, clients in self._levels.items() if clients)
+        clients = self._levels[priority]
+        client_id, jobs = next(iter(clients.items()))
+        job_id, payload = jobs.popleft()
+        if jobs:
+            # Served this round: go to the back of the line
+            clients.move_to_end(client_id)
+        else:
+            del clients[client_id]
+        self._forget(job_id, client_id)
+        return job_id, payload
+
+    def remove(self, job_id: str) -> bool:
+        where = self._where.get(job_id)
+        if where is None:
+            return False
+        priority, client_id = where
+        clients = self._levels[priority]
+        jobs = clients[client_id]
+        for item in jobs:
+            if item[0] == job_id:
+                jobs.remove(item)
+                break
+        if not jobs:
+            del clients[client_id]
+        self._forget(job_id, client_id)
+        return True
+
+    def _forget(self, job_id: str, client_id: str) -> None:
+        del self._where[job_id]
+        self._per_client[client_id] -= 1
+        if not self._per_client[client_id]:
+            del self._per_client[client_id]
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based position in dispatch order, or None if not queued"""
+        where = self._where.get(job_id)
+        if where is None:
+            return None
+        priority, client_id = where
+
+        ahead = sum(
+            len(jobs)
+            for level, clients in self._levels.items() if level > priority
+            for jobs in clients.values()
+        )
+
+        clients = self._levels[priority]
+        index = next(i for i, item in enumerate(clients[client_id]) if item[0] == job_id)
+        # Full rounds before ours, then the clients served before us in our round
+        for other_id, jobs in clients.items():
+            if other_id == client_id:
+                ahead += index
+                break
+            ahead += min(len(jobs), index + 1)
+        for other_id, jobs in reversed(clients.items()):
+            if other_id == client_id:
+                break
+            ahead += min(len(jobs), index)
+        return ahead + 1
+
+
+class JobScheduler:
+    """Fixed-size pool of asyncio workers draining a FairQueue"""
+
+    def __init__(
+        self,
+        run_job: Callable[[str, Any], Awaitable[None]],
+        workers: int = SCHEDULER_WORKERS,
+        max_queue: int = SCHEDULER_MAX_QUEUE,
+        max_per_client: int = SCHEDULER_MAX_PER_CLIENT
+    ):
+        self.run_job = run_job
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.max_per_client = max_per_client
+        self._queue = FairQueue()
+        self._running: Dict[str, asyncio.Task] = {}
+        self._ready: Optional[asyncio.Condition] = None
+        self._tasks = []
+
+    async def start(self) -> None:
+        self._ready = asyncio.Condition()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"shorts-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, job_id: str, payload: Any, client_id: str, priority: int = 0) -> int:
+        """Queue a job and return its position; raises QueueFullError if not admitted"""
+        if len(self._queue) >= self.max_queue:
+            raise QueueFullError(f"Queue is full ({self.max_queue} jobs waiting)")
+        if self.max_per_client and self._queue.client_count(client_id) >= self.max_per_client:
+            raise QueueFullError(f"Too many queued jobs for this client ({self.max_per_client} max)")
+
+        async with self._ready:
+            self._queue.push(job_id, payload, client_id, priority)
+            self._ready.notify()
+        return self._queue.position(job_id)
+
+    def remove(self, job_id: str) -> bool:
+        """Drop a job that has not started yet"""
+        return self._queue.remove(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Drop a queued job or cancel a running one; False if neither"""
+        if self._queue.remove(job_id):
+            return True
+        task = self._running.get(job_id)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        return True
+
+    def is_running(self, job_id: str) -> bool:
+        return job_id in self._running
+
+    def is_tracked(self, job_id: str) -> bool:
+        """Whether the job is waiting in this process's queue or running here"""
+        return job_id in self._queue or job_id in self._running
+
+    def position(self, job_id: str) -> Optional[int]:
+        return self._queue.position(job_id)
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "running": len(self._running),
+            "queued": len(self._queue),
+            "max_queue": self.max_queue,
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            async with self._ready:
+                await self._ready.wait_for(lambda: len(self._queue) > 0)
+                job_id, payload = self._queue.pop()
+
+            # Run each job in its own task so cancel() can stop it without
+            # taking the worker down with it
+            task = asyncio.create_task(self.run_job(job_id, payload))
+            self._running[job_id] = task
+            try:
+                await asyncio.wait({task})
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+            finally:
+                self._running.pop(job_id, None)
+
+            if not task.cancelled() and task.exception() is not None:
+                logger.error(
+                    "❌ Job crashed in scheduler", extra={"job_id": job_id, "error": str(task.exception())}
+                )
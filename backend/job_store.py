@@ -0,0 +1,395 @@
+"""
+Job Store - Persistent storage for shorts generation jobs
+Backends: in-memory (single process), SQLite (shared across processes on
+one host) and Redis (shared across hosts).
+"""
+
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+# Store configuration
+JOB_STORE_BACKEND = os.getenv("SHORTS_JOB_STORE", "sqlite")  # memory | sqlite | redis
+JOB_STORE_PATH = os.getenv(
+    "SHORTS_JOB_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "jobs.db")
+)
+JOB_TTL = int(os.getenv("SHORTS_JOB_TTL", 24 * 3600))  # seconds finished jobs are kept
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+ACTIVE_STATUSES = ("queued", "processing")
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+
+class JobStore(ABC):
+    """Storage interface for job state dicts (as returned by /api/shorts/status)"""
+
+    @abstractmethod
+    def create(self, job: Dict) -> None:
+        """Insert a new job; job['job_id'] and job['status'] are required"""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return a copy of the job, or None if it does not exist"""
+
+    @abstractmethod
+    def modify(self, job_id: str, change: Callable[[Dict], Optional[Dict]]) -> Optional[Dict]:
+        """
+        Merge change(job) into the job in one atomic step and return the new state
+
+        change gets the current job and returns the fields to merge, or None
+        to leave the job alone. It may be called more than once (optimistic
+        retries), so it must not have side effects. Returns None if the job
+        is missing or change returned None.
+        """
+
+    def update(self, job_id: str, **fields) -> Optional[Dict]:
+        """Merge fields into the job and return the new state (None if missing)"""
+        return self.modify(job_id, lambda job: fields)
+
+    @abstractmethod
+    def delete(self, job_id: str) -> bool:
+        """Remove a job; returns False if it did not exist"""
+
+    @abstractmethod
+    def ids_by_status(self, status: str) -> List[str]:
+        """Job ids currently in the given status"""
+
+    @abstractmethod
+    def count_by_status(self, statuses: Iterable[str]) -> int:
+        """Number of jobs in any of the given statuses (index lookup, no scan)"""
+
+    @abstractmethod
+    def evict_finished(self, ttl: int = JOB_TTL) -> int:
+        """Delete finished jobs older than ttl seconds; returns number removed"""
+
+    def count_active(self) -> int:
+        return self.count_by_status(ACTIVE_STATUSES)
+
+
+class InMemoryJobStore(JobStore):
+    """Process-local store with a status index"""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict] = {}
+        self._by_status: Dict[str, Set[str]] = {}
+        self._finished_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _index(self, job_id: str, old_status: Optional[str], new_status: str) -> None:
+        if old_status == new_status:
+            return
+        if old_status is not None:
+            self._by_status.get(old_status, set()).discard(job_id)
+        self._by_status.setdefault(new_status, set()).add(job_id)
+        if new_status in FINISHED_STATUSES:
+            self._finished_at[job_id] = time.time()
+        else:
+            self._finished_at.pop(job_id, None)
+
+    def create(self, job: Dict) -> None:
+        with self._lock:
+            job_id = job['job_id']
+            self._jobs[job_id] = dict(job)
+            self._index(job_id, None, job['status'])
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def modify(self, job_id: str, change: Callable[[Dict], Optional[Dict]]) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            fields = change(dict(job))
+            if fields is None:
+                return None
+            old_status = job['status']
+            job.update(fields)
+            self._index(job_id, old_status, job['status'])
+            return dict(job)
+
+    def delete(self, job_id: str) -> bool:
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+            if job is None:
+                return False
+            self._by_status.get(job['status'], set()).discard(job_id)
+            self._finished_at.pop(job_id, None)
+            return True
+
+    def ids_by_status(self, status: str) -> List[str]:
+        with self._lock:
+            return list(self._by_status.get(status, ()))
+
+    def count_by_status(self, statuses: Iterable[str]) -> int:
+        with self._lock:
+            return sum(len(self._by_status.get(s, ())) for s in statuses)
+
+    def evict_finished(self, ttl: int = JOB_TTL) -> int:
+        cutoff = time.time() - ttl
+        with self._lock:
+            expired = [job_id for job_id, at in self._finished_at.items() if at < cutoff]
+        return sum(1 for job_id in expired if self.delete(job_id))
+
+
+class SQLiteJobStore(JobStore):
+    """SQLite-backed store; safe to share between processes on one host"""
+
+    def __init__(self, path: str = JOB_STORE_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                data TEXT NOT NULL,
+                finished_at REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_finished_at ON jobs(finished_at)")
+
+    def create(self, job: Dict) -> None:
+        finished_at = time.time() if job['status'] in FINISHED_STATUSES else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, status, data, finished_at) VALUES (?, ?, ?, ?)",
+                (job['job_id'], job['status'], json.dumps(job), finished_at)
+            )
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def modify(self, job_id: str, change: Callable[[Dict], Optional[Dict]]) -> Optional[Dict]:
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front so concurrent
+            # read-modify-write cycles from other processes cannot interleave
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                job = json.loads(row[0])
+                fields = change(dict(job))
+                if fields is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                job.update(fields)
+                finished_at = time.time() if job['status'] in FINISHED_STATUSES else None
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, data = ?, "
+                    "finished_at = CASE WHEN ? IS NULL THEN NULL ELSE COALESCE(finished_at, ?) END "
+                    "WHERE job_id = ?",
+                    (job['status'], json.dumps(job), finished_at, finished_at, job_id)
+                )
+                self._conn.execute("COMMIT")
+                return job
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, job_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,)).rowcount > 0
+
+    def ids_by_status(self, status: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT job_id FROM jobs WHERE status = ?", (status,)).fetchall()
+        return [row[0] for row in rows]
+
+    def count_by_status(self, statuses: Iterable[str]) -> int:
+        statuses = list(statuses)
+        placeholders = ",".join("?" for _ in statuses)
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT COUNT(*) FROM jobs WHERE status IN ({placeholders})", statuses
+            ).fetchone()
+        return row[0]
+
+    def evict_finished(self, ttl: int = JOB_TTL) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                (time.time() - ttl,)
+            ).rowcount
+
+
+class RedisJobStore(JobStore):
+    """
+    Redis-backed store
+
+    Each job is a JSON string at `<prefix>job:<id>`, with one set per status
+    and a sorted set of finish times for eviction. Any client exposing the
+    redis-py API can be passed in (e.g. fakeredis for local testing).
+    """
+
+    def __init__(self, client=None, url: str = REDIS_URL, prefix: str = "shorts:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("RedisJobStore requires the 'redis' package (pip install redis)") from e
+        self._watch_error = redis.exceptions.WatchError
+        self.redis = client if client is not None else redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.prefix}job:{job_id}"
+
+    def _status_key(self, status: str) -> str:
+        return f"{self.prefix}status:{status}"
+
+    @property
+    def _finished_key(self) -> str:
+        return f"{self.prefix}finished"
+
+    def _write(self, pipe, job: Dict, old_status: Optional[str]) -> None:
+        job_id = job['job_id']
+        pipe.set(self._job_key(job_id), json.dumps(job))
+        if old_status is not None and old_status != job['status']:
+            pipe.srem(self._status_key(old_status), job_id)
+        pipe.sadd(self._status_key(job['status']), job_id)
+        if job['status'] in FINISHED_STATUSES:
+            pipe.zadd(self._finished_key, {job_id: time.time()}, nx=True)
+        else:
+            pipe.zrem(self._finished_key, job_id)
+
+    def create(self, job: Dict) -> None:
+        pipe = self.redis.pipeline()
+        self._write(pipe, job, None)
+        pipe.execute()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        raw = self.redis.get(self._job_key(job_id))
+        return json.loads(raw) if raw else None
+
+    def modify(self, job_id: str, change: Callable[[Dict], Optional[Dict]]) -> Optional[Dict]:
+        key = self._job_key(job_id)
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    # Optimistic locking: retry if another writer touched the job
+                    pipe.watch(key)
+                    raw = pipe.get(key)
+                    if not raw:
+                        pipe.unwatch()
+                        return None
+                    job = json.loads(raw)
+                    fields = change(dict(job))
+                    if fields is None:
+                        pipe.unwatch()
+                        return None
+                    old_status = job['status']
+                    job.update(fields)
+                    pipe.multi()
+                    self._write(pipe, job, old_status)
+                    pipe.execute()
+                    return job
+                except self._watch_error:
+                    continue
+
+    def delete(self, job_id: str) -> bool:
+        job = self.get(job_id)
+        if job is None:
+            return False
+        pipe = self.redis.pipeline()
+        pipe.delete(self._job_key(job_id))
+        pipe.srem(self._status_key(job['status']), job_id)
+        pipe.zrem(self._finished_key, job_id)
+        pipe.execute()
+        return True
+
+    def ids_by_status(self, status: str) -> List[str]:
+        return [
+            m.decode() if isinstance(m, bytes) else m
+            for m in self.redis.smembers(self._status_key(status))
+        ]
+
+    def count_by_status(self, statuses: Iterable[str]) -> int:
+        pipe = self.redis.pipeline()
+        for status in statuses:
+            pipe.scard(self._status_key(status))
+        return sum(pipe.execute())
+
+    def evict_finished(self, ttl: int = JOB_TTL) -> int:
+        expired = self.redis.zrangebyscore(self._finished_key, 0, time.time() - ttl)
+        removed = 0
+        for job_id in expired:
+            if self.delete(job_id.decode() if isinstance(job_id, bytes) else job_id):
+                removed += 1
+        return removed
+
+
+class AsyncJobStore:
+    """
+    Awaitable facade over a JobStore for code running on the event loop
+
+    The stores block: SQLite waits up to its busy timeout while another
+    process holds the write lock, Redis does network round trips. Every call
+    runs in one dedicated thread, in the order it was made, so the loop never
+    stalls and a write queued with submit_update (from synchronous progress
+    callbacks) is seen by every later call.
+    """
+
+    def __init__(self, store: JobStore):
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store")
+
+    async def _run(self, method, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, partial(method, *args, **kwargs))
+
+    async def create(self, job: Dict) -> None:
+        await self._run(self.store.create, job)
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        return await self._run(self.store.get, job_id)
+
+    async def modify(self, job_id: str, change: Callable[[Dict], Optional[Dict]]) -> Optional[Dict]:
+        return await self._run(self.store.modify, job_id, change)
+
+    async def update(self, job_id: str, **fields) -> Optional[Dict]:
+        return await self._run(self.store.update, job_id, **fields)
+
+    def submit_update(self, job_id: str, **fields) -> None:
+        """Queue an update without waiting for it (for synchronous callbacks)"""
+        self._executor.submit(self.store.update, job_id, **fields)
+
+    async def delete(self, job_id: str) -> bool:
+        return await self._run(self.store.delete, job_id)
+
+    async def ids_by_status(self, status: str) -> List[str]:
+        return await self._run(self.store.ids_by_status, status)
+
+    async def count_active(self) -> int:
+        return await self._run(self.store.count_active)
+
+    async def evict_finished(self, ttl: int = JOB_TTL) -> int:
+        return await self._run(self.store.evict_finished, ttl)
+
+
+def create_job_store(backend: str = JOB_STORE_BACKEND) -> JobStore:
+    """Build the configured job store backend"""
+    if backend == "memory":
+        return InMemoryJobStore()
+    if backend == "sqlite":
+        return SQLiteJobStore()
+    if backend == "redis":
+        return RedisJobStore()
+    raise ValueError(f"Unknown job store backend: {backend}")
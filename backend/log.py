@@ -0,0 +1,105 @@
+"""
+Log - Structured, leveled logging for the backend
+Records are handed to a queue and written by a background thread, so hot
+paths never block on stdout. SHORTS_LOG_FORMAT=json emits one JSON object
+per line; the default text format appends extra fields as key=value.
+The current job id (from the metrics trace) is attached to every record.
+"""
+
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Optional
+
+from metrics import current_trace
+
+ROOT_LOGGER = "shorts"
+
+# Attributes every LogRecord has; anything else was passed with extra=
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_lock = threading.Lock()
+_listener = None
+
+
+def _fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _STANDARD_ATTRS}
+
+
+class JobContextFilter(logging.Filter):
+    """Tag records with the job whose trace is active"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "job_id"):
+            trace = current_trace()
+            if trace is not None and trace.job_id:
+                record.job_id = trace.job_id
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **_fields(record),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None) -> None:
+    """
+    Install the queued handler on the "shorts" logger (idempotent)
+
+    level and fmt default to SHORTS_LOG_LEVEL (INFO) and SHORTS_LOG_FORMAT
+    (text | json), read when this is called so .env values apply.
+    """
+    global _listener
+    level = (level or os.getenv("SHORTS_LOG_LEVEL", "INFO")).upper()
+    fmt = fmt or os.getenv("SHORTS_LOG_FORMAT", "text")
+    with _lock:
+        if _listener is not None:
+            return
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+        records = queue.SimpleQueue()
+        handler = logging.handlers.QueueHandler(records)
+        # Filters run on the caller's thread, where the job context is visible
+        handler.addFilter(JobContextFilter())
+
+        logger = logging.getLogger(ROOT_LOGGER)
+        logger.setLevel(level)
+        logger.addHandler(handler)
+        logger.propagate = False
+
+        _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger under the "shorts" hierarchy, e.g. get_logger("factory")"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
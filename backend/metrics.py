@@ -0,0 +1,336 @@
+"""
+Metrics - Prometheus instruments and per-job timing spans
+A small dependency-free registry (counters, gauges and histograms)
+rendered in the Prometheus text format by each server's /metrics endpoint.
+span() times one stage: it feeds the stage histogram and, when a job trace
+is active in the current context, records the span on that job.
+"""
+
+import time
+import asyncio
+import threading
+import contextvars
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upstream calls take seconds to minutes, so the buckets reach far
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+
+# Spans kept per job (the stage totals keep counting past this)
+MAX_SPANS = 500
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Monotonic counter, one series per label combination"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(Counter):
+    """Value that goes up and down (usually set at scrape time)"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label combination"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # bucket counts..., sum, count
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.labels, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            labels = _format_labels(self.labels, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {_format_value(series[-1])}")
+        return lines
+
+
+class Registry:
+    """Named instruments; counter()/gauge()/histogram() return the existing one if registered"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif type(metric) is not cls:
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labels)
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labels)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labels, buckets)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "shorts_stage_seconds",
+    "Time spent per pipeline stage (scenario, image, animate, scene, assembly, job, ...)",
+    ("stage", "status")
+)
+HTTP_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ("method", "route", "status")
+)
+
+
+class Trace:
+    """Timing spans recorded for one job"""
+
+    def __init__(self, job_id: Optional[str] = None):
+        self.job_id = job_id
+        self.started = time.perf_counter()
+        self.started_at = time.time()  # wall clock, to line up traces recorded by several processes
+        self.spans: List[Dict] = []
+        self.dropped = 0
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, started: float, seconds: float, status: str = "ok", **fields) -> None:
+        """Record a span; started is a time.perf_counter() value"""
+        with self._lock:
+            totals = self.stages.setdefault(stage, {"count": 0, "seconds": 0.0})
+            totals["count"] += 1
+            totals["seconds"] += seconds
+            if len(self.spans) >= MAX_SPANS:
+                self.dropped += 1
+                return
+            self.spans.append({
+                "stage": stage,
+                "start": round(started - self.started, 3),
+                "seconds": round(seconds, 3),
+                "status": status,
+                **fields,
+            })
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "started_at": round(self.started_at, 3),
+                "elapsed_seconds": round(time.perf_counter() - self.started, 3),
+                "stages": {
+                    stage: {"count": int(totals["count"]), "seconds": round(totals["seconds"], 3)}
+                    for stage, totals in self.stages.items()
+                },
+                "spans": list(self.spans),
+                "dropped_spans": self.dropped,
+            }
+
+
+def merge_traces(traces: Sequence[Dict]) -> Dict:
+    """
+    Combine Trace.to_dict() outputs recorded for one job in several places
+
+    Render workers trace each work unit separately; span starts are shifted
+    onto the earliest trace and the job's elapsed time runs to the end of
+    the last one.
+    """
+    traces = [trace for trace in traces if trace]
+    if not traces:
+        return {}
+    started_at = min(trace.get("started_at", 0.0) for trace in traces)
+    ended_at = max(trace.get("started_at", 0.0) + trace.get("elapsed_seconds", 0.0) for trace in traces)
+    stages: Dict[str, Dict[str, float]] = {}
+    spans: List[Dict] = []
+    dropped = 0
+    for trace in traces:
+        offset = trace.get("started_at", started_at) - started_at
+        for stage, totals in trace.get("stages", {}).items():
+            merged = stages.setdefault(stage, {"count": 0, "seconds": 0.0})
+            merged["count"] += totals["count"]
+            merged["seconds"] += totals["seconds"]
+        for recorded in trace.get("spans", []):
+            spans.append({**recorded, "start": round(recorded["start"] + offset, 3)})
+        dropped += trace.get("dropped_spans", 0)
+    spans.sort(key=lambda recorded: recorded["start"])
+    dropped += max(0, len(spans) - MAX_SPANS)
+    return {
+        "started_at": round(started_at, 3),
+        "elapsed_seconds": round(ended_at - started_at, 3),
+        "stages": {
+            stage: {"count": int(totals["count"]), "seconds": round(totals["seconds"], 3)}
+            for stage, totals in stages.items()
+        },
+        "spans": spans[:MAX_SPANS],
+        "dropped_spans": dropped,
+    }
+
+
+_current_trace: "contextvars.ContextVar[Optional[Trace]]" = contextvars.ContextVar("trace", default=None)
+
+
+def start_trace(job_id: Optional[str] = None) -> Trace:
+    """Begin recording spans for the current context (and tasks it starts)"""
+    trace = Trace(job_id)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def record_span(stage: str, started: float, seconds: float, status: str = "ok", **fields) -> None:
+    """Add an already-measured span to the current job's trace (no histogram)"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(stage, started, seconds, status, **fields)
+
+
+@contextmanager
+def span(stage: str, **fields) -> Iterator[None]:
+    """
+    Time a block as one stage
+
+    Observed in shorts_stage_seconds{stage,status}; fields (scene_id,
+    attempt, ...) only go to the job trace, to keep label cardinality low.
+    """
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except asyncio.CancelledError:
+        status = "cancelled"
+        raise
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        STAGE_SECONDS.observe(seconds, stage=stage, status=status)
+        record_span(stage, started, seconds, status, **fields)
+
+
+class RequestTimingMiddleware:
+    """ASGI middleware feeding http_request_duration_seconds (route templates, not raw paths)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router records the matched route on the scope
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_SECONDS.observe(
+                time.perf_counter() - started, method=scope["method"], route=route, status=status
+            )
@@ -0,0 +1,288 @@
+"""
+Mock Backends - In-process stand-ins for Gemini, Fal.ai and edge-tts
+Selected with SHORTS_MOCK_BACKENDS=1 (see clients.py) so the server, the CLI
+and tests run end to end without API keys or credits, and used by
+benchmark.py with realistic profiles. Each simulated endpoint draws its
+latency from a log-normal distribution, fails at a configurable rate and
+answers 429 (with Retry-After) once its own rate limit is exceeded.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+from dataclasses import dataclass, replace
+from typing import AsyncIterator, Dict, List, Optional
+
+MOCK_LATENCY = float(os.getenv("SHORTS_MOCK_LATENCY", 0.05))  # seconds per upstream call
+MOCK_URL_BASE = "https://mock.fal.invalid"
+
+# edge-tts MP3 bitrate (see audio_cache.EDGE_TTS_BITRATE) and speaking rate
+MOCK_AUDIO_BITRATE = 48000  # bits per second
+MOCK_CHARS_PER_SECOND = 15
+
+_SCENE_COUNT = re.compile(r"into (\d+) visual scenes")
+_SCENE_RANGE = re.compile(r"Each scene duration: (\d+)-(\d+) seconds")
+_USER_INPUT = re.compile(r"USER INPUT:\n(.*?)\n\nCRITICAL RULES", re.S)
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class LatencyProfile:
+    """How one simulated upstream endpoint behaves"""
+    median: float = MOCK_LATENCY  # seconds
+    sigma: float = 0.0  # log-normal spread (0 = constant latency)
+    failure_rate: float = 0.0  # share of calls answering 500
+    rate_limit: Optional[float] = None  # calls per second before 429s (None = unlimited)
+    burst: int = 5
+
+    def scaled(self, factor: float) -> "LatencyProfile":
+        """Same shape with time compressed by factor (rates grow to match)"""
+        return replace(
+            self,
+            median=self.median * factor,
+            rate_limit=self.rate_limit / factor if self.rate_limit else None
+        )
+
+
+class MockUpstreamError(Exception):
+    """HTTP-style upstream error, classified by rate_limiter like a real one"""
+
+    class _Response:
+        def __init__(self, status_code: int, headers: Dict[str, str]):
+            self.status_code = status_code
+            self.headers = headers
+
+    def __init__(self, status_code: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        headers = {"retry-after": f"{retry_after:.3f}"} if retry_after else {}
+        self.response = self._Response(status_code, headers)
+
+
+class SimulatedEndpoint:
+    """Latency, failures and rate limiting for one endpoint"""
+
+    def __init__(self, name: str, profile: LatencyProfile, seed: Optional[int] = None):
+        self.name = name
+        self.profile = profile
+        self._random = random.Random(seed)
+        self._tokens = float(profile.burst)
+        self._updated = time.monotonic()
+        self.calls = 0
+        self.failures = 0
+        self.throttled = 0
+
+    def latency(self) -> float:
+        if self.profile.sigma <= 0:
+            return self.profile.median
+        return self.profile.median * self._random.lognormvariate(0, self.profile.sigma)
+
+    def admit(self) -> None:
+        """Take a rate-limit token or raise 429"""
+        self.calls += 1
+        rate = self.profile.rate_limit
+        if not rate:
+            return
+        now = time.monotonic()
+        self._tokens = min(self.profile.burst, self._tokens + (now - self._updated) * rate)
+        self._updated = now
+        if self._tokens < 1:
+            self.throttled += 1
+            raise MockUpstreamError(429, f"{self.name}: rate limit exceeded", (1 - self._tokens) / rate)
+        self._tokens -= 1
+
+    def maybe_fail(self) -> None:
+        if self._random.random() < self.profile.failure_rate:
+            self.failures += 1
+            raise MockUpstreamError(500, f"{self.name}: simulated upstream failure")
+
+    async def run(self) -> None:
+        """admit, wait out the latency, then maybe fail"""
+        self.admit()
+        await asyncio.sleep(self.latency())
+        self.maybe_fail()
+
+    def stats(self) -> Dict:
+        return {"calls": self.calls, "failures": self.failures, "throttled": self.throttled}
+
+
+class MockResponse:
+    """A Gemini response (or stream chunk)"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class MockStream:
+    """Streamed Gemini response: the text arrives in a few chunks"""
+
+    def __init__(self, text: str, latency: float, chunks: int = 8):
+        self._text = text
+        self._latency = latency
+        self._chunks = chunks
+
+    async def __aiter__(self) -> AsyncIterator[MockResponse]:
+        size = max(1, -(-len(self._text) // self._chunks))
+        for start in range(0, len(self._text), size):
+            await asyncio.sleep(self._latency / self._chunks)
+            yield MockResponse(self._text[start:start + size])
+
+
+class MockGeminiModel:
+    """Writes a scenario with the scene count and durations the prompt asks for"""
+
+    def __init__(self, model_name: str, profile: Optional[LatencyProfile] = None, seed: Optional[int] = None):
+        self.model_name = model_name
+        self.endpoint = SimulatedEndpoint("gemini", profile or LatencyProfile(), seed)
+
+    def scenario_text(self, prompt: str) -> str:
+        count = _SCENE_COUNT.search(prompt)
+        durations = _SCENE_RANGE.search(prompt)
+        user_input = _USER_INPUT.search(prompt)
+        num_scenes = int(count.group(1)) if count else 3
+        min_dur, max_dur = (int(d) for d in durations.groups()) if durations else (8, 15)
+        idea = " ".join(user_input.group(1).split())[:80] if user_input else "a short story"
+        duration = (min_dur + max_dur) // 2
+
+        scenes = [
+            {
+                "scene_id": i,
+                "voiceover": f"Part {i} of {idea}.",
+                "image_prompt": f"Scene {i}: {idea}. Mock cinematic style.",
+                "duration": duration,
+            }
+            for i in range(1, num_scenes + 1)
+        ]
+        return json.dumps({
+            "master_style": "Mock cinematic style",
+            "character_attributes": "",
+            "total_duration": duration * num_scenes,
+            "scenes": scenes,
+        })
+
+    async def generate_content_async(self, prompt: str, generation_config: Optional[Dict] = None, stream: bool = False):
+        text = self.scenario_text(prompt)
+        self.endpoint.admit()
+        self.endpoint.maybe_fail()
+        if stream:
+            return MockStream(text, self.endpoint.latency())
+        await asyncio.sleep(self.endpoint.latency())
+        return MockResponse(text)
+
+
+class MockFalHandle:
+    """Mirrors the fal_client request handle used by AsyncShortsFactory"""
+
+    def __init__(self, application: str, arguments: Dict, endpoint: SimulatedEndpoint):
+        self.request_id = str(uuid.uuid4())
+        self.application = application
+        self.arguments = arguments
+        self.endpoint = endpoint
+        self.cancelled = False
+
+    async def get(self) -> Dict:
+        await asyncio.sleep(self.endpoint.latency())
+        self.endpoint.maybe_fail()
+        if "image_url" in self.arguments:
+            key = _digest(self.application, self.arguments)
+            return {"video": {"url": f"{MOCK_URL_BASE}/videos/{key}.mp4"}}
+        return {
+            "images": [
+                {"url": f"{MOCK_URL_BASE}/images/{_digest(self.application, self.arguments, i)}.jpeg"}
+                for i in range(int(self.arguments.get("num_images", 1)))
+            ]
+        }
+
+    async def cancel(self) -> None:
+        self.cancelled = True
+
+
+class MockFal:
+    """
+    Drop-in for the fal_client module (submit_async only)
+
+    profiles maps an application id to its LatencyProfile; others use default.
+    """
+
+    def __init__(
+        self,
+        profiles: Optional[Dict[str, LatencyProfile]] = None,
+        default: Optional[LatencyProfile] = None,
+        seed: Optional[int] = None
+    ):
+        self.profiles = profiles or {}
+        self.default = default or LatencyProfile()
+        self.seed = seed
+        self.endpoints: Dict[str, SimulatedEndpoint] = {}
+        self.submitted = 0
+
+    def endpoint(self, application: str) -> SimulatedEndpoint:
+        endpoint = self.endpoints.get(application)
+        if endpoint is None:
+            profile = self.profiles.get(application, self.default)
+            endpoint = self.endpoints[application] = SimulatedEndpoint(application, profile, self.seed)
+        return endpoint
+
+    async def submit_async(self, application: str, arguments: Dict) -> MockFalHandle:
+        endpoint = self.endpoint(application)
+        # Fal rejects over-limit submissions up front
+        endpoint.admit()
+        self.submitted += 1
+        return MockFalHandle(application, arguments, endpoint)
+
+
+class MockCommunicate:
+    """edge_tts.Communicate stand-in writing silent-sized MP3 bytes"""
+
+    endpoint = SimulatedEndpoint("edge-tts", LatencyProfile())
+
+    def __init__(self, text: str, voice: str, rate: str = "+0%"):
+        self.text = text
+        self.voice = voice
+        self.rate = rate
+
+    def _audio(self) -> bytes:
+        seconds = max(1.0, len(self.text) / MOCK_CHARS_PER_SECOND)
+        return b"\xff\xf3" * int(seconds * MOCK_AUDIO_BITRATE / 16)
+
+    async def save(self, path: str) -> None:
+        await self.endpoint.run()
+        with open(path, "wb") as f:
+            f.write(self._audio())
+
+    async def stream(self) -> AsyncIterator[Dict]:
+        self.endpoint.admit()
+        audio = self._audio()
+        chunks = 8
+        size = max(1, -(-len(audio) // chunks))
+        latency = self.endpoint.latency()
+        for start in range(0, len(audio), size):
+            await asyncio.sleep(latency / chunks)
+            yield {"type": "audio", "data": audio[start:start + size]}
+        self.endpoint.maybe_fail()
+
+
+class MockEdgeTTS:
+    """Module-like stand-in for edge_tts (Communicate and list_voices)"""
+
+    VOICES: List[Dict] = [
+        {"ShortName": "en-US-GuyNeural", "Locale": "en-US", "Gender": "Male", "FriendlyName": "Guy"},
+        {"ShortName": "en-US-JennyNeural", "Locale": "en-US", "Gender": "Female", "FriendlyName": "Jenny"},
+        {"ShortName": "de-DE-KatjaNeural", "Locale": "de-DE", "Gender": "Female", "FriendlyName": "Katja"},
+    ]
+
+    def __init__(self, profile: Optional[LatencyProfile] = None, seed: Optional[int] = None):
+        endpoint = SimulatedEndpoint("edge-tts", profile or LatencyProfile(), seed)
+        self.Communicate = type("Communicate", (MockCommunicate,), {"endpoint": endpoint})
+        self.endpoint = endpoint
+
+    async def list_voices(self) -> List[Dict]:
+        return [dict(voice) for voice in self.VOICES]
@@ -0,0 +1,99 @@
+"""
+Progress Stream - In-process fan-out of job progress events
+Feeds the SSE and WebSocket endpoints. Every subscriber gets its own bounded
+buffer; a slow subscriber loses its oldest events instead of blocking the
+job or growing memory without limit.
+"""
+
+import os
+import json
+import asyncio
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+
+# Events buffered per subscriber before the oldest are dropped
+STREAM_BUFFER = int(os.getenv("SHORTS_STREAM_BUFFER", 64))
+
+# Jobs whose event sequence numbers are remembered (least recently published
+# dropped first); render workers rarely see the terminal event of a job
+STREAM_MAX_JOBS = int(os.getenv("SHORTS_STREAM_MAX_JOBS", 10000))
+
+# Event name that ends a stream
+END_EVENT = "status"
+
+
+class Subscription:
+    """One subscriber's view of a job's event stream"""
+
+    def __init__(self, broker: "ProgressBroker", job_id: str, maxsize: int):
+        self.broker = broker
+        self.job_id = job_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def push(self, event: Dict) -> None:
+        if self.queue.full():
+            # Progress events are cumulative, so dropping the oldest is safe
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def next(self, timeout: Optional[float] = None) -> Optional[Dict]:
+        """Next event, or None if nothing arrived within timeout"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self.broker.unsubscribe(self)
+
+
+class ProgressBroker:
+    """Publishes job events to any number of subscribers per job"""
+
+    def __init__(self, buffer: int = STREAM_BUFFER, max_jobs: int = STREAM_MAX_JOBS):
+        self.buffer = buffer
+        self.max_jobs = max_jobs
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._sequence: "OrderedDict[str, int]" = OrderedDict()
+
+    def subscribe(self, job_id: str) -> Subscription:
+        subscription = Subscription(self, job_id, self.buffer)
+        self._subscribers.setdefault(job_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.job_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.job_id]
+
+    def publish(self, job_id: str, event: str, data: Dict) -> None:
+        """Send an event to every subscriber of job_id (never blocks)"""
+        sequence = self._sequence.pop(job_id, 0) + 1
+        if event != END_EVENT or data.get('status') in ('queued', 'processing'):
+            self._sequence[job_id] = sequence
+            if len(self._sequence) > self.max_jobs:
+                self._sequence.popitem(last=False)
+        message = {'id': sequence, 'event': event, 'data': data}
+        for subscription in list(self._subscribers.get(job_id, ())):
+            subscription.push(message)
+
+    def forget(self, job_id: str) -> None:
+        """Drop a finished job's sequence counter (its status event was sent elsewhere)"""
+        self._sequence.pop(job_id, None)
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+def format_sse(message: Dict) -> str:
+    """Encode a broker message as a Server-Sent Events frame"""
+    return (
+        f"id: {message['id']}\n"
+        f"event: {message['event']}\n"
+        f"data: {json.dumps(message['data'])}\n\n"
+    )
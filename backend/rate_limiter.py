@@ -0,0 +1,339 @@
+"""
+Rate Limiter - Shared per-endpoint throttling for upstream model calls
+Each upstream endpoint (Flux, Kling, Gemini) gets a token bucket for call
+rate, an AIMD concurrency limit that backs off on throttling/slow responses,
+and jittered retries that only repeat errors worth repeating.
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import weakref
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from metrics import REGISTRY, record_span, span
+from log import get_logger
+
+T = TypeVar("T")
+
+logger = get_logger("upstream")
+
+UPSTREAM_WAIT = REGISTRY.histogram(
+    "shorts_upstream_queue_seconds", "Time calls wait for a rate-limit token and slot", ("endpoint",)
+)
+UPSTREAM_ATTEMPTS = REGISTRY.histogram(
+    "shorts_upstream_attempt_seconds", "Duration of each upstream attempt (including queue wait)",
+    ("endpoint", "outcome")
+)
+UPSTREAM_RETRIES = REGISTRY.counter(
+    "shorts_upstream_retries_total", "Upstream attempts that were retried", ("endpoint",)
+)
+
+# Per-endpoint defaults; override with SHORTS_RATE_LIMITS (JSON, same shape)
+DEFAULT_LIMITS = {
+    "fal-ai/flux-pro/v1.1-ultra": {
+        "rate": 2.0, "burst": 5, "max_concurrency": 8, "latency_target": 60,
+    },
+    "fal-ai/kling-video/v1/standard/image-to-video": {
+        "rate": 1.0, "burst": 3, "max_concurrency": 6, "latency_target": 600,
+    },
+    "gemini": {
+        "rate": 1.0, "burst": 5, "max_concurrency": 4, "latency_target": 30,
+    },
+}
+FALLBACK_LIMITS = {"rate": 1.0, "burst": 3, "max_concurrency": 4, "latency_target": 120}
+LIMITS = {**DEFAULT_LIMITS, **json.loads(os.getenv("SHORTS_RATE_LIMITS", "{}"))}
+
+# Retry backoff (full jitter)
+BACKOFF_BASE = 1.0  # seconds
+BACKOFF_CAP = 30.0  # seconds
+
+# Status codes that are worth retrying; any other 4xx is fatal
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    """Best-effort HTTP status from fal_client/httpx/google-api-core errors"""
+    for candidate in (
+        getattr(error, "status_code", None),
+        getattr(getattr(error, "response", None), "status_code", None),
+        getattr(error, "code", None),
+    ):
+        if isinstance(candidate, int):
+            return candidate
+    return None
+
+
+def is_throttle(error: Exception) -> bool:
+    """Upstream told us to slow down"""
+    if _status_code(error) == 429:
+        return True
+    message = str(error).lower()
+    return "rate limit" in message or "resource exhausted" in message or "too many requests" in message
+
+
+def is_retryable(error: Exception) -> bool:
+    """Transient errors (throttling, 5xx, timeouts, dropped connections)"""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError, TimeoutError)):
+        return True
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    if isinstance(error, (ValueError, TypeError, KeyError)):
+        return False
+    # Unknown errors (e.g. transport failures without a status) get retried
+    return True
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Retry-After header value in seconds, if the upstream sent one"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, error: Optional[Exception] = None) -> float:
+    """Full-jitter exponential backoff, honouring Retry-After when present"""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt + 1)))
+    hinted = retry_after(error) if error is not None else None
+    return max(delay, hinted) if hinted else delay
+
+
+class TokenBucket:
+    """Reservation-based token bucket: callers queue in arrival order"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+
+    def reserve(self) -> float:
+        """Take a token (possibly borrowing) and return seconds to wait for it"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= 1
+        wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        return max(wait, self._blocked_until - now)
+
+    def refund(self) -> None:
+        self._tokens = min(self.burst, self._tokens + 1)
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every caller for a while (e.g. after a 429)"""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+class AdaptiveConcurrency:
+    """AIMD concurrency limit: +1/limit per fast success, halve on throttling"""
+
+    DECREASE_COOLDOWN = 2.0  # seconds between multiplicative decreases
+
+    def __init__(self, max_limit: int, min_limit: int = 1, initial: Optional[int] = None):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(initial or max(min_limit, max_limit // 2))
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        if not self._waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was granted just as we were cancelled: hand it on
+                self.release()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    # Already popped (and skipped as cancelled) by _wake
+                    pass
+            raise
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def on_success(self) -> None:
+        self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._wake()
+
+    def on_overload(self, factor: float = 0.5) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.DECREASE_COOLDOWN:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * factor)
+
+
+class EndpointLimiter:
+    """Token bucket + adaptive concurrency + wait-time metrics for one endpoint"""
+
+    def __init__(
+        self,
+        endpoint: str,
+        rate: float,
+        burst: int,
+        max_concurrency: int,
+        latency_target: float
+    ):
+        self.endpoint = endpoint
+        self.latency_target = latency_target
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.calls = 0
+        self.errors = 0
+        self.throttled = 0
+        self._waits: Deque[float] = deque(maxlen=500)
+        self._wait_total = 0.0
+        self._wait_count = 0
+
+    async def run(self, call: Callable[[], Awaitable[T]]) -> T:
+        """Wait for a token and a concurrency slot, then run call()"""
+        queued_at = time.monotonic()
+
+        delay = self.bucket.reserve()
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self.bucket.refund()
+                raise
+        await self.concurrency.acquire()
+
+        started = time.monotonic()
+        wait = started - queued_at
+        self._record_wait(wait)
+        UPSTREAM_WAIT.observe(wait, endpoint=self.endpoint)
+        record_span("upstream_wait", time.perf_counter() - wait, wait, endpoint=self.endpoint)
+        self.calls += 1
+        try:
+            result = await call()
+        except Exception as e:
+            self.errors += 1
+            if is_throttle(e):
+                self.throttled += 1
+                self.concurrency.on_overload()
+                self.bucket.pause(retry_after(e) or BACKOFF_BASE)
+            raise
+        finally:
+            self.concurrency.release()
+
+        if time.monotonic() - started > self.latency_target:
+            # Upstream is struggling: shed a little load before it starts throttling
+            self.concurrency.on_overload(factor=0.9)
+        else:
+            self.concurrency.on_success()
+        return result
+
+    def _record_wait(self, seconds: float) -> None:
+        self._waits.append(seconds)
+        self._wait_total += seconds
+        self._wait_count += 1
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+
+        def percentile(p: float) -> float:
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 3) if waits else 0.0
+
+        return {
+            "concurrency_limit": round(self.concurrency.limit, 2),
+            "in_flight": self.concurrency.in_flight,
+            "waiting": self.concurrency.waiting,
+            "calls": self.calls,
+            "errors": self.errors,
+            "throttled": self.throttled,
+            "queue_wait_seconds": {
+                "count": self._wait_count,
+                "avg": round(self._wait_total / self._wait_count, 3) if self._wait_count else 0.0,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": round(waits[-1], 3) if waits else 0.0,
+            },
+        }
+
+
+# Limiters hold asyncio futures, so each event loop gets its own set
+_limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, EndpointLimiter]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _loop_limiters() -> Dict[str, EndpointLimiter]:
+    return _limiters.setdefault(asyncio.get_running_loop(), {})
+
+
+def get_rate_limiter(endpoint: str) -> EndpointLimiter:
+    """Shared limiter for an endpoint on the current event loop"""
+    limiters = _loop_limiters()
+    limiter = limiters.get(endpoint)
+    if limiter is None:
+        config = {**FALLBACK_LIMITS, **LIMITS.get(endpoint, {})}
+        limiter = limiters[endpoint] = EndpointLimiter(endpoint, **config)
+    return limiter
+
+
+def rate_limit_stats() -> Dict[str, Dict]:
+    """Stats for every limiter on the current event loop"""
+    return {endpoint: limiter.stats() for endpoint, limiter in _loop_limiters().items()}
+
+
+async def call_with_retry(
+    endpoint: str,
+    call: Callable[[], Awaitable[T]],
+    retry_count: int = 3
+) -> T:
+    """Run call() through the endpoint's limiter, retrying transient failures"""
+    limiter = get_rate_limiter(endpoint)
+    for attempt in range(retry_count):
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            return await limiter.run(call)
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except Exception as e:
+            error = e
+            outcome = "throttled" if is_throttle(e) else "error"
+            logger.warning(
+                "⚠️ Upstream attempt failed",
+                extra={"endpoint": endpoint, "attempt": attempt + 1, "of": retry_count, "error": str(e)}
+            )
+            if attempt >= retry_count - 1 or not is_retryable(e):
+                raise
+        finally:
+            seconds = time.perf_counter() - started
+            UPSTREAM_ATTEMPTS.observe(seconds, endpoint=endpoint, outcome=outcome)
+            record_span("attempt", started, seconds, outcome, endpoint=endpoint, attempt=attempt + 1)
+        UPSTREAM_RETRIES.inc(endpoint=endpoint)
+        with span("backoff", endpoint=endpoint, attempt=attempt + 1):
+            await asyncio.sleep(backoff_delay(attempt, error))
@@ -0,0 +1,135 @@
+"""
+Scenario Cache - In-process memoization for Gemini scenario generation
+Identical (normalized) requests return the cached scenario, and concurrent
+identical requests share a single in-flight Gemini call.
+"""
+
+import os
+import copy
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# Cache configuration
+SCENARIO_CACHE_SIZE = int(os.getenv("SHORTS_SCENARIO_CACHE_SIZE", 256))
+SCENARIO_CACHE_TTL = int(os.getenv("SHORTS_SCENARIO_CACHE_TTL", 3600))  # seconds
+
+
+def scenario_key(user_input: str, target_duration: int, scene_duration_range: tuple) -> Tuple:
+    """Normalize generate_scenario inputs into a cache key"""
+    normalized_input = " ".join(user_input.split())
+    min_dur, max_dur = scene_duration_range
+    return (normalized_input, int(target_duration), int(min_dur), int(max_dur))
+
+
+class ScenarioCache:
+    """TTL + LRU bounded memo with single-flight de-duplication"""
+
+    def __init__(self, max_entries: int = SCENARIO_CACHE_SIZE, ttl: int = SCENARIO_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        """Return a copy of the cached value, or None on miss/expiry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if self.ttl and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        # Callers may mutate the scenario, so never hand out the stored object
+        return copy.deepcopy(value)
+
+    def put(self, key: Tuple, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def get_or_create(
+        self,
+        key: Tuple,
+        create: Callable[[], Awaitable[Any]],
+        refresh: bool = False
+    ) -> Any:
+        """
+        Return the cached value for key or build it with create()
+
+        With refresh=True the lookup is skipped but the fresh result is still
+        stored. Concurrent callers on the same event loop wait on the leader's
+        call instead of issuing their own.
+        """
+        if not refresh:
+            cached = self.get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+
+        loop = asyncio.get_running_loop()
+        pending = self._inflight.get(key)
+        if pending is not None and pending.get_loop() is loop:
+            self.shared += 1
+            try:
+                return copy.deepcopy(await asyncio.shield(pending))
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The leader was cancelled, not us: make the call ourselves
+
+        self.misses += 1
+        future = loop.create_future()
+        self._inflight[key] = future
+        try:
+            value = await create()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = len(self._entries)
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared_inflight": self.shared,
+        }
+
+
+_default_cache: Optional[ScenarioCache] = None
+_default_lock = threading.Lock()
+
+
+def get_scenario_cache() -> Optional[ScenarioCache]:
+    """Process-wide scenario cache (None when SHORTS_SCENARIO_CACHE_SIZE is 0)"""
+    global _default_cache
+    if SCENARIO_CACHE_SIZE <= 0:
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ScenarioCache()
+        return _default_cache
@@ -0,0 +1,245 @@
+"""
+Scenario Parser - Tolerant, incremental parsing of Gemini scenario JSON
+Scenes are emitted as soon as their JSON object closes in the response
+stream, truncated responses are repaired instead of discarded, and every
+scene is validated against the requested scene_duration_range.
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Gemini response schema for ScenarioOutput (JSON mode)
+SCENARIO_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "master_style": {"type": "STRING"},
+        "character_attributes": {"type": "STRING"},
+        "total_duration": {"type": "INTEGER"},
+        "scenes": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "scene_id": {"type": "INTEGER"},
+                    "voiceover": {"type": "STRING"},
+                    "image_prompt": {"type": "STRING"},
+                    "duration": {"type": "INTEGER"},
+                },
+                "required": ["scene_id", "voiceover", "image_prompt", "duration"],
+            },
+        },
+    },
+    "required": ["master_style", "character_attributes", "total_duration", "scenes"],
+}
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class ScenarioError(Exception):
+    """Raised when no usable scenario can be recovered from a response"""
+
+
+def repair_json(text: str) -> Any:
+    """
+    Parse the first JSON object in text, repairing truncation if needed
+
+    Markdown fences and trailing chatter are ignored. A truncated document is
+    cut back to the last complete value and its open containers are closed,
+    so a response cut off mid-scene still yields the scenes before it.
+    """
+    start = text.find("{")
+    if start < 0:
+        raise ScenarioError("No JSON object in response")
+    body = text[start:]
+
+    try:
+        return json.JSONDecoder().raw_decode(body)[0]
+    except json.JSONDecodeError:
+        pass
+
+    # Positions where the document can be cut and closed: just before a
+    # comma, or just after a closing bracket, with the containers still open
+    cut_points: List[Tuple[int, str]] = []
+    stack: List[str] = []
+    in_string = escape = False
+    for i, c in enumerate(body):
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+            continue
+        if c == '"':
+            in_string = True
+        elif c in "{[":
+            stack.append(c)
+        elif c in "}]":
+            if stack:
+                stack.pop()
+            cut_points.append((i + 1, "".join(stack)))
+            if not stack:
+                break
+        elif c == ",":
+            cut_points.append((i, "".join(stack)))
+
+    for cut, open_containers in reversed(cut_points):
+        candidate = body[:cut] + "".join(_CLOSERS[c] for c in reversed(open_containers))
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    raise ScenarioError("Response JSON could not be repaired")
+
+
+def normalize_scene(raw: Any, scene_duration_range: Tuple[int, int], used_ids: Set[int]) -> Optional[Dict]:
+    """
+    Validate one scene, or None if it is unusable
+
+    Durations outside scene_duration_range are clamped into it, and missing
+    or duplicate scene ids are replaced by the next free id.
+    """
+    if not isinstance(raw, dict):
+        return None
+    image_prompt = raw.get("image_prompt")
+    voiceover = raw.get("voiceover")
+    if not isinstance(image_prompt, str) or not image_prompt.strip() or not isinstance(voiceover, str):
+        return None
+
+    min_dur, max_dur = scene_duration_range
+    try:
+        duration = float(raw.get("duration"))
+    except (TypeError, ValueError):
+        duration = (min_dur + max_dur) / 2
+    duration = int(round(min(max(duration, min_dur), max_dur)))
+
+    scene_id = raw.get("scene_id")
+    if not isinstance(scene_id, int) or isinstance(scene_id, bool) or scene_id in used_ids:
+        scene_id = max(used_ids, default=0) + 1
+    used_ids.add(scene_id)
+
+    return {
+        "scene_id": scene_id,
+        "voiceover": voiceover.strip(),
+        "image_prompt": image_prompt.strip(),
+        "duration": duration,
+    }
+
+
+class IncrementalScenarioParser:
+    """
+    Feed response chunks; get validated scenes as each one completes
+
+    Only the "scenes" array of the top-level object is tracked, so the rest
+    of the document may arrive in any key order.
+    """
+
+    def __init__(self, scene_duration_range: Tuple[int, int]):
+        self.scene_duration_range = scene_duration_range
+        self.scenes: List[Dict] = []
+        self._text = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._started = False
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._scenes_depth: Optional[int] = None
+        self._object_start: Optional[int] = None
+        self._raw_seen = 0
+        self._used_ids: Set[int] = set()
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """Consume a chunk and return the scenes it completed"""
+        self._text += chunk
+        text = self._text
+        new_scenes = []
+
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start + 1:i]
+                continue
+            if not self._started:
+                # Skip markdown fences or chatter before the document
+                if c != "{":
+                    continue
+                self._started = True
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+            elif c in "{[":
+                if c == "[" and len(self._stack) == 1 and self._last_string == "scenes":
+                    self._scenes_depth = 2
+                self._stack.append(c)
+                if c == "{" and self._scenes_depth and len(self._stack) == self._scenes_depth + 1:
+                    self._object_start = i
+            elif c in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if c == "}" and self._object_start is not None and len(self._stack) == self._scenes_depth:
+                    scene = self._complete_scene(text[self._object_start:i + 1])
+                    self._object_start = None
+                    if scene:
+                        new_scenes.append(scene)
+                elif c == "]" and self._scenes_depth and len(self._stack) < self._scenes_depth:
+                    self._scenes_depth = None
+
+        self._pos = len(text)
+        return new_scenes
+
+    def _complete_scene(self, raw_text: str) -> Optional[Dict]:
+        self._raw_seen += 1
+        try:
+            raw = json.loads(raw_text)
+        except json.JSONDecodeError:
+            return None
+        return self._accept(raw)
+
+    def _accept(self, raw: Any) -> Optional[Dict]:
+        scene = normalize_scene(raw, self.scene_duration_range, self._used_ids)
+        if scene:
+            self.scenes.append(scene)
+        return scene
+
+    def finish(self) -> Tuple[Dict, List[Dict]]:
+        """
+        Parse the whole response (repairing truncation)
+
+        Returns the scenario dict and the scenes that only became available
+        through repair (not yet returned by feed). Raises ScenarioError if no
+        usable scene was found.
+        """
+        try:
+            data = repair_json(self._text)
+        except ScenarioError:
+            if not self.scenes:
+                raise
+            data = {}
+        if not isinstance(data, dict):
+            data = {}
+
+        raw_scenes = data.get("scenes") if isinstance(data.get("scenes"), list) else []
+        recovered = [
+            scene for scene in (self._accept(raw) for raw in raw_scenes[self._raw_seen:]) if scene
+        ]
+        if not self.scenes:
+            raise ScenarioError("Response contained no valid scenes")
+
+        scenario = {
+            "master_style": data.get("master_style") if isinstance(data.get("master_style"), str) else "",
+            "character_attributes": (
+                data.get("character_attributes") if isinstance(data.get("character_attributes"), str) else ""
+            ),
+            "total_duration": sum(scene["duration"] for scene in self.scenes),
+            "scenes": list(self.scenes),
+        }
+        return scenario, recovered
@@ -4,28 +4,118 @@ Uses Fal.ai for text-to-image and image-to-video generation
 """
 
 import os
-import time
 import json
-from typing import Dict, List, Optional, Literal
-from dataclasses import dataclass
-from dotenv import load_dotenv
-import fal_client
-import google.generativeai as genai
+import asyncio
+import threading
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Literal, Union
+from dataclasses import dataclass, field, asdict
 
-# Load environment variables
-load_dotenv()
+from asset_cache import AssetCache, cache_key, get_asset_cache
+from scenario_cache import ScenarioCache, get_scenario_cache, scenario_key
+from rate_limiter import call_with_retry
+from downloader import get_downloader
+from scenario_parser import SCENARIO_SCHEMA, IncrementalScenarioParser
+from clients import ClientRegistry, get_clients
+from image_scoring import ImageScorer
+from single_flight import SingleFlight, get_single_flight
+from metrics import REGISTRY, span
+from log import configure_logging, get_logger
 
-# Configure APIs
-FAL_KEY = os.getenv("FAL_KEY")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+logger = get_logger("factory")
 
-if not FAL_KEY:
-    raise ValueError("FAL_KEY not found in environment variables")
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY not found in environment variables")
+ASSET_CACHE_LOOKUPS = REGISTRY.counter(
+    "shorts_asset_cache_lookups_total", "Image/clip cache lookups", ("kind", "result")
+)
 
-genai.configure(api_key=GEMINI_API_KEY)
-os.environ["FAL_KEY"] = FAL_KEY
+# Pipeline concurrency (max Fal.ai jobs in flight per stage)
+MAX_INFLIGHT_IMAGES = int(os.getenv("SHORTS_MAX_INFLIGHT_IMAGES", 2))
+MAX_INFLIGHT_VIDEOS = int(os.getenv("SHORTS_MAX_INFLIGHT_VIDEOS", 2))
+
+# Flux candidates drawn per scene image; the best is kept (1 = no best-of)
+IMAGE_CANDIDATES = min(4, max(1, int(os.getenv("SHORTS_IMAGE_CANDIDATES", 1))))
+
+# Copy finished clips into the local content store while later scenes render
+MIRROR_ASSETS = os.getenv("SHORTS_MIRROR_ASSETS", "1") == "1"
+
+# Upstream models
+IMAGE_MODEL = "fal-ai/flux-pro/v1.1-ultra"
+VIDEO_MODEL = "fal-ai/kling-video/v1/standard/image-to-video"
+GEMINI_ENDPOINT = "gemini"  # rate limiter key for scenario generation
+
+# Gemini JSON mode: the response is constrained to the ScenarioOutput schema
+SCENARIO_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": SCENARIO_SCHEMA,
+}
+
+# Generation parameters that determine an asset (used for cache keys)
+IMAGE_KEY_FIELDS = ("prompt", "image_size", "num_inference_steps", "guidance_scale")
+VIDEO_KEY_FIELDS = ("prompt", "image_url", "duration", "aspect_ratio")
+
+# Clip lengths Kling can render, in seconds
+KLING_DURATIONS = (5, 10)
+
+# Scenario prompt, filled in with str.format (literal braces are doubled)
+SCENARIO_PROMPT_TEMPLATE = """You are a world-class cinematographer and visual storytelling expert.
+
+TASK: Break down the following idea/story into {num_scenes} visual scenes optimized for AI video generation.
+
+USER INPUT:
+{user_input}
+
+CRITICAL RULES FOR VISUAL CONSISTENCY:
+1. Define ONE Master Visual Style for the ENTIRE video (e.g., "Cinematic 8k, photorealistic, warm golden hour lighting, film grain, shallow depth of field")
+2. Identify main character(s) and their FIXED attributes (e.g., "25-year-old woman with long red curly hair, green eyes, wearing elegant blue silk dress")
+3. REPEAT Master Style + Character Attributes in EVERY single scene prompt
+4. Each scene duration: {min_dur}-{max_dur} seconds
+5. Target total duration: ~{target_duration} seconds
+
+OUTPUT FORMAT (Strict JSON):
+{{
+  "master_style": "Your defined master visual style",
+  "character_attributes": "Detailed character description (if applicable, empty string if no characters)",
+  "total_duration": {target_duration},
+  "scenes": [
+    {{
+      "scene_id": 1,
+      "voiceover": "What the narrator says or on-screen text",
+      "image_prompt": "Detailed visual description + master_style + character_attributes. Be specific about composition, lighting, camera angle.",
+      "duration": {min_dur}
+    }}
+  ]
+}}
+
+EXAMPLE SCENE PROMPT:
+"Wide shot of a young woman with long red curly hair and green eyes wearing an elegant blue silk dress, standing on a misty mountain peak at sunrise, looking at the horizon. Cinematic 8k, photorealistic, warm golden hour lighting, film grain, shallow depth of field."
+
+Generate the JSON now:"""
+
+
+def expected_scene_count(target_duration: int, scene_duration_range: tuple) -> int:
+    """Number of scenes the scenario prompt asks for"""
+    min_dur, max_dur = scene_duration_range
+    return max(1, target_duration // ((min_dur + max_dur) // 2))
+
+
+async def _iterate_scenes(scenes: Union[Iterable, AsyncIterable]) -> AsyncIterator:
+    """Walk a scene list or a scene stream the same way"""
+    if hasattr(scenes, "__aiter__"):
+        async for scene in scenes:
+            yield scene
+    else:
+        for scene in scenes:
+            yield scene
+
+
+def previous_frame(frames: Dict[int, str], scene_id: int) -> Optional[str]:
+    """Image of the closest earlier scene that has one (best-of reference)"""
+    earlier = [other for other in frames if other < scene_id]
+    return frames[max(earlier)] if earlier else None
+
+
+def kling_duration(seconds: float) -> str:
+    """Kling clip length closest to a scene duration (assembly time-fits the rest)"""
+    return str(min(KLING_DURATIONS, key=lambda d: (abs(d - seconds), d)))
 
 
 @dataclass
@@ -56,11 +146,66 @@ class VideoScene:
     duration: int
 
 
-class ShortsFactory:
-    """Main class for generating YouTube Shorts"""
+@dataclass
+class JobCheckpoint:
+    """Resumable progress of a process_shorts run"""
+    scenario: Optional[ScenarioOutput] = None
+    completed: Dict[int, VideoScene] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict:
+        return {
+            'scenario': asdict(self.scenario) if self.scenario else None,
+            'completed': [asdict(scene) for scene in self.completed.values()],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> "JobCheckpoint":
+        if not data:
+            return cls()
+        scenario = None
+        if data.get('scenario'):
+            scenario_data = dict(data['scenario'])
+            scenario_data['scenes'] = [SceneData(**scene) for scene in scenario_data['scenes']]
+            scenario = ScenarioOutput(**scenario_data)
+        completed = {scene['scene_id']: VideoScene(**scene) for scene in data.get('completed', [])}
+        return cls(scenario=scenario, completed=completed)
+
+
+class AsyncShortsFactory:
+    """
+    Asyncio engine for generating YouTube Shorts
+    
+    All upstream calls (Gemini, Fal.ai) are awaited rather than blocking a
+    thread, so one event loop can drive many jobs and scenes concurrently.
+    """
+    
+    def __init__(
+        self,
+        max_inflight_images: int = MAX_INFLIGHT_IMAGES,
+        max_inflight_videos: int = MAX_INFLIGHT_VIDEOS,
+        cache: Optional[AssetCache] = None,
+        scenario_cache: Optional[ScenarioCache] = None,
+        mirror_assets: bool = MIRROR_ASSETS,
+        clients: Optional[ClientRegistry] = None,
+        flights: Optional[SingleFlight] = None
+    ):
+        # Clients are configured on first upstream call, not here
+        self.clients = clients or get_clients()
+        # Identical in-flight Flux/Kling calls are shared across jobs
+        self.flights = flights or get_single_flight()
+        self.max_inflight_images = max(1, max_inflight_images)
+        self.max_inflight_videos = max(1, max_inflight_videos)
+        self.cache = cache if cache is not None else get_asset_cache()
+        self.scenario_cache = scenario_cache if scenario_cache is not None else get_scenario_cache()
+        # Mock URLs cannot be downloaded
+        self.mirror_assets = mirror_assets and not self.clients.mock
+        self._mirror_tasks = set()
+        self.scorer = ImageScorer()
     
-    def __init__(self):
-        self.gemini_model = genai.GenerativeModel('gemini-1.5-flash')
+    @property
+    def gemini_model(self):
+        """Shared Gemini model from the client registry"""
+        return self.clients.gemini_model()
         
     def _build_scenario_prompt(
         self, 
@@ -71,172 +216,482 @@ class ShortsFactory:
         """Build the LLM prompt for scenario generation"""
         
         min_dur, max_dur = scene_duration_range
-        num_scenes = target_duration // ((min_dur + max_dur) // 2)
         
-        return f"""You are a world-class cinematographer and visual storytelling expert.
-
-TASK: Break down the following idea/story into {num_scenes} visual scenes optimized for AI video generation.
-
-USER INPUT:
-{user_input}
-
-CRITICAL RULES FOR VISUAL CONSISTENCY:
-1. Define ONE Master Visual Style for the ENTIRE video (e.g., "Cinematic 8k, photorealistic, warm golden hour lighting, film grain, shallow depth of field")
-2. Identify main character(s) and their FIXED attributes (e.g., "25-year-old woman with long red curly hair, green eyes, wearing elegant blue silk dress")
-3. REPEAT Master Style + Character Attributes in EVERY single scene prompt
-4. Each scene duration: {min_dur}-{max_dur} seconds
-5. Target total duration: ~{target_duration} seconds
-
-OUTPUT FORMAT (Strict JSON):
-{{
-  "master_style": "Your defined master visual style",
-  "character_attributes": "Detailed character description (if applicable, empty string if no characters)",
-  "total_duration": {target_duration},
-  "scenes": [
-    {{
-      "scene_id": 1,
-      "voiceover": "What the narrator says or on-screen text",
-      "image_prompt": "Detailed visual description + master_style + character_attributes. Be specific about composition, lighting, camera angle.",
-      "duration": {min_dur}
-    }}
-  ]
-}}
+        return SCENARIO_PROMPT_TEMPLATE.format(
+            num_scenes=expected_scene_count(target_duration, scene_duration_range),
+            user_input=user_input,
+            min_dur=min_dur,
+            max_dur=max_dur,
+            target_duration=target_duration
+        )
 
-EXAMPLE SCENE PROMPT:
-"Wide shot of a young woman with long red curly hair and green eyes wearing an elegant blue silk dress, standing on a misty mountain peak at sunrise, looking at the horizon. Cinematic 8k, photorealistic, warm golden hour lighting, film grain, shallow depth of field."
-
-Generate the JSON now:"""
-
-    def generate_scenario(
+    async def generate_scenario(
         self,
         user_input: str,
         target_duration: int = 60,
-        scene_duration_range: tuple = (8, 15)
+        scene_duration_range: tuple = (8, 15),
+        use_cache: bool = True,
+        on_scene: Optional[callable] = None
     ) -> ScenarioOutput:
-        """Generate structured scenario using Gemini LLM"""
+        """
+        Generate structured scenario using Gemini LLM
         
-        print(f"🎬 Generating scenario for: {user_input[:50]}...")
+        Identical (whitespace-normalized) inputs are served from the scenario
+        cache and concurrent duplicates share one Gemini call. With
+        use_cache=False a fresh scenario is generated and replaces the cached one.
+        
+        on_scene is called with each SceneData as soon as Gemini has finished
+        writing it; it is not called for cached or shared scenarios.
+        """
+        
+        generate = lambda: self._generate_scenario(
+            user_input, target_duration, scene_duration_range, on_scene
+        )
+        if not self.scenario_cache:
+            return await generate()
+        
+        return await self.scenario_cache.get_or_create(
+            scenario_key(user_input, target_duration, scene_duration_range),
+            generate,
+            refresh=not use_cache
+        )
+
+    async def _generate_scenario(
+        self,
+        user_input: str,
+        target_duration: int,
+        scene_duration_range: tuple,
+        on_scene: Optional[callable] = None
+    ) -> ScenarioOutput:
+        """
+        Stream a scenario from Gemini in JSON mode and parse it incrementally
+        
+        Scenes are validated against scene_duration_range and handed to
+        on_scene as soon as each one is complete. A truncated response is
+        repaired instead of re-requested; a stream that breaks after scenes
+        were handed out is not retried, since those scenes may already be
+        rendering.
+        """
+        
+        logger.info("🎬 Generating scenario", extra={"idea": user_input[:50]})
         
         prompt = self._build_scenario_prompt(user_input, target_duration, scene_duration_range)
         
-        try:
-            response = self.gemini_model.generate_content(prompt)
-            response_text = response.text
-            
-            # Extract JSON from markdown code blocks if present
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0]
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0]
-            
-            scenario_data = json.loads(response_text.strip())
-            
-            # Parse into dataclass
-            scenes = [
-                SceneData(
-                    scene_id=scene['scene_id'],
-                    voiceover=scene['voiceover'],
-                    image_prompt=scene['image_prompt'],
-                    duration=scene['duration']
-                )
-                for scene in scenario_data['scenes']
-            ]
-            
-            output = ScenarioOutput(
-                master_style=scenario_data['master_style'],
-                character_attributes=scenario_data.get('character_attributes', ''),
-                total_duration=scenario_data['total_duration'],
-                scenes=scenes
+        def emit(scene: Dict):
+            if on_scene:
+                on_scene(SceneData(**scene))
+        
+        async def stream_scenario() -> Dict:
+            parser = IncrementalScenarioParser(scene_duration_range)
+            response = await self.gemini_model.generate_content_async(
+                prompt, generation_config=SCENARIO_GENERATION_CONFIG, stream=True
             )
+            try:
+                async for chunk in response:
+                    for scene in parser.feed(chunk.text):
+                        emit(scene)
+            except Exception as e:
+                if not parser.scenes:
+                    raise
+                logger.warning(
+                    "⚠️ Scenario stream broke, repairing",
+                    extra={"scenes": len(parser.scenes), "error": str(e)}
+                )
             
-            print(f"✅ Scenario generated: {len(scenes)} scenes, Master Style: {output.master_style[:50]}...")
-            return output
-            
+            # Raises ScenarioError (retried) when nothing usable came back
+            scenario_data, recovered = parser.finish()
+            for scene in recovered:
+                emit(scene)
+            return scenario_data
+        
+        try:
+            with span("scenario"):
+                scenario_data = await call_with_retry(GEMINI_ENDPOINT, stream_scenario)
         except Exception as e:
-            print(f"❌ Error generating scenario: {e}")
+            logger.error("❌ Error generating scenario", extra={"error": str(e)})
             raise
+        
+        output = ScenarioOutput(
+            master_style=scenario_data['master_style'],
+            character_attributes=scenario_data['character_attributes'],
+            total_duration=scenario_data['total_duration'],
+            scenes=[SceneData(**scene) for scene in scenario_data['scenes']]
+        )
+        
+        expected = expected_scene_count(target_duration, scene_duration_range)
+        if len(output.scenes) != expected:
+            logger.warning(
+                "⚠️ Scenario scene count mismatch",
+                extra={"scenes": len(output.scenes), "requested": expected}
+            )
+        logger.info(
+            "✅ Scenario generated",
+            extra={"scenes": len(output.scenes), "master_style": output.master_style[:50]}
+        )
+        return output
 
-    def create_scene_image(
+    async def _run_fal(self, application: str, arguments: Dict) -> Dict:
+        """Submit a Fal.ai request and await its result without blocking the loop"""
+        handle = await self.clients.fal.submit_async(application, arguments=arguments)
+        try:
+            return await handle.get()
+        except asyncio.CancelledError:
+            # Stop the upstream job too, so a cancelled Short stops spending credits
+            try:
+                await asyncio.shield(handle.cancel())
+            except Exception as e:
+                logger.warning(
+                    "⚠️ Could not cancel Fal.ai request",
+                    extra={"request_id": handle.request_id, "error": str(e)}
+                )
+            raise
+
+    async def create_scene_image(
         self,
         prompt: str,
         scene_id: int,
-        retry_count: int = 3
+        retry_count: int = 3,
+        reference_url: Optional[str] = None,
+        num_images: int = IMAGE_CANDIDATES
     ) -> str:
-        """Generate image for scene using Fal.ai text-to-image"""
+        """
+        Generate image for scene using Fal.ai text-to-image
         
-        print(f"🎨 Creating image for scene {scene_id}...")
+        With num_images > 1 one Flux call draws several candidates and the
+        scorer keeps the sharpest, most consistent with reference_url (the
+        previous scene's frame). If the safety checker flags every
+        candidate, the call is retried with a fresh draw.
+        """
         
-        for attempt in range(retry_count):
-            try:
-                result = fal_client.subscribe(
-                    "fal-ai/flux-pro/v1.1-ultra",
-                    arguments={
-                        "prompt": prompt,
-                        "image_size": {
-                            "width": 720,  # 9:16 aspect ratio
-                            "height": 1280
-                        },
-                        "num_inference_steps": 28,
-                        "guidance_scale": 3.5,
-                        "num_images": 1,
-                        "enable_safety_checker": True,
-                        "output_format": "jpeg"
-                    },
-                )
-                
-                image_url = result['images'][0]['url']
-                print(f"✅ Scene {scene_id} image created: {image_url[:50]}...")
-                return image_url
-                
-            except Exception as e:
-                print(f"⚠️ Attempt {attempt + 1}/{retry_count} failed: {e}")
-                if attempt < retry_count - 1:
-                    time.sleep(2 ** attempt)  # Exponential backoff
-                else:
-                    print(f"❌ Failed to create image for scene {scene_id}")
-                    raise
+        arguments = {
+            "prompt": prompt,
+            "image_size": {
+                "width": 720,  # 9:16 aspect ratio
+                "height": 1280
+            },
+            "num_inference_steps": 28,
+            "guidance_scale": 3.5,
+            "num_images": max(1, min(4, num_images)),
+            "enable_safety_checker": True,
+            "output_format": "jpeg"
+        }
+        key = cache_key(IMAGE_MODEL, {k: arguments[k] for k in IMAGE_KEY_FIELDS})
+        
+        cached_url = await self._cached_url("image", key)
+        if cached_url:
+            logger.info("♻️ Image cache hit", extra={"scene_id": scene_id})
+            return cached_url
+        
+        logger.info("🎨 Creating image", extra={"scene_id": scene_id})
+        
+        async def generate() -> str:
+            # Shared limiter: throttling in one job slows every job's Flux calls
+            image_url = await call_with_retry(
+                IMAGE_MODEL,
+                lambda: self._draw_image(arguments, reference_url),
+                retry_count
+            )
+            if self.cache:
+                self.cache.put("image", key, image_url)
+            return image_url
+        
+        # The reference frame only matters when choosing between candidates
+        flight_key = (key, arguments["num_images"], reference_url if arguments["num_images"] > 1 else None)
+        try:
+            with span("image", scene_id=scene_id, candidates=arguments["num_images"]):
+                image_url = await self.flights.run("image", flight_key, generate)
+        except Exception:
+            logger.error("❌ Failed to create image", extra={"scene_id": scene_id})
+            raise
+        
+        logger.info("✅ Image created", extra={"scene_id": scene_id, "url": image_url[:50]})
+        return image_url
 
-    def animate_scene(
+    async def _draw_image(self, arguments: Dict, reference_url: Optional[str]) -> str:
+        """One Flux call; the best of its candidates"""
+        result = await self._run_fal(IMAGE_MODEL, arguments=arguments)
+        return await self.scorer.choose(result, reference_url)
+
+    async def animate_scene(
         self,
         image_url: str,
         scene_id: int,
-        retry_count: int = 3
+        retry_count: int = 3,
+        duration: int = 5
     ) -> str:
         """Convert image to video using Fal.ai image-to-video"""
         
-        print(f"🎬 Animating scene {scene_id}...")
+        arguments = {
+            "prompt": "Smooth camera movement, subtle motion, cinematic",
+            "image_url": image_url,
+            "duration": kling_duration(duration),
+            "aspect_ratio": "9:16"
+        }
+        key = cache_key(VIDEO_MODEL, {k: arguments[k] for k in VIDEO_KEY_FIELDS})
+        
+        cached_url = await self._cached_url("video", key)
+        if cached_url:
+            logger.info("♻️ Clip cache hit", extra={"scene_id": scene_id})
+            self._mirror(cached_url)
+            return cached_url
         
-        for attempt in range(retry_count):
+        logger.info("🎬 Animating scene", extra={"scene_id": scene_id})
+        
+        async def generate() -> str:
+            result = await call_with_retry(
+                VIDEO_MODEL,
+                lambda: self._run_fal(VIDEO_MODEL, arguments=arguments),
+                retry_count
+            )
+            video_url = result['video']['url']
+            if self.cache:
+                self.cache.put("video", key, video_url)
+            self._mirror(video_url)
+            return video_url
+        
+        try:
+            with span("animate", scene_id=scene_id):
+                video_url = await self.flights.run("video", key, generate)
+        except Exception:
+            logger.error("❌ Failed to animate scene", extra={"scene_id": scene_id})
+            raise
+        
+        logger.info("✅ Scene animated", extra={"scene_id": scene_id, "url": video_url[:50]})
+        return video_url
+
+    async def _cached_url(self, kind: str, key: str) -> Optional[str]:
+        """
+        Cached Fal.ai URL for an asset, or None
+        
+        Fal.ai URLs expire, so a hit is only reused if it is still served
+        (a HEAD request); a dead one is dropped and the asset regenerated.
+        """
+        if not self.cache:
+            return None
+        cached_url = self.cache.get(kind, key)
+        if cached_url and not self.clients.mock and not await get_downloader().is_live(cached_url):
+            logger.info("⌛ Cached URL expired", extra={"kind": kind, "url": cached_url[:50]})
+            self.cache.discard(kind, key)
+            ASSET_CACHE_LOOKUPS.inc(kind=kind, result="expired")
+            return None
+        ASSET_CACHE_LOOKUPS.inc(kind=kind, result="hit" if cached_url else "miss")
+        return cached_url
+
+    def _mirror(self, url: str) -> None:
+        """Start copying a clip into the local content store (Fal URLs expire)"""
+        if not self.mirror_assets:
+            return
+        
+        async def mirror():
             try:
-                result = fal_client.subscribe(
-                    "fal-ai/kling-video/v1/standard/image-to-video",
-                    arguments={
-                        "prompt": "Smooth camera movement, subtle motion, cinematic",
-                        "image_url": image_url,
-                        "duration": 5,  # Kling supports 5 or 10 seconds
-                        "aspect_ratio": "9:16"
-                    },
-                )
-                
-                video_url = result['video']['url']
-                print(f"✅ Scene {scene_id} animated: {video_url[:50]}...")
-                return video_url
-                
+                await get_downloader().fetch(url)
             except Exception as e:
-                print(f"⚠️ Attempt {attempt + 1}/{retry_count} failed: {e}")
-                if attempt < retry_count - 1:
-                    time.sleep(2 ** attempt)
-                else:
-                    print(f"❌ Failed to animate scene {scene_id}")
-                    raise
+                logger.warning("⚠️ Could not mirror clip", extra={"url": url[:50], "error": str(e)})
+        
+        # Keep a reference so the task is not garbage collected
+        task = asyncio.create_task(mirror())
+        self._mirror_tasks.add(task)
+        task.add_done_callback(self._mirror_tasks.discard)
 
-    def process_shorts(
+    async def plan_scenario(
+        self,
+        user_input: str,
+        mode: Literal["idea", "manual"] = "idea",
+        target_duration: int = 60,
+        scene_duration_range: tuple = (8, 15),
+        use_cache: bool = True
+    ) -> ScenarioOutput:
+        """Whole scenario for a request: generated from an idea or parsed from manual JSON"""
+        if mode == "idea":
+            return await self.generate_scenario(
+                user_input, target_duration, scene_duration_range, use_cache=use_cache
+            )
+        return self._parse_manual_scenario(user_input)
+
+    def _parse_manual_scenario(self, user_input: str) -> ScenarioOutput:
+        """Parse a user-provided JSON scenario"""
+        scenario_data = json.loads(user_input)
+        return ScenarioOutput(
+            master_style=scenario_data['master_style'],
+            character_attributes=scenario_data.get('character_attributes', ''),
+            total_duration=scenario_data['total_duration'],
+            scenes=[
+                SceneData(**scene) for scene in scenario_data['scenes']
+            ]
+        )
+
+    async def _render_scene(self, scene: SceneData, reference_url: Optional[str] = None) -> VideoScene:
+        """Create and animate a single scene (sequential mode)"""
+        image_url = await self.create_scene_image(
+            scene.image_prompt, scene.scene_id, reference_url=reference_url
+        )
+        video_url = await self.animate_scene(image_url, scene.scene_id, duration=scene.duration)
+        return VideoScene(
+            scene_id=scene.scene_id,
+            voiceover=scene.voiceover,
+            image_url=image_url,
+            video_url=video_url,
+            duration=scene.duration
+        )
+
+    async def _process_scenes_sequential(
+        self,
+        scenes: Union[List[SceneData], AsyncIterable[SceneData]],
+        progress_callback: Optional[callable] = None,
+        completed: Optional[Dict[int, VideoScene]] = None,
+        on_scene_done: Optional[callable] = None,
+        total_scenes: Optional[int] = None
+    ) -> List[Optional[VideoScene]]:
+        """Render scenes one at a time, image then animation"""
+        
+        completed = completed or {}
+        frames = {scene_id: scene.image_url for scene_id, scene in completed.items()}
+        
+        total_scenes = total_scenes or len(scenes)
+        results = []
+        
+        idx = -1
+        async for scene in _iterate_scenes(scenes):
+            idx += 1
+            total_scenes = max(total_scenes, idx + 1)
+            if progress_callback:
+                progress_callback({
+                    'stage': 'processing',
+                    'current': idx + 1,
+                    'total': total_scenes,
+                    'message': f'Processing scene {idx + 1}/{total_scenes}'
+                })
+            
+            if scene.scene_id in completed:
+                results.append(completed[scene.scene_id])
+                continue
+            
+            try:
+                with span("scene", scene_id=scene.scene_id):
+                    video_scene = await self._render_scene(scene, previous_frame(frames, scene.scene_id))
+                frames[scene.scene_id] = video_scene.image_url
+                results.append(video_scene)
+                logger.info("✅ Scene completed", extra={"scene_id": scene.scene_id})
+                if on_scene_done:
+                    on_scene_done(video_scene)
+            except Exception as e:
+                logger.error("❌ Scene failed", extra={"scene_id": scene.scene_id, "error": str(e)})
+                # Continue with next scene instead of failing entire job
+                results.append(None)
+        
+        return results
+
+    async def _process_scenes_pipelined(
+        self,
+        scenes: Union[List[SceneData], AsyncIterable[SceneData]],
+        progress_callback: Optional[callable] = None,
+        completed: Optional[Dict[int, VideoScene]] = None,
+        on_scene_done: Optional[callable] = None,
+        total_scenes: Optional[int] = None
+    ) -> List[Optional[VideoScene]]:
+        """
+        Render scenes as a two-stage pipeline
+        
+        Image generation for scene N+1 runs while scene N is being animated.
+        Each stage is gated by its own semaphore, so at most
+        `max_inflight_images` / `max_inflight_videos` Fal.ai jobs are in
+        flight at once. Results are returned in scene order.
+        
+        scenes may be a stream (see generate_scenario's on_scene): each scene
+        starts as soon as it arrives. total_scenes is then the expected count.
+        """
+        
+        completed = completed or {}
+        frames = {scene_id: scene.image_url for scene_id, scene in completed.items()}
+        total_scenes = total_scenes or len(scenes)
+        started = 0
+        
+        def report_started():
+            nonlocal started, total_scenes
+            started += 1
+            total_scenes = max(total_scenes, started)
+            if progress_callback:
+                progress_callback({
+                    'stage': 'processing',
+                    'current': started,
+                    'total': total_scenes,
+                    'message': f'Processing scene {started}/{total_scenes}'
+                })
+        
+        image_slots = asyncio.Semaphore(self.max_inflight_images)
+        video_slots = asyncio.Semaphore(self.max_inflight_videos)
+        
+        async def scene_stage(scene: SceneData) -> VideoScene:
+            if scene.scene_id in completed:
+                report_started()
+                return completed[scene.scene_id]
+            with span("scene", scene_id=scene.scene_id):
+                return await render(scene)
+        
+        async def render(scene: SceneData) -> VideoScene:
+            # Releasing the image slot before animating lets the next scene's
+            # image start while this one is still in Kling.
+            async with image_slots:
+                report_started()
+                image_url = await self.create_scene_image(
+                    scene.image_prompt, scene.scene_id,
+                    reference_url=previous_frame(frames, scene.scene_id)
+                )
+                frames[scene.scene_id] = image_url
+            async with video_slots:
+                video_url = await self.animate_scene(image_url, scene.scene_id, duration=scene.duration)
+            video_scene = VideoScene(
+                scene_id=scene.scene_id,
+                voiceover=scene.voiceover,
+                image_url=image_url,
+                video_url=video_url,
+                duration=scene.duration
+            )
+            if on_scene_done:
+                on_scene_done(video_scene)
+            return video_scene
+        
+        arrived = []
+        tasks = []
+        try:
+            async for scene in _iterate_scenes(scenes):
+                arrived.append(scene)
+                tasks.append(asyncio.create_task(scene_stage(scene)))
+        except BaseException:
+            # Scenario stream failed or we were cancelled: stop started scenes
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        
+        outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        results = []
+        for scene, outcome in zip(arrived, outcomes):
+            if isinstance(outcome, asyncio.CancelledError):
+                raise outcome
+            if isinstance(outcome, Exception):
+                logger.error("❌ Scene failed", extra={"scene_id": scene.scene_id, "error": str(outcome)})
+                # Continue with next scene instead of failing entire job
+                results.append(None)
+            else:
+                logger.info("✅ Scene completed", extra={"scene_id": scene.scene_id})
+                results.append(outcome)
+        
+        return results
+
+    async def process_shorts(
         self,
         user_input: str,
         mode: Literal["idea", "manual"] = "idea",
         target_duration: int = 60,
         scene_duration_range: tuple = (8, 15),
-        progress_callback: Optional[callable] = None
+        progress_callback: Optional[callable] = None,
+        pipelined: bool = True,
+        use_scenario_cache: bool = True,
+        checkpoint: Optional[JobCheckpoint] = None,
+        checkpoint_callback: Optional[callable] = None,
+        scene_callback: Optional[callable] = None
     ) -> List[VideoScene]:
         """
         Main orchestrator function
@@ -246,67 +701,98 @@ Generate the JSON now:"""
             mode: 'idea' for auto-generation, 'manual' for user-provided scenario
             target_duration: Target video duration in seconds
             scene_duration_range: (min, max) duration per scene
-            progress_callback: Optional function to report progress
+            progress_callback: Optional function to report progress. Receives
+                dicts with 'stage' ('processing' when a scene starts,
+                'scene_complete' with the finished 'scene', then 'complete'),
+                'current', 'total' and 'message'
+            pipelined: Overlap image generation and animation across scenes
+            use_scenario_cache: Reuse a cached scenario for identical idea input
+            checkpoint: Progress from an earlier run; its scenario and finished
+                scenes are reused and only the missing scenes are rendered
+            checkpoint_callback: Called with the checkpoint after the scenario
+                is known and after every finished scene
+            scene_callback: Called with each VideoScene as soon as it finishes
             
         Returns:
             List of VideoScene objects with all URLs
+        
+        Cancelling the awaiting task stops pending scenes and cancels
+        in-flight Fal.ai requests.
         """
         
-        print(f"\n{'='*60}")
-        print(f"🚀 Starting Shorts Factory - Mode: {mode}")
-        print(f"{'='*60}\n")
+        logger.info("🚀 Starting Shorts Factory", extra={"mode": mode})
         
-        # Step 1: Generate or parse scenario
-        if mode == "idea":
-            scenario = self.generate_scenario(user_input, target_duration, scene_duration_range)
+        checkpoint = checkpoint or JobCheckpoint()
+        if checkpoint.scenario is None:
+            # Scenes finished before the scenario was checkpointed cannot be
+            # matched against a newly generated scenario
+            checkpoint.completed.clear()
+        
+        def on_scenario(scenario: ScenarioOutput):
+            nonlocal total_scenes
+            checkpoint.scenario = scenario
+            total_scenes = len(scenario.scenes)
+            if checkpoint_callback:
+                checkpoint_callback(checkpoint)
+        
+        # Step 1: Generate or parse scenario (unless resuming)
+        scenario_task = None
+        if checkpoint.scenario is not None:
+            scenario = checkpoint.scenario
+            logger.info(
+                "♻️ Resuming from checkpoint",
+                extra={"done": len(checkpoint.completed), "scenes": len(scenario.scenes)}
+            )
+            scenes = scenario.scenes
+            total_scenes = len(scenes)
+        elif mode == "idea":
+            # Stream the scenario: scene 1 starts rendering while Gemini is
+            # still writing the later scenes
+            streamed: asyncio.Queue = asyncio.Queue()
+            scenario_task = asyncio.create_task(self.generate_scenario(
+                user_input, target_duration, scene_duration_range,
+                use_cache=use_scenario_cache, on_scene=streamed.put_nowait
+            ))
+            scenario_task.add_done_callback(lambda _: streamed.put_nowait(None))
+            scenes = self._stream_scenes(scenario_task, streamed, on_scenario)
+            total_scenes = expected_scene_count(target_duration, scene_duration_range)
         else:
             # For manual mode, expect JSON input
-            scenario_data = json.loads(user_input)
-            scenario = ScenarioOutput(
-                master_style=scenario_data['master_style'],
-                character_attributes=scenario_data.get('character_attributes', ''),
-                total_duration=scenario_data['total_duration'],
-                scenes=[
-                    SceneData(**scene) for scene in scenario_data['scenes']
-                ]
-            )
+            scenario = self._parse_manual_scenario(user_input)
+            scenes = scenario.scenes
+            total_scenes = len(scenes)
         
-        total_scenes = len(scenario.scenes)
-        completed_scenes = []
+        if scenario_task is None:
+            on_scenario(scenario)
         
-        # Step 2: Process each scene
-        for idx, scene in enumerate(scenario.scenes):
-            try:
-                if progress_callback:
-                    progress_callback({
-                        'stage': 'processing',
-                        'current': idx + 1,
-                        'total': total_scenes,
-                        'message': f'Processing scene {idx + 1}/{total_scenes}'
-                    })
-                
-                # Create image
-                image_url = self.create_scene_image(scene.image_prompt, scene.scene_id)
-                
-                # Animate image
-                video_url = self.animate_scene(image_url, scene.scene_id)
-                
-                # Store completed scene
-                video_scene = VideoScene(
-                    scene_id=scene.scene_id,
-                    voiceover=scene.voiceover,
-                    image_url=image_url,
-                    video_url=video_url,
-                    duration=scene.duration
-                )
-                completed_scenes.append(video_scene)
-                
-                print(f"✅ Scene {scene.scene_id} completed!")
-                
-            except Exception as e:
-                print(f"❌ Scene {scene.scene_id} failed: {e}")
-                # Continue with next scene instead of failing entire job
-                continue
+        def on_scene_done(video_scene: VideoScene):
+            checkpoint.completed[video_scene.scene_id] = video_scene
+            if checkpoint_callback:
+                checkpoint_callback(checkpoint)
+            if scene_callback:
+                scene_callback(video_scene)
+            if progress_callback:
+                progress_callback({
+                    'stage': 'scene_complete',
+                    'current': len(checkpoint.completed),
+                    'total': total_scenes,
+                    'message': f'Scene {video_scene.scene_id} completed',
+                    'scene': asdict(video_scene)
+                })
+        
+        # Step 2: Process scenes
+        process_scenes = (
+            self._process_scenes_pipelined if pipelined else self._process_scenes_sequential
+        )
+        try:
+            results = await process_scenes(
+                scenes, progress_callback, checkpoint.completed, on_scene_done, total_scenes
+            )
+        finally:
+            if scenario_task is not None and not scenario_task.done():
+                scenario_task.cancel()
+        
+        completed_scenes = [scene for scene in results if scene is not None]
         
         if progress_callback:
             progress_callback({
@@ -316,15 +802,249 @@ Generate the JSON now:"""
                 'message': f'Completed {len(completed_scenes)}/{total_scenes} scenes'
             })
         
-        print(f"\n{'='*60}")
-        print(f"✅ Shorts Factory Complete! {len(completed_scenes)}/{total_scenes} scenes")
-        print(f"{'='*60}\n")
+        logger.info(
+            "✅ Shorts Factory complete",
+            extra={"completed": len(completed_scenes), "scenes": total_scenes}
+        )
         
         return completed_scenes
 
+    async def _stream_scenes(
+        self,
+        scenario_task: asyncio.Task,
+        streamed: asyncio.Queue,
+        on_scenario: callable
+    ) -> AsyncIterator[SceneData]:
+        """
+        Yield scenes as Gemini produces them, then any the stream did not carry
+        
+        Cached or shared scenarios never go through on_scene, so their scenes
+        all arrive here at once when the task finishes. A None in the queue
+        (added when scenario_task finishes) ends the stream.
+        """
+        
+        yielded = set()
+        while True:
+            scene = await streamed.get()
+            if scene is None:
+                break
+            yielded.add(scene.scene_id)
+            yield scene
+        
+        scenario = scenario_task.result()
+        on_scenario(scenario)
+        for scene in scenario.scenes:
+            if scene.scene_id not in yielded:
+                yield scene
+
+    async def iter_shorts(
+        self,
+        user_input: str,
+        mode: Literal["idea", "manual"] = "idea",
+        target_duration: int = 60,
+        scene_duration_range: tuple = (8, 15),
+        progress_callback: Optional[callable] = None,
+        pipelined: bool = True,
+        use_scenario_cache: bool = True,
+        checkpoint: Optional[JobCheckpoint] = None,
+        checkpoint_callback: Optional[callable] = None
+    ) -> AsyncIterator[VideoScene]:
+        """
+        Streaming variant of process_shorts
+        
+        Yields each VideoScene as soon as it finishes (completion order, not
+        scene order), so downstream work can start before the last scene is
+        rendered. Scenes already in the checkpoint are yielded first. Closing
+        the iterator early cancels the remaining work.
+        """
+        
+        checkpoint = checkpoint or JobCheckpoint()
+        finished: asyncio.Queue = asyncio.Queue()
+        
+        if checkpoint.scenario is not None:
+            for video_scene in list(checkpoint.completed.values()):
+                finished.put_nowait(video_scene)
+        
+        async def run():
+            try:
+                return await self.process_shorts(
+                    user_input=user_input,
+                    mode=mode,
+                    target_duration=target_duration,
+                    scene_duration_range=scene_duration_range,
+                    progress_callback=progress_callback,
+                    pipelined=pipelined,
+                    use_scenario_cache=use_scenario_cache,
+                    checkpoint=checkpoint,
+                    checkpoint_callback=checkpoint_callback,
+                    scene_callback=finished.put_nowait
+                )
+            finally:
+                finished.put_nowait(None)  # end-of-stream marker
+        
+        runner = asyncio.create_task(run())
+        try:
+            while True:
+                video_scene = await finished.get()
+                if video_scene is None:
+                    break
+                yield video_scene
+            # Surface scenario/parse errors from the run
+            await runner
+        finally:
+            if not runner.done():
+                runner.cancel()
+                await asyncio.gather(runner, return_exceptions=True)
+
+
+_default_factory: Optional[AsyncShortsFactory] = None
+_default_lock = threading.Lock()
+
+
+def get_shorts_factory() -> AsyncShortsFactory:
+    """Process-wide engine shared by every job (it keeps no per-job state)"""
+    global _default_factory
+    with _default_lock:
+        if _default_factory is None:
+            _default_factory = AsyncShortsFactory()
+        return _default_factory
+
+
+def _run_sync(coro):
+    """Run an engine coroutine to completion from synchronous code"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    coro.close()
+    raise RuntimeError(
+        "ShortsFactory cannot be used inside a running event loop; "
+        "use AsyncShortsFactory instead"
+    )
+
+
+class ShortsFactory:
+    """Main class for generating YouTube Shorts (blocking wrapper over AsyncShortsFactory)"""
+    
+    def __init__(
+        self,
+        max_inflight_images: int = MAX_INFLIGHT_IMAGES,
+        max_inflight_videos: int = MAX_INFLIGHT_VIDEOS,
+        cache: Optional[AssetCache] = None,
+        scenario_cache: Optional[ScenarioCache] = None,
+        clients: Optional[ClientRegistry] = None
+    ):
+        # Each blocking call runs on a throwaway event loop, so there is nothing
+        # to overlap background mirroring with
+        self.engine = AsyncShortsFactory(
+            max_inflight_images, max_inflight_videos, cache, scenario_cache,
+            mirror_assets=False, clients=clients
+        )
+
+    def generate_scenario(
+        self,
+        user_input: str,
+        target_duration: int = 60,
+        scene_duration_range: tuple = (8, 15),
+        use_cache: bool = True
+    ) -> ScenarioOutput:
+        """Generate structured scenario using Gemini LLM"""
+        return _run_sync(
+            self.engine.generate_scenario(user_input, target_duration, scene_duration_range, use_cache)
+        )
+
+    def create_scene_image(
+        self,
+        prompt: str,
+        scene_id: int,
+        retry_count: int = 3,
+        reference_url: Optional[str] = None,
+        num_images: int = IMAGE_CANDIDATES
+    ) -> str:
+        """Generate image for scene using Fal.ai text-to-image"""
+        return _run_sync(
+            self.engine.create_scene_image(prompt, scene_id, retry_count, reference_url, num_images)
+        )
+
+    def animate_scene(self, image_url: str, scene_id: int, retry_count: int = 3, duration: int = 5) -> str:
+        """Convert image to video using Fal.ai image-to-video"""
+        return _run_sync(self.engine.animate_scene(image_url, scene_id, retry_count, duration))
+
+    def process_shorts(
+        self,
+        user_input: str,
+        mode: Literal["idea", "manual"] = "idea",
+        target_duration: int = 60,
+        scene_duration_range: tuple = (8, 15),
+        progress_callback: Optional[callable] = None,
+        pipelined: bool = True,
+        use_scenario_cache: bool = True,
+        checkpoint: Optional[JobCheckpoint] = None,
+        checkpoint_callback: Optional[callable] = None
+    ) -> List[VideoScene]:
+        """Main orchestrator function (see AsyncShortsFactory.process_shorts)"""
+        return _run_sync(self.engine.process_shorts(
+            user_input=user_input,
+            mode=mode,
+            target_duration=target_duration,
+            scene_duration_range=scene_duration_range,
+            progress_callback=progress_callback,
+            pipelined=pipelined,
+            use_scenario_cache=use_scenario_cache,
+            checkpoint=checkpoint,
+            checkpoint_callback=checkpoint_callback
+        ))
+
+    def iter_shorts(
+        self,
+        user_input: str,
+        mode: Literal["idea", "manual"] = "idea",
+        target_duration: int = 60,
+        scene_duration_range: tuple = (8, 15),
+        progress_callback: Optional[callable] = None,
+        pipelined: bool = True,
+        use_scenario_cache: bool = True,
+        checkpoint: Optional[JobCheckpoint] = None,
+        checkpoint_callback: Optional[callable] = None
+    ) -> Iterator[VideoScene]:
+        """Yield scenes as they finish (see AsyncShortsFactory.iter_shorts)"""
+        
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError(
+                "ShortsFactory cannot be used inside a running event loop; "
+                "use AsyncShortsFactory instead"
+            )
+        
+        loop = asyncio.new_event_loop()
+        scenes = self.engine.iter_shorts(
+            user_input=user_input,
+            mode=mode,
+            target_duration=target_duration,
+            scene_duration_range=scene_duration_range,
+            progress_callback=progress_callback,
+            pipelined=pipelined,
+            use_scenario_cache=use_scenario_cache,
+            checkpoint=checkpoint,
+            checkpoint_callback=checkpoint_callback
+        )
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(scenes.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            loop.run_until_complete(scenes.aclose())
+            loop.close()
+
 
 # CLI Example Usage
 if __name__ == "__main__":
+    configure_logging()
     factory = ShortsFactory()
     
     # Test with an idea
@@ -1,18 +1,59 @@
 """
 FastAPI Server for Shorts Factory
 Provides REST API endpoints for frontend integration
+
+SHORTS_RUN_MODE=inline (default) renders jobs in this process. With
+SHORTS_RUN_MODE=api the server only accepts and tracks jobs: they go to a
+shared queue (job_queue.py) drained by render workers (shorts_worker.py),
+so API replicas and render capacity scale independently.
 """
 
 import asyncio
+import argparse
+import os
+import time
+import socket
 import uuid
-from typing import Dict, Optional, Literal
+from typing import AsyncIterator, Dict, Optional, Literal
 from datetime import datetime
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 
-from shorts_factory import ShortsFactory, VideoScene
+from clients import get_clients, load_environment
+
+# Apply .env before the modules below read their settings
+load_environment()
+
+from log import configure_logging, get_logger  # noqa: E402
+
+configure_logging()
+logger = get_logger("server")
+
+
+from shorts_factory import get_shorts_factory  # noqa: E402
+from asset_cache import CACHE_MAX_AGE, get_asset_cache  # noqa: E402
+from scenario_cache import get_scenario_cache  # noqa: E402
+from job_store import JOB_STORE_BACKEND, JOB_TTL  # noqa: E402
+from job_scheduler import JobScheduler, QueueFullError  # noqa: E402
+from job_queue import RemoteScheduler, create_job_queue  # noqa: E402
+from job_runner import (  # noqa: E402
+    ShortsRequest, JobStatus, assembler, finish_job, job_snapshot, job_store, process_shorts_job, progress_broker
+)
+from rate_limiter import rate_limit_stats  # noqa: E402
+from single_flight import get_single_flight  # noqa: E402
+from progress_stream import format_sse  # noqa: E402
+from downloader import close_downloader, get_downloader, prune_directory  # noqa: E402
+from metrics import CONTENT_TYPE, REGISTRY, RequestTimingMiddleware  # noqa: E402
+
+# inline: render jobs in this process | api: enqueue for shorts_worker.py
+RUN_MODE = os.getenv("SHORTS_RUN_MODE", "inline")
+if RUN_MODE not in ("inline", "api"):
+    raise ValueError(f"Unknown SHORTS_RUN_MODE: {RUN_MODE}")
+if RUN_MODE == "api" and JOB_STORE_BACKEND == "memory":
+    raise ValueError("SHORTS_RUN_MODE=api needs a job store shared with the workers (sqlite or redis)")
 
 # Initialize FastAPI
 app = FastAPI(title="Shorts Factory API", version="1.0.0")
@@ -25,102 +66,83 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestTimingMiddleware)
 
-# In-memory job storage (use Redis/DB in production)
-jobs: Dict[str, Dict] = {}
+# How often finished jobs past their TTL are evicted
+JOB_EVICT_INTERVAL = 300  # seconds
 
+# Suggested client back-off when the queue is full
+QUEUE_RETRY_AFTER = 30  # seconds
 
-# Request/Response Models
-class ShortsRequest(BaseModel):
-    mode: Literal["idea", "manual"] = "idea"
-    content: str
-    target_duration: int = 60
-    scene_duration_min: int = 8
-    scene_duration_max: int = 15
+# Quiet period after which a stream re-checks the store and sends a heartbeat;
+# in api mode the store is the only source of progress, so check it often
+STREAM_HEARTBEAT = 15 if RUN_MODE == "inline" else 2  # seconds
 
+JOBS_ACTIVE = REGISTRY.gauge("shorts_active_jobs", "Jobs currently queued or running", ("state",))
 
+
+# Request/Response Models
 class JobResponse(BaseModel):
     job_id: str
-    status: Literal["queued", "processing", "completed", "failed"]
+    status: Literal["queued", "processing", "completed", "failed", "cancelled"]
     message: str
+    queue_position: Optional[int] = None
 
 
-class JobStatus(BaseModel):
-    job_id: str
-    status: Literal["queued", "processing", "completed", "failed"]
-    progress: int  # 0-100
-    current_scene: int
-    total_scenes: int
-    message: str
-    videos: list = []
-    error: Optional[str] = None
-    created_at: str
-    completed_at: Optional[str] = None
+# Fixed-size in-process worker pool, or the shared queue the render workers
+# claim from; both are started on app startup
+scheduler = JobScheduler(process_shorts_job) if RUN_MODE == "inline" else RemoteScheduler(create_job_queue())
 
+# Recorded on the jobs this process renders inline: their queue and tasks
+# die with it, so a job whose runner is gone is orphaned
+RUNNER_ID = f"{socket.gethostname()}:{os.getpid()}"
 
-# Background task to process shorts
-def process_shorts_job(job_id: str, request: ShortsRequest):
-    """Background task to process shorts generation"""
-    
+
+def runner_alive(runner: Optional[str]) -> bool:
+    """Whether another server process that may still be rendering a job is running"""
+    if not runner or runner == RUNNER_ID:
+        return False
+    host, _, pid = runner.rpartition(":")
+    if host != socket.gethostname():
+        return True  # no way to tell from here
     try:
-        jobs[job_id]['status'] = 'processing'
-        jobs[job_id]['message'] = 'Initializing...'
-        
-        factory = ShortsFactory()
-        
-        def progress_callback(data):
-            """Update job progress"""
-            jobs[job_id]['progress'] = int((data['current'] / data['total']) * 100)
-            jobs[job_id]['current_scene'] = data['current']
-            jobs[job_id]['total_scenes'] = data['total']
-            jobs[job_id]['message'] = data['message']
-        
-        # Process shorts
-        results = factory.process_shorts(
-            user_input=request.content,
-            mode=request.mode,
-            target_duration=request.target_duration,
-            scene_duration_range=(request.scene_duration_min, request.scene_duration_max),
-            progress_callback=progress_callback
-        )
-        
-        # Convert results to dict
-        videos = [
-            {
-                'scene_id': scene.scene_id,
-                'voiceover': scene.voiceover,
-                'image_url': scene.image_url,
-                'video_url': scene.video_url,
-                'duration': scene.duration
-            }
-            for scene in results
-        ]
-        
-        jobs[job_id]['videos'] = videos
-        jobs[job_id]['status'] = 'completed'
-        jobs[job_id]['progress'] = 100
-        jobs[job_id]['message'] = f'Completed {len(videos)} scenes!'
-        jobs[job_id]['completed_at'] = datetime.now().isoformat()
-        
-    except Exception as e:
-        jobs[job_id]['status'] = 'failed'
-        jobs[job_id]['error'] = str(e)
-        jobs[job_id]['message'] = f'Error: {str(e)}'
-        jobs[job_id]['completed_at'] = datetime.now().isoformat()
-        print(f"❌ Job {job_id} failed: {e}")
+        os.kill(int(pid), 0)
+    except (ProcessLookupError, ValueError):
+        return False
+    except PermissionError:
+        pass  # alive, under another user
+    return True
+
+
+def is_orphaned(job: Dict) -> bool:
+    """Whether a queued or processing job is no longer queued or run by anyone"""
+    if job['status'] not in ('queued', 'processing') or scheduler.is_tracked(job['job_id']):
+        return False
+    return RUN_MODE == "api" or not runner_alive(job.get('runner'))
+
+
+def get_client_id(http_request: Request) -> str:
+    """Identify the submitting client for per-client fairness"""
+    return http_request.headers.get("X-Client-Id") or (
+        http_request.client.host if http_request.client else "anonymous"
+    )
 
 
 @app.post("/api/shorts/generate", response_model=JobResponse)
-async def generate_shorts(request: ShortsRequest, background_tasks: BackgroundTasks):
+async def generate_shorts(request: ShortsRequest, http_request: Request):
     """
-    Start a new shorts generation job
+    Queue a new shorts generation job
+    
+    Returns 429 with Retry-After when the queue (or this client's share of
+    it) is full.
     """
     
     # Create job ID
     job_id = str(uuid.uuid4())
+    client_id = get_client_id(http_request)
     
     # Initialize job
-    jobs[job_id] = {
+    await job_store.create({
         'job_id': job_id,
         'status': 'queued',
         'progress': 0,
@@ -130,16 +152,33 @@ async def generate_shorts(request: ShortsRequest, background_tasks: BackgroundTa
         'videos': [],
         'error': None,
         'created_at': datetime.now().isoformat(),
-        'completed_at': None
-    }
+        'queued_at': time.time(),
+        'completed_at': None,
+        'final_video_url': None,
+        'request': request.model_dump(),
+        'client_id': client_id,
+        'runner': RUNNER_ID if RUN_MODE == "inline" else None,
+        'checkpoint': None
+    })
     
-    # Add to background tasks
-    background_tasks.add_task(process_shorts_job, job_id, request)
+    # Hand off to the worker pool
+    try:
+        position = await scheduler.submit(
+            job_id, request, client_id=client_id, priority=request.priority
+        )
+    except QueueFullError as e:
+        await job_store.delete(job_id)
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(QUEUE_RETRY_AFTER)}
+        )
     
     return JobResponse(
         job_id=job_id,
         status="queued",
-        message="Shorts generation job started"
+        message=f"Shorts generation job queued (position {position})",
+        queue_position=position
     )
 
 
@@ -149,35 +188,327 @@ async def get_job_status(job_id: str):
     Get status of a shorts generation job
     """
     
-    if job_id not in jobs:
+    job = await job_store.get(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    return JobStatus(**jobs[job_id])
+    if job['status'] == 'queued':
+        position = scheduler.position(job_id)
+        if position is not None:
+            job['queue_position'] = position
+            job['message'] = f'Queued (position {position})'
+    
+    return JobStatus(**job)
 
 
 @app.delete("/api/shorts/{job_id}")
 async def cancel_job(job_id: str):
     """
     Cancel or delete a job
+    
+    Queued or running jobs are cancelled (pending scenes stop and in-flight
+    Fal.ai requests are cancelled) and kept as 'cancelled' so they can be
+    resumed. Finished jobs are deleted. In api mode a job a render worker is
+    running is only asked to stop; the worker records 'cancelled'.
     """
     
-    if job_id not in jobs:
+    job = await job_store.get(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    del jobs[job_id]
+    if job['status'] in ('queued', 'processing'):
+        if RUN_MODE == "inline":
+            scheduler.cancel(job_id)
+        elif not scheduler.remove(job_id):
+            # A render worker holds one of the job's units: it stops them and
+            # writes the final status itself (see job_runner.end_units)
+            scheduler.cancel(job_id)
+            return {"message": "Job cancellation requested"}
+        await finish_job(job_id, status='cancelled', message='Job cancelled')
+        return {"message": "Job cancelled"}
+    
+    await job_store.delete(job_id)
+    assembler.remove(job_id)
     return {"message": "Job deleted"}
 
 
+@app.get("/api/shorts/{job_id}/video")
+async def get_final_video(job_id: str):
+    """Download the assembled Short"""
+    
+    job = await job_store.get(job_id)
+    if job is None or not job.get('final_video_url'):
+        raise HTTPException(status_code=404, detail="Final video not found")
+    
+    path = assembler.output_path(job_id)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Final video not found")
+    
+    return FileResponse(path, media_type="video/mp4", filename=f"short_{job_id}.mp4")
+
+
+@app.post("/api/shorts/{job_id}/resume", response_model=JobResponse)
+async def resume_job(job_id: str):
+    """
+    Restart a failed, cancelled or partially completed job
+    
+    The checkpointed scenario and finished scenes are reused; only the
+    missing scenes are rendered. Jobs left queued or processing by a server
+    or worker that went away (see is_orphaned) can be resumed too.
+    """
+    
+    job = await job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    unassembled = (job.get('request') or {}).get('assemble', True) and not job.get('final_video_url')
+    incomplete = job['status'] == 'completed' and (
+        len(job['videos']) < job['total_scenes'] or unassembled
+    )
+    if job['status'] not in ('failed', 'cancelled') and not incomplete and not is_orphaned(job):
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']} and cannot be resumed")
+    if not job.get('request'):
+        raise HTTPException(status_code=409, detail="Job has no stored request to resume from")
+    if scheduler.is_running(job_id):
+        raise HTTPException(status_code=409, detail="Job is still shutting down, try again shortly")
+    
+    await job_store.update(
+        job_id,
+        status='queued',
+        message='Job queued for resume',
+        queued_at=time.time(),
+        error=None,
+        completed_at=None,
+        final_video_url=None,
+        runner=RUNNER_ID if RUN_MODE == "inline" else None
+    )
+    
+    request = ShortsRequest(**job['request'])
+    try:
+        position = await scheduler.submit(
+            job_id, request, client_id=job['client_id'], priority=request.priority
+        )
+    except QueueFullError as e:
+        await job_store.update(
+            job_id,
+            status=job['status'],
+            message=job['message'],
+            error=job['error'],
+            completed_at=job['completed_at'],
+            final_video_url=job.get('final_video_url'),
+            runner=job.get('runner')
+        )
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(QUEUE_RETRY_AFTER)}
+        )
+    
+    return JobResponse(
+        job_id=job_id,
+        status="queued",
+        message=f"Shorts generation job resumed (position {position})",
+        queue_position=position
+    )
+
+
+async def job_events(job_id: str) -> AsyncIterator[Optional[Dict]]:
+    """
+    Snapshot of the job followed by live events until it finishes
+    
+    Yields None as a heartbeat after STREAM_HEARTBEAT seconds of silence. On
+    each quiet period the store is re-read, so jobs running in another
+    process still produce snapshots and a final status.
+    """
+    
+    subscription = progress_broker.subscribe(job_id)
+    try:
+        job = await job_store.get(job_id)
+        if job is None:
+            return
+        snapshot = job_snapshot(job)
+        yield {'id': 0, 'event': 'snapshot', 'data': snapshot}
+        
+        while snapshot['status'] in ('queued', 'processing'):
+            message = await subscription.next(timeout=STREAM_HEARTBEAT)
+            if message is not None:
+                yield message
+                if message['event'] == 'status':
+                    return
+                continue
+            
+            job = await job_store.get(job_id)
+            if job is None:
+                return
+            latest = job_snapshot(job)
+            changed = (latest['status'], latest['progress'], len(latest['videos'])) != (
+                snapshot['status'], snapshot['progress'], len(snapshot['videos'])
+            )
+            snapshot = latest
+            if latest['status'] not in ('queued', 'processing'):
+                yield {'id': 0, 'event': 'status', 'data': latest}
+            elif changed:
+                yield {'id': 0, 'event': 'snapshot', 'data': latest}
+            else:
+                yield None
+    finally:
+        subscription.close()
+
+
+@app.get("/api/shorts/stream/{job_id}")
+async def stream_job(job_id: str):
+    """
+    Server-Sent Events stream of job progress
+    
+    Events: 'snapshot' (full job state), 'progress', 'scene' (a finished
+    scene plus the partial videos list) and a final 'status'.
+    """
+    
+    if await job_store.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def event_source():
+        async for message in job_events(job_id):
+            yield format_sse(message) if message is not None else ": keep-alive\n\n"
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.websocket("/api/shorts/ws/{job_id}")
+async def job_websocket(websocket: WebSocket, job_id: str):
+    """WebSocket stream of job progress (same events as the SSE endpoint)"""
+    
+    await websocket.accept()
+    if await job_store.get(job_id) is None:
+        await websocket.close(code=4404, reason="Job not found")
+        return
+    
+    try:
+        async for message in job_events(job_id):
+            if message is not None:
+                await websocket.send_json(message)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+
+@app.on_event("startup")
+async def start_scheduler():
+    """Start the job worker pool (nothing to start in api mode)"""
+    await scheduler.start()
+
+
+@app.on_event("startup")
+async def fail_orphaned_jobs():
+    """
+    Fail the active jobs a previous server process left behind (inline mode)
+
+    Their queue and tasks died with that process, so they would otherwise
+    count as active and keep their streams open forever. They can be resumed.
+    """
+
+    if RUN_MODE == "api":
+        # Render workers hand units back or reclaim them (see shorts_worker.py)
+        return
+
+    orphaned = 0
+    for status in ('queued', 'processing'):
+        for job_id in await job_store.ids_by_status(status):
+            job = await job_store.get(job_id)
+            if job is None or not is_orphaned(job):
+                continue
+            await finish_job(
+                job_id,
+                status='failed',
+                error='Interrupted',
+                message='Interrupted by a server restart; resume to continue'
+            )
+            orphaned += 1
+    if orphaned:
+        logger.warning("⚠️ Failed jobs orphaned by a previous server", extra={"count": orphaned})
+
+
+@app.on_event("startup")
+async def warm_up_clients():
+    """Configure the upstream clients off the request path (errors surface on first job)"""
+    
+    if RUN_MODE == "api":
+        # Render workers make the upstream calls
+        return
+    
+    async def warm_up():
+        try:
+            await asyncio.to_thread(get_clients().initialize)
+        except Exception as e:
+            logger.warning("⚠️ Upstream clients not ready", extra={"error": str(e)})
+    
+    # Keep a reference so the task is not garbage collected
+    app.state.client_warmup_task = asyncio.create_task(warm_up())
+
+
+@app.on_event("shutdown")
+async def stop_scheduler():
+    """Stop the job worker pool"""
+    await scheduler.stop()
+    await close_downloader()
+
+
+@app.on_event("startup")
+async def start_job_eviction():
+    """Periodically drop finished jobs older than SHORTS_JOB_TTL"""
+    
+    async def evict_loop():
+        while True:
+            try:
+                removed = await job_store.evict_finished(JOB_TTL)
+                if removed:
+                    logger.info("🧹 Evicted finished jobs", extra={"count": removed})
+                assembler.evict(JOB_TTL)
+                # Mirrored clips live as long as the asset cache entries pointing at them
+                await asyncio.to_thread(prune_directory, max_age=CACHE_MAX_AGE)
+            except Exception as e:
+                logger.warning("⚠️ Job eviction failed", extra={"error": str(e)})
+            await asyncio.sleep(JOB_EVICT_INTERVAL)
+    
+    # Keep a reference so the task is not garbage collected
+    app.state.job_eviction_task = asyncio.create_task(evict_loop())
+
+
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
+    cache = get_asset_cache()
+    scenario_cache = get_scenario_cache()
     return {
         "status": "healthy",
         "service": "Shorts Factory API",
-        "active_jobs": len([j for j in jobs.values() if j['status'] in ['queued', 'processing']])
+        "run_mode": RUN_MODE,
+        "active_jobs": await job_store.count_active(),
+        "scheduler": scheduler.stats(),
+        "rate_limits": rate_limit_stats(),
+        "stream_subscribers": progress_broker.subscriber_count(),
+        "asset_cache": cache.stats() if cache else None,
+        "scenario_cache": scenario_cache.stats() if scenario_cache else None,
+        "downloader": get_downloader().stats(),
+        "image_scoring": get_shorts_factory().scorer.stats(),
+        "single_flight": get_single_flight().stats(),
+        "clients": get_clients().stats()
     }
 
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics (stage latencies, upstream attempts, jobs, HTTP)"""
+    stats = scheduler.stats()
+    JOBS_ACTIVE.set(stats['queued'], state='queued')
+    JOBS_ACTIVE.set(stats['running'], state='running')
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -189,17 +520,29 @@ async def root():
 
 
 if __name__ == "__main__":
-    import os
-    port = int(os.getenv("PORT", 8000))
+    parser = argparse.ArgumentParser(description="Shorts Factory API server")
+    parser.add_argument("--mode", choices=("inline", "api"), default=RUN_MODE,
+                        help="inline: render jobs here | api: enqueue them for shorts_worker.py")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=1, help="API processes (api mode only; disables reload)")
+    parser.add_argument("--reload", action=argparse.BooleanOptionalAction,
+                        default=os.getenv("SHORTS_RELOAD", "1") == "1", help="restart on code changes")
+    args = parser.parse_args()
+    if args.workers > 1 and args.mode == "inline":
+        parser.error("--workers needs --mode api: inline jobs cannot be cancelled from another process")
+    
+    # uvicorn imports the app again (once per process), so pass the mode on
+    os.environ["SHORTS_RUN_MODE"] = args.mode
+    reload = args.reload and args.workers == 1
     
     print(f"""
     {'='*60}
-    🚀 Shorts Factory API Server
+    🚀 Shorts Factory API Server ({args.mode} mode)
     {'='*60}
     
-    📡 Server running on: http://localhost:{port}
-    📚 API Docs: http://localhost:{port}/docs
-    🏥 Health Check: http://localhost:{port}/api/health
+    📡 Server running on: http://localhost:{args.port}
+    📚 API Docs: http://localhost:{args.port}/docs
+    🏥 Health Check: http://localhost:{args.port}/api/health
     
     {'='*60}
     """)
@@ -207,6 +550,7 @@ if __name__ == "__main__":
     uvicorn.run(
         "shorts_server:app",
         host="0.0.0.0",
-        port=port,
-        reload=True
+        port=args.port,
+        reload=reload,
+        workers=None if reload else args.workers
     )
@@ -0,0 +1,268 @@
+"""
+Shorts Worker - Render worker process for SHORTS_RUN_MODE=api
+Claims work units (a job's scenario, one scene's image or clip, or its
+final assembly) from the shared queue (job_queue.py), runs them with the
+shared AsyncShortsFactory and writes progress and results to the job store,
+where the API tier reads them. One job's scenes are spread over every
+worker. Start as many as needed, on one host (SQLite) or on several
+(SHORTS_JOB_STORE=redis SHORTS_JOB_QUEUE=redis):
+
+    python shorts_worker.py --concurrency 4
+
+Leases are renewed every third of their length. A worker that stops
+heartbeating loses its units to the next worker that reclaims them and
+runs them again. SIGTERM hands running units back at once.
+"""
+
+import os
+import time
+import uuid
+import signal
+import socket
+import asyncio
+import argparse
+from typing import Dict, Optional, Set, Tuple
+
+from clients import get_clients, load_environment
+
+# Apply .env before the modules below read their settings
+load_environment()
+
+from log import configure_logging, get_logger  # noqa: E402
+from job_store import JOB_STORE_BACKEND  # noqa: E402
+from job_scheduler import SCHEDULER_WORKERS  # noqa: E402
+from job_queue import (  # noqa: E402
+    LEASE_CANCEL, LEASE_LOST, LEASE_SECONDS, MAX_ATTEMPTS, UNIT_CLIP, UNIT_SCENARIO, JobQueue, Lease,
+    create_job_queue, unit_job, unit_parts
+)
+from job_runner import (  # noqa: E402
+    UNITS_FINISHED, ShortsRequest, end_units, job_store, progress_broker, publish_scenes, run_unit
+)
+from downloader import close_downloader  # noqa: E402
+from metrics import CONTENT_TYPE, REGISTRY  # noqa: E402
+
+logger = get_logger("worker")
+
+# Worker configuration
+WORKER_CONCURRENCY = int(os.getenv("SHORTS_WORKER_CONCURRENCY", SCHEDULER_WORKERS))  # units per process
+POLL_INTERVAL = float(os.getenv("SHORTS_WORKER_POLL_INTERVAL", 1.0))  # seconds between claims when idle
+METRICS_PORT = int(os.getenv("SHORTS_WORKER_METRICS_PORT", 0))  # 0 = no /metrics listener
+
+WORKER_UNITS = REGISTRY.gauge("shorts_worker_units", "Work units this worker is running")
+LEASE_EVENTS = REGISTRY.counter(
+    "shorts_worker_lease_events_total",
+    "Lease lifecycle (claimed, lost, cancelled, released, requeued, failed, abandoned)",
+    ("event",)
+)
+
+
+class RenderWorker:
+    """Claims up to concurrency work units at a time and keeps their leases alive"""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        concurrency: int = WORKER_CONCURRENCY,
+        lease_seconds: float = LEASE_SECONDS,
+        poll_interval: float = POLL_INTERVAL,
+        worker_id: Optional[str] = None
+    ):
+        self.queue = queue
+        self.concurrency = max(1, concurrency)
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._running: Dict[str, Tuple[Lease, asyncio.Task]] = {}
+        self._cancelled: Set[str] = set()
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def stop(self) -> None:
+        """Stop claiming; running units are handed back to the queue"""
+        self._stopping = True
+        if self._wake is not None:
+            self._wake.set()
+
+    async def run(self) -> None:
+        self._wake = asyncio.Event()
+        logger.info(
+            "🛠️ Render worker started",
+            extra={"worker_id": self.worker_id, "concurrency": self.concurrency}
+        )
+        heartbeat = asyncio.create_task(self._heartbeat_loop())
+        try:
+            while not self._stopping:
+                lease = None
+                if len(self._running) < self.concurrency:
+                    lease = self.queue.claim(self.worker_id, self.lease_seconds)
+                if lease is not None:
+                    self._start(lease)
+                    continue
+                # Idle or full: wait for a finished unit, a stop or the next poll
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            heartbeat.cancel()
+            await self._hand_back()
+            logger.info("👋 Render worker stopped", extra={"worker_id": self.worker_id})
+
+    def _start(self, lease: Lease) -> None:
+        LEASE_EVENTS.inc(event="claimed")
+        task = asyncio.create_task(self._run_unit(lease))
+        self._running[lease.unit_id] = (lease, task)
+        WORKER_UNITS.set(len(self._running))
+
+        def done(_):
+            self._running.pop(lease.unit_id, None)
+            self._cancelled.discard(lease.unit_id)
+            WORKER_UNITS.set(len(self._running))
+            self._wake.set()
+
+        task.add_done_callback(done)
+
+    async def _run_unit(self, lease: Lease) -> None:
+        job = await job_store.get(lease.job_id)
+        if job is None or job['status'] not in ('queued', 'processing') or not job.get('request'):
+            # Deleted, cancelled or finished before this unit got its turn
+            self.queue.purge(lease.job_id)
+            return
+        logger.info("📥 Unit claimed", extra={"unit": lease.unit_id, "attempt": lease.attempt})
+        await run_unit(self.queue, lease, ShortsRequest(**job['request']))
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                self._renew()
+                await self._reclaim()
+            except Exception as e:
+                logger.warning("⚠️ Heartbeat failed", extra={"worker_id": self.worker_id, "error": str(e)})
+
+    def _renew(self) -> None:
+        for lease, task in list(self._running.values()):
+            status = self.queue.heartbeat(lease, self.lease_seconds)
+            if status == LEASE_LOST:
+                LEASE_EVENTS.inc(event="lost")
+                task.cancel()
+            elif status == LEASE_CANCEL and lease.unit_id not in self._cancelled:
+                LEASE_EVENTS.inc(event="cancelled")
+                self._cancelled.add(lease.unit_id)
+                task.cancel()
+
+    async def _reclaim(self) -> None:
+        """Put units of workers that stopped heartbeating back in the queue"""
+        requeued, failed, abandoned = self.queue.reclaim_expired()
+        for unit in requeued:
+            LEASE_EVENTS.inc(event="requeued")
+            logger.warning("🔁 Requeued unit from an unresponsive worker", extra={"unit": unit})
+        for unit in failed:
+            # Settled like a scene that failed while running: the job goes on without it
+            LEASE_EVENTS.inc(event="failed")
+            job_id, kind, scene_id = unit_parts(unit)
+            UNITS_FINISHED.inc(kind=kind, status='failed')
+            logger.error("❌ Scene failed", extra={"job_id": job_id, "scene_id": scene_id, "error": "workers lost"})
+            if kind == UNIT_CLIP:
+                await publish_scenes(self.queue, job_id, scene_id)
+        for unit in abandoned:
+            LEASE_EVENTS.inc(event="abandoned")
+            job = await job_store.get(unit_job(unit))
+            if job is None or job['status'] not in ('queued', 'processing'):
+                self.queue.purge(unit_job(unit))
+                progress_broker.forget(unit_job(unit))
+                continue
+            await end_units(
+                self.queue,
+                unit_job(unit),
+                status='failed',
+                error=f'Workers were lost {MAX_ATTEMPTS} times while running {unit}',
+                message='Error: render workers kept failing; resume to try again'
+            )
+
+    async def _hand_back(self) -> None:
+        """Cancel running units without cancelling their jobs and requeue them"""
+        running = [(lease, task, not lease.lost) for lease, task in self._running.values()]
+        for lease, task, _ in running:
+            lease.lost = True
+            task.cancel()
+        await asyncio.gather(*(task for _, task, _ in running), return_exceptions=True)
+        for lease, _, held in running:
+            if not held:
+                continue
+            if lease.kind == UNIT_SCENARIO:
+                # Written while the lease is still ours, so no other worker has started it
+                await job_store.update(
+                    lease.job_id, status='queued', message='Requeued (worker shutting down)', queued_at=time.time()
+                )
+            if self.queue.release(lease):
+                LEASE_EVENTS.inc(event="released")
+
+
+async def serve_metrics(port: int) -> asyncio.AbstractServer:
+    """Minimal HTTP listener answering every request with the Prometheus metrics"""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            body = REGISTRY.render().encode("utf-8")
+            writer.write(
+                f"HTTP/1.1 200 OK\r\nContent-Type: {CONTENT_TYPE}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("ascii") + body
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, "0.0.0.0", port)
+
+
+async def main(args: argparse.Namespace) -> None:
+    if JOB_STORE_BACKEND == "memory":
+        raise SystemExit("Render workers need a job store shared with the API (sqlite or redis)")
+
+    worker = RenderWorker(
+        create_job_queue(),
+        concurrency=args.concurrency,
+        lease_seconds=args.lease_seconds,
+        poll_interval=args.poll_interval,
+        worker_id=args.worker_id
+    )
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, worker.stop)
+        except NotImplementedError:  # Windows
+            pass
+
+    try:
+        await asyncio.to_thread(get_clients().initialize)
+    except Exception as e:
+        logger.warning("⚠️ Upstream clients not ready", extra={"error": str(e)})
+
+    metrics_server = await serve_metrics(args.metrics_port) if args.metrics_port else None
+    try:
+        await worker.run()
+    finally:
+        if metrics_server is not None:
+            metrics_server.close()
+        await close_downloader()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shorts Factory render worker")
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY, help="jobs rendered at once")
+    parser.add_argument("--lease-seconds", type=float, default=LEASE_SECONDS)
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT, help="serve /metrics (0 = off)")
+    parser.add_argument("--worker-id", help="default: <host>-<pid>-<random>")
+
+    configure_logging()
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
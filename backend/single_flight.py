@@ -0,0 +1,121 @@
+"""
+Single Flight - Cross-job coalescing of identical upstream calls
+Jobs with the same master style often submit the same Flux prompt or
+animate the same image at the same time. The first caller for a key starts
+the call; later callers on the same event loop wait on it and all receive
+its result (or its error). The call runs in its own task, so the caller that
+started it can be cancelled without failing the others: it is only
+cancelled, stopping the upstream request, once every waiter is gone.
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+from metrics import REGISTRY
+
+T = TypeVar("T")
+
+COALESCED_CALLS = REGISTRY.counter(
+    "shorts_singleflight_calls_total",
+    "Coalesced upstream calls by role (leader = made the call, follower = shared it)",
+    ("kind", "role")
+)
+
+
+class _Flight:
+    """One in-flight call and how many callers still want its result"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Identical concurrent calls (same kind and key) share one execution"""
+
+    def __init__(self):
+        # Tasks belong to one event loop, so each loop has its own flights
+        self._flights: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, _Flight]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+        self.abandoned = 0
+
+    def _loop_flights(self) -> Dict[Tuple, _Flight]:
+        with self._lock:
+            return self._flights.setdefault(asyncio.get_running_loop(), {})
+
+    async def run(self, kind: str, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Return call()'s result, sharing it with concurrent callers for key
+
+        A failure is raised to every waiter and the key is released, so the
+        next caller starts a fresh call. The call runs in the first caller's
+        context (its job trace records the upstream attempts).
+        """
+        flights = self._loop_flights()
+        flight_key = (kind, key)
+        while True:
+            flight = flights.get(flight_key)
+            if flight is None:
+                flight = flights[flight_key] = _Flight(asyncio.ensure_future(call()))
+                flight.task.add_done_callback(lambda _, flight=flight: self._release(flights, flight_key, flight))
+                self.leaders += 1
+                COALESCED_CALLS.inc(kind=kind, role="leader")
+            else:
+                self.followers += 1
+                COALESCED_CALLS.inc(kind=kind, role="follower")
+
+            flight.waiters += 1
+            try:
+                return await asyncio.shield(flight.task)
+            except asyncio.CancelledError:
+                if not flight.task.cancelled():
+                    raise
+                # The shared call was cancelled elsewhere, not us: start over
+                self._forget(flights, flight_key, flight)
+            finally:
+                flight.waiters -= 1
+                if flight.waiters == 0 and not flight.task.done():
+                    # Nobody wants the result any more: stop the upstream call
+                    self.abandoned += 1
+                    flight.task.cancel()
+                    self._forget(flights, flight_key, flight)
+
+    @staticmethod
+    def _forget(flights: Dict[Tuple, _Flight], flight_key: Tuple, flight: _Flight) -> None:
+        if flights.get(flight_key) is flight:
+            del flights[flight_key]
+
+    def _release(self, flights: Dict[Tuple, _Flight], flight_key: Tuple, flight: _Flight) -> None:
+        self._forget(flights, flight_key, flight)
+        if not flight.task.cancelled():
+            # Retrieved here in case every waiter left before it failed
+            flight.task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            inflight = sum(len(flights) for flights in self._flights.values())
+        return {
+            "inflight": inflight,
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "abandoned": self.abandoned,
+        }
+
+
+_default_flights: Optional[SingleFlight] = None
+_default_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """Process-wide coalescing layer shared by every job"""
+    global _default_flights
+    with _default_lock:
+        if _default_flights is None:
+            _default_flights = SingleFlight()
+        return _default_flights
@@ -0,0 +1,105 @@
+"""
+Recovery of jobs left behind by a server that went away
+Restarts the app (inline mode, mock upstreams) over a SQLite job store that
+still holds a 'processing' job from a dead server process: startup fails it,
+then it is resumed.
+
+    cd backend && python -m pytest tests
+"""
+
+import os
+import sys
+import time
+import socket
+import tempfile
+import subprocess
+from datetime import datetime
+
+# Settings are read at import time, so configure before the project modules load
+STATE_DIR = tempfile.mkdtemp(prefix="shorts-tests-")
+os.environ.update({
+    "SHORTS_RUN_MODE": "inline",
+    "SHORTS_MOCK_BACKENDS": "1",
+    "SHORTS_MOCK_LATENCY": "0.01",
+    "SHORTS_JOB_STORE": "sqlite",
+    "SHORTS_JOB_DB": os.path.join(STATE_DIR, "jobs.db"),
+    "SHORTS_CACHE_PATH": "",
+    "SHORTS_MIRROR_ASSETS": "0",
+    "SHORTS_ASSET_DIR": os.path.join(STATE_DIR, "assets"),
+    "SHORTS_ASSEMBLY_DIR": os.path.join(STATE_DIR, "videos"),
+    "SHORTS_LOG_LEVEL": "ERROR",
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from job_store import SQLiteJobStore  # noqa: E402
+
+
+def dead_runner() -> str:
+    """Runner id of a server process on this host that has exited"""
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return f"{socket.gethostname()}:{process.pid}"
+
+
+def seed_job(job_id: str, runner: str) -> None:
+    """Write a job the way a server that was rendering it leaves it"""
+    SQLiteJobStore(os.environ["SHORTS_JOB_DB"]).create({
+        'job_id': job_id,
+        'status': 'processing',
+        'progress': 30,
+        'current_scene': 1,
+        'total_scenes': 0,
+        'message': 'Generating scene 1',
+        'videos': [],
+        'error': None,
+        'created_at': datetime.now().isoformat(),
+        'queued_at': time.time(),
+        'completed_at': None,
+        'final_video_url': None,
+        'request': {'content': 'a lighthouse keeper', 'target_duration': 30, 'assemble': False},
+        'client_id': 'tests',
+        'runner': runner,
+        'checkpoint': None
+    })
+
+
+def wait_finished(client: TestClient, job_id: str, timeout: float = 30) -> dict:
+    deadline = time.time() + timeout
+    while True:
+        job = client.get(f"/api/shorts/status/{job_id}").json()
+        if job['status'] not in ('queued', 'processing') or time.time() > deadline:
+            return job
+        time.sleep(0.1)
+
+
+def restart_app() -> TestClient:
+    """The server app, started (its startup hooks run) on entering the client"""
+    import shorts_server
+    return TestClient(shorts_server.app)
+
+
+def test_resume_job_orphaned_by_restart():
+    seed_job("orphaned", dead_runner())
+    with restart_app() as client:
+        job = client.get("/api/shorts/status/orphaned").json()
+        assert (job['status'], job['error']) == ('failed', 'Interrupted')
+        assert client.get("/api/health").json()['active_jobs'] == 0
+
+        response = client.post("/api/shorts/orphaned/resume")
+        assert response.status_code == 200, response.text
+        assert response.json()['status'] == 'queued'
+
+        job = wait_finished(client, "orphaned")
+        assert job['status'] == 'completed', job
+        assert job['videos'] and len(job['videos']) == job['total_scenes']
+
+
+def test_resume_refuses_job_of_live_server():
+    # The parent process stands in for another server still rendering the job
+    seed_job("elsewhere", f"{socket.gethostname()}:{os.getppid()}")
+    with restart_app() as client:
+        response = client.post("/api/shorts/elsewhere/resume")
+        assert response.status_code == 409
+        assert client.get("/api/shorts/status/elsewhere").json()['status'] == 'processing'
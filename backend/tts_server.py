@@ -4,20 +4,34 @@ Free text-to-speech using Microsoft Edge TTS
 Replaces ElevenLabs API
 
 Endpoints:
-  GET  /api/tts/voices    - List all available voices grouped by language
+  GET  /api/tts/voices    - List available voices grouped by language (?locale=, ?gender=)
   POST /api/tts/synthesize - Generate audio from text
+  POST /api/tts/synthesize/stream - Generate audio, streamed as it is produced
   POST /api/tts/preview   - Generate short voice preview
+  POST /api/tts/batch     - Generate audio for many texts or a whole scenario
+  GET  /api/tts/audio/{filename} - Fetch previously generated audio
+  GET  /metrics           - Prometheus metrics
 """
 
 import asyncio
+import io
+import json
 import os
-import uuid
-import edge_tts
-from fastapi import FastAPI, HTTPException
+import zipfile
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Dict, List, Literal, Optional, Union
+
+from audio_cache import AudioCache, audio_duration, audio_key, is_audio_key
+from audio_storage import AudioStorage
+from voice_catalog import VoiceCatalog
+from metrics import CONTENT_TYPE, REGISTRY, RequestTimingMiddleware
+from log import configure_logging, get_logger
+
+configure_logging()
+logger = get_logger("tts")
 
 app = FastAPI(title="Edge-TTS Server", version="1.0.0")
 
@@ -29,13 +43,36 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestTimingMiddleware)
 
 # Audio output directory
 AUDIO_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "public", "temp", "audio")
 os.makedirs(AUDIO_DIR, exist_ok=True)
 
-# Cache voices list
-_voices_cache = None
+# Bounded, sharded storage for the audio files
+audio_storage = AudioStorage(AUDIO_DIR)
+AUDIO_JANITOR_INTERVAL = int(os.getenv("TTS_AUDIO_JANITOR_INTERVAL", 300))  # seconds
+
+# Content-addressed synthesis cache (one file per text/voice/rate)
+audio_cache = AudioCache(audio_storage)
+
+# Indexed voice list, refreshed in the background
+voice_catalog = VoiceCatalog()
+
+PREVIEW_TEXT = "Hello! This is a preview of my voice. I hope you like how I sound."
+
+# Voices whose previews are synthesized at startup
+PREWARM_VOICES = [
+    v.strip() for v in os.getenv(
+        "TTS_PREWARM_VOICES",
+        "en-US-GuyNeural,en-US-JennyNeural,en-US-AriaNeural,tr-TR-AhmetNeural,tr-TR-EmelNeural"
+    ).split(",") if v.strip()
+]
+PREWARM_CONCURRENCY = 2
+
+# Batch synthesis limits
+BATCH_CONCURRENCY = int(os.getenv("TTS_BATCH_CONCURRENCY", 4))
+BATCH_MAX_ITEMS = int(os.getenv("TTS_BATCH_MAX_ITEMS", 100))
 
 
 class SynthesizeRequest(BaseModel):
@@ -44,121 +81,341 @@ class SynthesizeRequest(BaseModel):
     rate: str = "+0%"
 
 
+class StreamRequest(SynthesizeRequest):
+    cache: bool = True  # also store the streamed audio in the cache
+
+
 class PreviewRequest(BaseModel):
     voice: str = "en-US-GuyNeural"
 
 
-async def get_all_voices():
-    """Fetch and cache all edge-tts voices"""
-    global _voices_cache
-    if _voices_cache is not None:
-        return _voices_cache
-
-    voices = await edge_tts.list_voices()
-
-    # Group by language
-    grouped = {}
-    for v in voices:
-        locale = v["Locale"]
-        lang_name = v.get("LocaleName", locale)
-
-        if locale not in grouped:
-            grouped[locale] = {
-                "locale": locale,
-                "language": lang_name,
-                "voices": []
-            }
-
-        grouped[locale]["voices"].append({
-            "name": v["ShortName"],
-            "displayName": v["FriendlyName"].replace("Microsoft Server Speech Text to Speech Voice ", "").replace(f"({v['Locale']}, ", "(").rstrip(")") + ")",
-            "gender": v["Gender"],
-            "locale": locale,
-        })
+class BatchRequest(BaseModel):
+    items: Optional[List[SynthesizeRequest]] = None
+    # Manual-mode scenario (JSON string or object); every scene's voiceover is synthesized
+    scenario: Optional[Union[str, Dict[str, Any]]] = None
+    voice: str = "en-US-GuyNeural"  # used for scenario scenes
+    rate: str = "+0%"
+    format: Literal["json", "zip"] = "json"
 
-    # Sort by language name
-    result = sorted(grouped.values(), key=lambda x: x["language"])
 
-    # Move English-US to top
-    en_us = next((l for l in result if l["locale"] == "en-US"), None)
-    if en_us:
-        result.remove(en_us)
-        result.insert(0, en_us)
+async def get_all_voices():
+    """Voices grouped by language (loads the catalog on first use)"""
+    await voice_catalog.ensure_loaded()
+    return voice_catalog.groups
+
 
-    _voices_cache = result
-    return result
+async def validate_voice(voice: str) -> None:
+    """Reject unknown voices before spending a synthesis call"""
+    try:
+        await voice_catalog.ensure_loaded()
+    except Exception:
+        # Catalog unavailable: let edge-tts decide rather than block synthesis
+        return
+    if not voice_catalog.has_voice(voice):
+        raise HTTPException(status_code=400, detail=f"Unknown voice: {voice}")
 
 
 @app.get("/api/tts/voices")
-async def list_voices():
-    """Get all available voices grouped by language"""
+async def list_voices(request: Request, locale: Optional[str] = None, gender: Optional[str] = None):
+    """Get available voices grouped by language, optionally filtered"""
     try:
-        voices = await get_all_voices()
-        return {"voices": voices}
+        await voice_catalog.ensure_loaded()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    body, etag = voice_catalog.response(locale, gender)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def audio_response(request: Request, key: str, path: str, hit: bool, attachment: bool = True):
+    """Serve a cached MP3; answers 304 when the client already has it"""
+    filename = f"{key}.mp3"
+    etag = f'"{key}"'
+    headers = {
+        "ETag": etag,
+        # Content-addressed: the bytes behind a key never change
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "X-Audio-Filename": filename,
+        "X-Cache": "HIT" if hit else "MISS",
+    }
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+
+    if attachment:
+        headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return FileResponse(path, media_type="audio/mpeg", filename=filename, headers=headers)
+
 
 @app.post("/api/tts/synthesize")
-async def synthesize(req: SynthesizeRequest):
-    """Generate audio from text"""
+async def synthesize(req: SynthesizeRequest, request: Request):
+    """Generate audio from text (served from cache for repeated requests)"""
     if not req.text.strip():
         raise HTTPException(status_code=400, detail="Text cannot be empty")
+    await validate_voice(req.voice)
+
+    try:
+        key, filepath, hit = await audio_cache.get_or_synthesize(req.text, req.voice, req.rate)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return audio_response(request, key, filepath, hit)
+
 
-    filename = f"{uuid.uuid4()}.mp3"
-    filepath = os.path.join(AUDIO_DIR, filename)
+@app.post("/api/tts/synthesize/stream")
+async def synthesize_stream(req: StreamRequest, request: Request):
+    """
+    Stream audio chunks as edge-tts produces them
+
+    Playback can start after the first chunk instead of waiting for the whole
+    file. Cached audio is served straight from disk.
+    """
+    if not req.text.strip():
+        raise HTTPException(status_code=400, detail="Text cannot be empty")
 
+    await validate_voice(req.voice)
+
+    key = audio_key(req.text, req.voice, req.rate)
+    filepath = audio_cache.get(key)
+    if filepath:
+        return audio_response(request, key, filepath, hit=True, attachment=False)
+
+    chunks = audio_cache.stream_synthesis(req.text, req.voice, req.rate, write_through=req.cache)
     try:
-        communicate = edge_tts.Communicate(
-            text=req.text,
-            voice=req.voice,
-            rate=req.rate,
-        )
-        await communicate.save(filepath)
-
-        return FileResponse(
-            filepath,
-            media_type="audio/mpeg",
-            filename=filename,
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}",
-                "X-Audio-Filename": filename,
-            }
-        )
+        # Pull the first chunk before answering so bad voices/rates still get a 500
+        first_chunk = await chunks.__anext__()
+    except StopAsyncIteration:
+        await chunks.aclose()
+        raise HTTPException(status_code=500, detail="No audio was generated")
     except Exception as e:
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        await chunks.aclose()
         raise HTTPException(status_code=500, detail=str(e))
 
+    async def body():
+        try:
+            yield first_chunk
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            # Ends the edge-tts stream right away if the client went away
+            await chunks.aclose()
+
+    filename = f"{key}.mp3"
+    return StreamingResponse(
+        body(),
+        media_type="audio/mpeg",
+        headers={
+            "X-Audio-Filename": filename,
+            "X-Cache": "MISS",
+            "Cache-Control": "no-store",
+        }
+    )
+
 
 @app.post("/api/tts/preview")
-async def preview(req: PreviewRequest):
+async def preview(req: PreviewRequest, request: Request):
     """Generate a short preview of a voice"""
-    preview_text = "Hello! This is a preview of my voice. I hope you like how I sound."
-    filename = f"preview_{req.voice.replace('-', '_')}_{uuid.uuid4().hex[:8]}.mp3"
-    filepath = os.path.join(AUDIO_DIR, filename)
+    await validate_voice(req.voice)
 
     try:
-        communicate = edge_tts.Communicate(
-            text=preview_text,
-            voice=req.voice,
-        )
-        await communicate.save(filepath)
-
-        return FileResponse(
-            filepath,
-            media_type="audio/mpeg",
-            filename=filename,
-        )
+        key, filepath, hit = await audio_cache.get_or_synthesize(PREVIEW_TEXT, req.voice)
     except Exception as e:
-        if os.path.exists(filepath):
-            os.remove(filepath)
         raise HTTPException(status_code=500, detail=str(e))
 
+    return audio_response(request, key, filepath, hit, attachment=False)
+
+
+def batch_jobs(req: BatchRequest) -> List[Dict[str, Any]]:
+    """Flatten a batch request into items with optional scene metadata"""
+    if req.scenario is not None:
+        try:
+            scenario = json.loads(req.scenario) if isinstance(req.scenario, str) else req.scenario
+            return [
+                {
+                    "scene_id": scene["scene_id"],
+                    "text": scene["voiceover"],
+                    "voice": req.voice,
+                    "rate": req.rate,
+                    "target_duration": scene.get("duration"),
+                }
+                for scene in scenario["scenes"]
+            ]
+        except (ValueError, KeyError, TypeError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid scenario: {e}")
+    if req.items:
+        return [item.model_dump() for item in req.items]
+    raise HTTPException(status_code=400, detail="Provide either items or scenario")
+
+
+@app.post("/api/tts/batch")
+async def batch(req: BatchRequest):
+    """
+    Synthesize many texts concurrently (bounded by TTS_BATCH_CONCURRENCY)
+
+    Returns one result per item in request order, with the audio duration so
+    scene lengths can be checked, or a zip of all files plus manifest.json.
+    A failed item carries an error instead of failing the whole batch.
+    """
+    jobs = batch_jobs(req)
+    if len(jobs) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_ITEMS} items per batch")
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(index: int, job: Dict[str, Any]) -> Dict[str, Any]:
+        result = {"index": index}
+        if "scene_id" in job:
+            result["scene_id"] = job["scene_id"]
+        if not job["text"].strip():
+            result["error"] = "Text cannot be empty"
+            return result
+        try:
+            await validate_voice(job["voice"])
+        except HTTPException as e:
+            result["error"] = e.detail
+            return result
+        try:
+            async with semaphore:
+                key, filepath, hit = await audio_cache.get_or_synthesize(job["text"], job["voice"], job["rate"])
+        except Exception as e:
+            result["error"] = str(e)
+            return result
+
+        duration = round(audio_duration(filepath), 2)
+        result.update({
+            "filename": f"{key}.mp3",
+            "url": f"/api/tts/audio/{key}.mp3",
+            "cached": hit,
+            "duration": duration,
+        })
+        if job.get("target_duration") is not None:
+            result["target_duration"] = job["target_duration"]
+            result["fits"] = duration <= job["target_duration"]
+        return result
+
+    results = await asyncio.gather(*(run(i, job) for i, job in enumerate(jobs)))
+    summary = {
+        "count": len(results),
+        "failed": sum(1 for r in results if "error" in r),
+        "total_duration": round(sum(r.get("duration", 0) for r in results), 2),
+    }
+
+    if req.format == "json":
+        return {"results": results, **summary}
+
+    def build_archive() -> bytes:
+        buffer = io.BytesIO()
+        # MP3 is already compressed, so store the files as-is
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+            for r in results:
+                if "error" in r:
+                    continue
+                name = f"scene_{r['scene_id']}.mp3" if "scene_id" in r else f"item_{r['index']:03d}.mp3"
+                r["archive_name"] = name
+                archive.write(audio_cache.path_for(r["filename"][:-4]), name)
+            archive.writestr("manifest.json", json.dumps({"results": results, **summary}, indent=2))
+        return buffer.getvalue()
+
+    try:
+        archive = await asyncio.to_thread(build_archive)
+    except FileNotFoundError:
+        # Evicted between synthesis and archiving; the client can simply retry
+        raise HTTPException(status_code=503, detail="Audio was evicted while building the archive, retry")
+
+    return Response(
+        content=archive,
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=voiceovers.zip"},
+    )
+
+
+@app.get("/api/tts/audio/{filename}")
+async def get_audio(filename: str, request: Request):
+    """Fetch previously generated audio by its X-Audio-Filename"""
+    key = filename[:-4] if filename.endswith(".mp3") else filename
+    if not is_audio_key(key):
+        raise HTTPException(status_code=404, detail="Audio not found")
+
+    filepath = audio_cache.lookup(key)
+    if filepath is None:
+        raise HTTPException(status_code=404, detail="Audio not found")
+
+    return audio_response(request, key, filepath, hit=True, attachment=False)
+
+
+@app.on_event("startup")
+async def load_voice_catalog():
+    """Load the voice catalog in the background so startup is not blocked"""
+
+    async def load():
+        try:
+            await voice_catalog.ensure_loaded()
+        except Exception as e:
+            logger.warning("⚠️ Voice catalog load failed, retrying on first request", extra={"error": str(e)})
+
+    app.state.catalog_task = asyncio.create_task(load())
+
+
+@app.on_event("startup")
+async def prewarm_previews():
+    """Synthesize previews for popular voices in the background"""
+
+    async def prewarm():
+        semaphore = asyncio.Semaphore(PREWARM_CONCURRENCY)
+
+        async def warm(voice: str):
+            async with semaphore:
+                try:
+                    await audio_cache.get_or_synthesize(PREVIEW_TEXT, voice)
+                except Exception as e:
+                    logger.warning("⚠️ Preview pre-warm failed", extra={"voice": voice, "error": str(e)})
+
+        await asyncio.gather(*(warm(voice) for voice in PREWARM_VOICES))
+
+    # Keep a reference so the task is not garbage collected
+    app.state.prewarm_task = asyncio.create_task(prewarm())
+
+
+@app.on_event("startup")
+async def start_audio_janitor():
+    """Keep the audio directory within its byte/file budget"""
+
+    async def janitor():
+        while True:
+            try:
+                # Directory scans block, so keep them off the event loop
+                await asyncio.to_thread(audio_storage.run_janitor)
+            except Exception as e:
+                logger.warning("⚠️ Audio janitor failed", extra={"error": str(e)})
+            await asyncio.sleep(AUDIO_JANITOR_INTERVAL)
+
+    app.state.janitor_task = asyncio.create_task(janitor())
+
+
+@app.on_event("shutdown")
+async def stop_audio_janitor():
+    app.state.janitor_task.cancel()
+
 
 @app.get("/api/tts/health")
 async def health():
-    return {"status": "ok", "service": "Edge-TTS Server"}
+    return {
+        "status": "ok",
+        "service": "Edge-TTS Server",
+        "audio_cache": audio_cache.stats(),
+        "audio_storage": audio_storage.usage(),
+        "voice_catalog": voice_catalog.stats(),
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics (synthesis latency, cache lookups, HTTP)"""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
 
 
 if __name__ == "__main__":
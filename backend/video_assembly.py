@@ -0,0 +1,335 @@
+"""
+Video Assembly - Turns finished scene clips into one vertical Short
+Downloads the Kling clips and the scenes' TTS voiceovers, fits every clip to
+its scene duration, muxes the voiceover in and concatenates the segments
+with ffmpeg. When no clip needs re-timing or resizing and they all share one
+H.264 stream format, the clips are stream-copied; otherwise every segment is
+re-encoded, so the final concat only ever joins identical streams.
+"""
+
+import os
+import json
+import time
+import shutil
+import asyncio
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from downloader import Downloader, get_downloader
+
+# External tools and services
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+FFPROBE_BIN = os.getenv("FFPROBE_BIN", "ffprobe")
+TTS_SERVER_URL = os.getenv("TTS_SERVER_URL", "http://localhost:5050")
+
+# Where final videos are written
+ASSEMBLY_DIR = os.getenv(
+    "SHORTS_ASSEMBLY_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "public", "temp", "videos")
+)
+
+# Concurrency limits
+DOWNLOAD_CONCURRENCY = int(os.getenv("SHORTS_DOWNLOAD_CONCURRENCY", 4))
+ENCODE_CONCURRENCY = int(os.getenv("SHORTS_ENCODE_CONCURRENCY", 2))
+
+# Output format used when the clips themselves are not already 9:16 H.264
+OUTPUT_WIDTH = 720
+OUTPUT_HEIGHT = 1280
+OUTPUT_FPS = 30
+
+# Audio parameters shared by every segment so the final concat can stream-copy
+AUDIO_ARGS = ["-c:a", "aac", "-b:a", "128k", "-ar", "44100", "-ac", "2"]
+
+
+class AssemblyError(Exception):
+    """Raised when the final video cannot be produced"""
+
+
+async def run_ffmpeg(binary: str, *args: str) -> bytes:
+    """Run ffmpeg/ffprobe, returning stdout; the process is killed on cancellation"""
+    try:
+        process = await asyncio.create_subprocess_exec(
+            binary, *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+    except FileNotFoundError:
+        raise AssemblyError(f"{binary} not found; install ffmpeg or set FFMPEG_BIN/FFPROBE_BIN")
+
+    try:
+        stdout, stderr = await process.communicate()
+    except asyncio.CancelledError:
+        process.kill()
+        await process.wait()
+        raise
+
+    if process.returncode != 0:
+        raise AssemblyError(f"{os.path.basename(binary)} failed: {stderr.decode(errors='replace')[-500:]}")
+    return stdout
+
+
+async def probe(path: str) -> Dict:
+    """Video stream format and container duration of a media file"""
+    output = await run_ffmpeg(
+        FFPROBE_BIN, "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=codec_name,profile,level,width,height,r_frame_rate,time_base,pix_fmt:format=duration",
+        "-of", "json", path
+    )
+    info = json.loads(output)
+    stream = (info.get("streams") or [{}])[0]
+    num, _, den = stream.get("r_frame_rate", "0/1").partition("/")
+    return {
+        "codec": stream.get("codec_name"),
+        "width": stream.get("width"),
+        "height": stream.get("height"),
+        "fps": round(float(num) / float(den or 1), 3) if float(den or 1) else 0.0,
+        "pix_fmt": stream.get("pix_fmt"),
+        "profile": stream.get("profile"),
+        "level": stream.get("level"),
+        "time_base": stream.get("time_base"),
+        "duration": float(info.get("format", {}).get("duration") or 0),
+    }
+
+
+def is_vertical(info: Dict) -> bool:
+    return bool(info["width"] and info["height"]) and abs(info["width"] / info["height"] - 9 / 16) < 0.01
+
+
+class VideoAssembler:
+    """Builds the final 9:16 MP4 for a job from its scene clips and voiceovers"""
+
+    def __init__(
+        self,
+        output_dir: str = ASSEMBLY_DIR,
+        tts_url: str = TTS_SERVER_URL,
+        download_concurrency: int = DOWNLOAD_CONCURRENCY,
+        encode_concurrency: int = ENCODE_CONCURRENCY
+    ):
+        self.output_dir = output_dir
+        self.tts_url = tts_url.rstrip("/")
+        self.download_concurrency = download_concurrency
+        self.encode_concurrency = encode_concurrency
+        os.makedirs(output_dir, exist_ok=True)
+
+    def output_path(self, job_id: str) -> str:
+        return os.path.join(self.output_dir, f"{job_id}.mp4")
+
+    def remove(self, job_id: str) -> None:
+        try:
+            os.remove(self.output_path(job_id))
+        except FileNotFoundError:
+            pass
+
+    def evict(self, max_age: int) -> int:
+        """Delete final videos older than max_age seconds; returns number removed"""
+        cutoff = time.time() - max_age
+        removed = 0
+        for entry in os.scandir(self.output_dir):
+            if entry.is_file() and entry.name.endswith(".mp4") and entry.stat().st_mtime < cutoff:
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    async def assemble(
+        self,
+        job_id: str,
+        scenes: List[Dict],
+        voice: str,
+        progress_callback: Optional[Callable[[str], None]] = None
+    ) -> str:
+        """
+        Produce the final video and return its path
+
+        scenes are the job's videos (scene_id, voiceover, video_url,
+        duration) in playback order.
+        """
+        def report(message: str):
+            if progress_callback:
+                progress_callback(message)
+
+        workdir = os.path.join(self.output_dir, "work", job_id)
+        os.makedirs(workdir, exist_ok=True)
+        try:
+            downloader = get_downloader()
+            report("Synthesizing voiceovers...")
+            audio_urls, audio_lengths = await self._synthesize_voiceovers(downloader, scenes, voice)
+
+            report("Downloading clips...")
+            clips, audios = await self._download_all(downloader, scenes, audio_urls, workdir)
+
+            report("Fitting scenes...")
+            infos = await asyncio.gather(*(probe(path) for path in clips))
+            reference = self._reference_format(infos)
+            durations = [
+                max(float(scene["duration"]), audio_length) for scene, audio_length in zip(scenes, audio_lengths)
+            ]
+            # Segments are concatenated with stream copy, which needs identical
+            # streams: copy every clip or re-encode them all
+            copy = all(self._copyable(info, reference, duration) for info, duration in zip(infos, durations))
+
+            slots = asyncio.Semaphore(self.encode_concurrency)
+
+            async def fit(index: int) -> str:
+                async with slots:
+                    return await self._fit_segment(
+                        clips[index], infos[index], audios[index], durations[index], reference, copy,
+                        os.path.join(workdir, f"segment_{index:03d}.mp4")
+                    )
+
+            segments = await asyncio.gather(*(fit(i) for i in range(len(scenes))))
+
+            report("Concatenating scenes...")
+            return await self._concat(segments, workdir, self.output_path(job_id))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    async def _synthesize_voiceovers(
+        self,
+        downloader: Downloader,
+        scenes: List[Dict],
+        voice: str
+    ) -> Tuple[List[Optional[str]], List[float]]:
+        """Audio URL and length per scene (None/0 for scenes without narration)"""
+        spoken = [i for i, scene in enumerate(scenes) if scene.get("voiceover", "").strip()]
+        urls: List[Optional[str]] = [None] * len(scenes)
+        lengths = [0.0] * len(scenes)
+        if not spoken:
+            return urls, lengths
+
+        response = await downloader.client.post(
+            f"{self.tts_url}/api/tts/batch",
+            json={"items": [{"text": scenes[i]["voiceover"], "voice": voice} for i in spoken]}
+        )
+        if response.status_code != 200:
+            raise AssemblyError(f"TTS batch failed ({response.status_code}): {response.text[:200]}")
+
+        for i, result in zip(spoken, response.json()["results"]):
+            if "error" in result:
+                raise AssemblyError(f"Voiceover for scene {scenes[i]['scene_id']} failed: {result['error']}")
+            urls[i] = f"{self.tts_url}{result['url']}"
+            lengths[i] = result["duration"]
+        return urls, lengths
+
+    async def _download_all(
+        self,
+        downloader: Downloader,
+        scenes: List[Dict],
+        audio_urls: List[Optional[str]],
+        workdir: str
+    ) -> Tuple[List[str], List[Optional[str]]]:
+        slots = asyncio.Semaphore(self.download_concurrency)
+
+        async def fetch_clip(url: str) -> str:
+            # Clips come from the shared content store (usually already
+            # mirrored while the job was rendering)
+            async with slots:
+                return await downloader.fetch(url)
+
+        async def fetch_audio(url: str, path: str) -> str:
+            async with slots:
+                await downloader.download(url, path)
+            return path
+
+        audios = [
+            os.path.join(workdir, f"voice_{i:03d}.mp3") if url else None
+            for i, url in enumerate(audio_urls)
+        ]
+        results = await asyncio.gather(
+            *(fetch_clip(scene["video_url"]) for scene in scenes),
+            *(fetch_audio(url, path) for url, path in zip(audio_urls, audios) if url)
+        )
+        return list(results[:len(scenes)]), audios
+
+    def _reference_format(self, infos: List[Dict]) -> Dict:
+        """Most common 9:16 H.264 clip format, else the default output format"""
+        candidates = Counter(
+            (info["width"], info["height"], info["fps"], info["profile"], info["level"], info["time_base"])
+            for info in infos
+            if info["codec"] == "h264" and info["pix_fmt"] == "yuv420p" and is_vertical(info) and info["fps"]
+        )
+        if candidates:
+            (width, height, fps, profile, level, time_base), _ = candidates.most_common(1)[0]
+            return {
+                "width": width, "height": height, "fps": fps,
+                "profile": profile, "level": level, "time_base": time_base,
+            }
+        return {"width": OUTPUT_WIDTH, "height": OUTPUT_HEIGHT, "fps": OUTPUT_FPS}
+
+    @staticmethod
+    def _copyable(info: Dict, reference: Dict, duration: float) -> bool:
+        """Whether a clip can be stream-copied into a segment of the reference format"""
+        stream_format = ("width", "height", "fps", "profile", "level", "time_base")
+        return (
+            info["codec"] == "h264" and info["pix_fmt"] == "yuv420p"
+            and all(info[key] == reference.get(key) for key in stream_format)
+            and info["duration"] >= duration - 0.05
+        )
+
+    async def _fit_segment(
+        self,
+        clip: str,
+        info: Dict,
+        audio: Optional[str],
+        duration: float,
+        reference: Dict,
+        copy: bool,
+        output: str
+    ) -> str:
+        """
+        One scene: the clip fitted to duration, with its voiceover
+
+        duration is the scene duration, or longer if the voiceover would
+        otherwise be cut off. With copy the clip is trimmed with stream copy;
+        otherwise it is slowed down if too short, scaled to the reference
+        format and re-encoded.
+        """
+        long_enough = info["duration"] >= duration - 0.05
+
+        args = ["-y", "-v", "error", "-i", clip]
+        if audio:
+            args += ["-i", audio]
+        else:
+            args += ["-f", "lavfi", "-i", "anullsrc=r=44100:cl=stereo"]
+        args += ["-map", "0:v:0", "-map", "1:a:0"]
+
+        if copy:
+            args += ["-c:v", "copy"]
+        else:
+            width, height = reference["width"], reference["height"]
+            filters = []
+            if not long_enough and info["duration"] > 0:
+                filters.append(f"setpts=PTS*{duration / info['duration']:.4f}")
+            filters += [
+                f"scale={width}:{height}:force_original_aspect_ratio=decrease",
+                f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2",
+                "setsar=1",
+                f"fps={reference['fps']}",
+            ]
+            args += [
+                "-vf", ",".join(filters),
+                "-c:v", "libx264", "-preset", "veryfast", "-crf", "20", "-pix_fmt", "yuv420p",
+            ]
+
+        args += ["-af", "apad", *AUDIO_ARGS, "-t", f"{duration:.3f}", output]
+        await run_ffmpeg(FFMPEG_BIN, *args)
+        return output
+
+    async def _concat(self, segments: List[str], workdir: str, output: str) -> str:
+        """Join segments with the concat demuxer (no re-encode)"""
+        list_path = os.path.join(workdir, "segments.txt")
+        with open(list_path, "w") as f:
+            for segment in segments:
+                f.write(f"file '{segment}'\n")
+
+        tmp_path = os.path.join(workdir, "final.mp4")
+        await run_ffmpeg(
+            FFMPEG_BIN, "-y", "-v", "error",
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-c", "copy", "-movflags", "+faststart", tmp_path
+        )
+        os.replace(tmp_path, output)
+        return output
@@ -0,0 +1,150 @@
+"""
+Voice Catalog - Indexed, pre-serialized edge-tts voice list
+Loaded once at startup and refreshed in the background (stale-while-
+revalidate), so /api/tts/voices never waits on edge-tts and filtered
+responses are served from precomputed JSON.
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+import edge_tts
+
+from log import get_logger
+
+logger = get_logger("tts")
+
+# Age after which the catalog is refreshed in the background
+VOICE_CATALOG_TTL = int(os.getenv("TTS_VOICE_CATALOG_TTL", 24 * 3600))  # seconds
+
+
+def _display_name(voice: Dict) -> str:
+    return voice["FriendlyName"].replace("Microsoft Server Speech Text to Speech Voice ", "").replace(f"({voice['Locale']}, ", "(").rstrip(")") + ")"
+
+
+class VoiceCatalog:
+    """Grouped voice list with locale/gender/name indexes"""
+
+    def __init__(self, ttl: int = VOICE_CATALOG_TTL):
+        self.ttl = ttl
+        self.groups: List[Dict] = []
+        self.by_name: Dict[str, Dict] = {}
+        self.loaded_at: Optional[float] = None
+        self.refreshes = 0
+        self._locales: Dict[str, Dict] = {}
+        self._bodies: Dict[Tuple[str, str], Tuple[bytes, str]] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._load_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    async def load(self) -> None:
+        """Fetch the voice list from edge-tts and rebuild every index"""
+        voices = await edge_tts.list_voices()
+
+        # Group by language
+        grouped = {}
+        by_name = {}
+        for v in voices:
+            locale = v["Locale"]
+            if locale not in grouped:
+                grouped[locale] = {
+                    "locale": locale,
+                    "language": v.get("LocaleName", locale),
+                    "voices": []
+                }
+            voice = {
+                "name": v["ShortName"],
+                "displayName": _display_name(v),
+                "gender": v["Gender"],
+                "locale": locale,
+            }
+            grouped[locale]["voices"].append(voice)
+            by_name[voice["name"]] = voice
+
+        # Sort by language name, English-US first
+        groups = sorted(grouped.values(), key=lambda x: x["language"])
+        en_us = next((g for g in groups if g["locale"] == "en-US"), None)
+        if en_us:
+            groups.remove(en_us)
+            groups.insert(0, en_us)
+
+        # Swap everything in at once so readers never see a half-built index
+        self.groups = groups
+        self.by_name = by_name
+        self._locales = {g["locale"].lower(): g for g in groups}
+        self._bodies = {}
+        self.loaded_at = time.monotonic()
+        self.refreshes += 1
+
+    async def ensure_loaded(self) -> None:
+        """Load on first use; refresh in the background once stale"""
+        if not self.loaded:
+            if self._load_lock is None:
+                self._load_lock = asyncio.Lock()
+            async with self._load_lock:
+                if not self.loaded:
+                    await self.load()
+            return
+        if time.monotonic() - self.loaded_at > self.ttl and (
+            self._refresh_task is None or self._refresh_task.done()
+        ):
+            self._refresh_task = asyncio.create_task(self._refresh())
+
+    async def _refresh(self) -> None:
+        try:
+            await self.load()
+        except Exception as e:
+            # Keep serving the stale catalog; the next request tries again
+            logger.warning("⚠️ Voice catalog refresh failed", extra={"error": str(e)})
+
+    def has_voice(self, name: str) -> bool:
+        return name in self.by_name
+
+    def filter(self, locale: Optional[str] = None, gender: Optional[str] = None) -> List[Dict]:
+        """Grouped voices, optionally limited to one locale and/or gender"""
+        if locale:
+            group = self._locales.get(locale.lower())
+            groups = [group] if group else []
+        else:
+            groups = self.groups
+        if not gender:
+            return groups
+
+        gender = gender.lower()
+        filtered = []
+        for group in groups:
+            voices = [v for v in group["voices"] if v["gender"].lower() == gender]
+            if voices:
+                filtered.append({**group, "voices": voices})
+        return filtered
+
+    def response(self, locale: Optional[str] = None, gender: Optional[str] = None) -> Tuple[bytes, str]:
+        """Serialized {"voices": [...]} body and its ETag, memoized per filter"""
+        cache_key = ((locale or "").lower(), (gender or "").lower())
+        cached = self._bodies.get(cache_key)
+        if cached is None:
+            groups = self.filter(locale, gender)
+            body = json.dumps({"voices": groups}).encode("utf-8")
+            etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+            cached = (body, etag)
+            if groups:
+                # Only real locale/gender combinations are memoized, so junk
+                # query strings cannot grow the cache
+                self._bodies[cache_key] = cached
+        return cached
+
+    def stats(self) -> Dict:
+        return {
+            "loaded": self.loaded,
+            "voices": len(self.by_name),
+            "locales": len(self.groups),
+            "age_seconds": round(time.monotonic() - self.loaded_at, 1) if self.loaded else None,
+            "refreshes": self.refreshes,
+        }